@@ -0,0 +1,73 @@
+try:
+  from animation import *
+except Exception:
+  print("ERROR: Could not import 'animation' module. Is it in this folder?")
+import os
+import tempfile
+from PIL import Image, ImageDraw, ImageSequence
+
+def make_frames(count):
+  frames = []
+  for i in range(count):
+    image = Image.new(mode = "RGB", size = (48, 32), color = (20, 30, 60))
+    ImageDraw.Draw(image).ellipse((4 * i, 4, 4 * i + 16, 20), fill = (240, 120 + 60 * (i % 2), 40))
+    frames.append(image)
+  return frames
+
+def test_apng_frames():
+  frames = make_frames(6)
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "sweep.png")
+    with ApngWriter(path, duration = 40) as writer:
+      for frame in frames:
+        writer.add_frame(frame)
+    image = Image.open(path)
+    read = [f.convert("RGB").tobytes() for f in ImageSequence.Iterator(image)]
+    duration = image.info.get("duration")
+    image.close()
+  if read == [f.tobytes() for f in frames] and duration == 40:
+    print("test_apng_frames: Passed")
+  else:
+    print(len(read), duration)
+    print("test_apng_frames: Failed")
+
+def test_gif_frames():
+  frames = make_frames(6)
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "sweep.gif")
+    with GifWriter(path, duration = 40, paletteFrames = 2) as writer:
+      for frame in frames:
+        writer.add_frame(frame)
+    image = Image.open(path)
+    read = [f.convert("RGB") for f in ImageSequence.Iterator(image)]
+    duration = image.info.get("duration")
+    image.close()
+  # the first two frames hold every color, so the shared palette is exact
+  wrong = [i for i in range(len(frames)) if read[i].tobytes() != frames[i].tobytes()]
+  if len(read) == len(frames) and len(wrong) == 0 and duration == 40:
+    print("test_gif_frames: Passed")
+  else:
+    print(len(read), wrong, duration)
+    print("test_gif_frames: Failed")
+
+def test_mismatched_size():
+  with tempfile.TemporaryDirectory() as directory:
+    raised = []
+    for name in ("sweep.gif", "sweep.png"):
+      with open_animation(os.path.join(directory, name)) as writer:
+        writer.add_frame(Image.new(mode = "RGB", size = (8, 8)))
+        try:
+          writer.add_frame(Image.new(mode = "RGB", size = (8, 9)))
+        except ValueError:
+          raised.append(name)
+  if raised == ["sweep.gif", "sweep.png"]:
+    print("test_mismatched_size: Passed")
+  else:
+    print(raised)
+    print("test_mismatched_size: Failed")
+
+
+if __name__ == "__main__":
+  test_apng_frames()
+  test_gif_frames()
+  test_mismatched_size()
@@ -0,0 +1,70 @@
+try:
+  from exporter import *
+except Exception:
+  print("ERROR: Could not import 'exporter' module. Is it in this folder?")
+import os
+import tempfile
+from PIL import Image
+from numpy import asarray
+
+def test_numbering():
+  with tempfile.TemporaryDirectory() as directory:
+    for name in ("generated_image0.png", "generated_image4.ppm", "other7.png"):
+      open(os.path.join(directory, name), "w").close()
+    exporter = ImageExporter(directory, "generated_image", format = "TGA")
+    image = Image.new(mode = "RGB", size = (8, 6), color = (10, 20, 30))
+    paths = [exporter.save(image) for i in range(3)]
+    exporter.flush()
+    names = [os.path.basename(p) for p in paths]
+    written = [Image.open(p).convert("RGB").getpixel((3, 3)) for p in paths]
+  if (names == ["generated_image5.tga", "generated_image6.tga", "generated_image7.tga"] and
+      written == [(10, 20, 30)] * 3 and len(exporter.errors) == 0):
+    print("test_numbering: Passed")
+  else:
+    print(names, written, exporter.errors)
+    print("test_numbering: Failed")
+
+def test_formats():
+  sizes = {}
+  with tempfile.TemporaryDirectory() as directory:
+    image = Image.new(mode = "RGB", size = (64, 64), color = (200, 100, 0))
+    for format, level in (("PNG", 0), ("PNG", 9), ("PPM", 0)):
+      exporter = ImageExporter(os.path.join(directory, "new"), format + str(level) + "_",
+                               format = format, compressLevel = level)
+      path = exporter.save(image)
+      exporter.flush()
+      if Image.open(path).convert("RGB").tobytes() == image.tobytes():
+        sizes[(format, level)] = os.path.getsize(path)
+  if len(sizes) == 3 and sizes[("PNG", 9)] < sizes[("PNG", 0)]:
+    print("test_formats: Passed")
+  else:
+    print(sizes)
+    print("test_formats: Failed")
+
+def test_png_rows():
+  image = Image.new(mode = "RGB", size = (37, 20), color = (30, 60, 90))
+  image.paste((250, 10, 128), (5, 3, 30, 17))
+  pixels = asarray(image)
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "rows.png")
+    with PngRowWriter(path, 37, 20, compressLevel = 1) as writer:
+      for y in range(0, 20, 6): # bands of uneven height
+        writer.write_rows(pixels[y:y + 6])
+    read = Image.open(path).convert("RGB").tobytes()
+    try:
+      with PngRowWriter(os.path.join(directory, "short.png"), 37, 20) as writer:
+        writer.write_rows(pixels[:6])
+      closed = True
+    except ValueError:
+      closed = False
+  if read == image.tobytes() and not closed:
+    print("test_png_rows: Passed")
+  else:
+    print(read == image.tobytes(), closed)
+    print("test_png_rows: Failed")
+
+
+if __name__ == "__main__":
+  test_numbering()
+  test_formats()
+  test_png_rows()
@@ -0,0 +1,152 @@
+try:
+  from rasterizer import *
+except Exception:
+  print("ERROR: Could not import 'rasterizer' module. Is it in this folder?")
+try:
+  from transforms import *
+except Exception:
+  print("ERROR: Could not import 'transforms' module. Is it in this folder?")
+try:
+  from model_creator import *
+except Exception:
+  print("ERROR: Could not import 'model_creator' module. Is it in this folder?")
+
+########
+# Projects view-space corners the same way the renderer does.
+#   Params:
+#     corners : List of (x, y, z) view-space points.
+#     size    : Width and height of the canvas.
+#   Returns: Array of shape (N, 3) of canvas x, y, and depth (-1/w).
+def project(corners, size):
+  res = array([(x, y, z, 1.0) for x, y, z in corners]) @ display_matrix(size, size).T
+  invW = -1 / res[:, 3]
+  res /= res[:, 3:]
+  res[:, 2] = invW
+  return res[:, :3]
+
+def test_degenerate():
+  zBuffer = []
+  for x in range(20):
+    zBuffer.append([None]*20)
+  line = render_triangle(p1 = Point(x = 1, y = 1, z = 0),
+                         p2 = Point(x = 5, y = 5, z = 0),
+                         p3 = Point(x = 9, y = 9, z = 0),
+                         c1 = (255, 0, 0), c2 = (255, 0, 0), c3 = (255, 0, 0),
+                         zBuffer = zBuffer)
+  tiny = render_triangle(p1 = Point(x = 1.2, y = 1.2, z = 0),
+                         p2 = Point(x = 1.8, y = 1.3, z = 0),
+                         p3 = Point(x = 1.5, y = 1.9, z = 0),
+                         c1 = (255, 0, 0), c2 = (255, 0, 0), c3 = (255, 0, 0),
+                         zBuffer = zBuffer)
+  if line == 0 and tiny == 0:
+    print("test_degenerate: Passed")
+  else:
+    print(line, tiny)
+    print("test_degenerate: Failed")
+
+def test_perspective_correct():
+  size = 200
+  view = [(-20, -5, -10), (30, -5, -200), (-10, 25, -60)]
+  screen = project(view, size)
+  setup = TriangleSetup(x = screen[:, 0], y = screen[:, 1], z = screen[:, 2],
+                        width = size, height = size, invW = screen[:, 2])
+  gBuffer = GBuffer(size, size)
+  corners = [Point(x = x, y = y, z = z) for x, y, z in screen]
+  views = [Point(x = x, y = y, z = z) for x, y, z in view]
+  render_triangle_attributes(p1 = corners[0], p2 = corners[1], p3 = corners[2],
+                             v1 = views[0], v2 = views[1], v3 = views[2],
+                             normal = Point(x = 0, y = 0, z = 1),
+                             color = (1, 1, 1),
+                             objId = 0,
+                             gBuffer = gBuffer,
+                             setup = setup)
+
+  # interpolated positions must project back onto their own pixels
+  ys, xs = nonzero(gBuffer.objId >= 0)
+  res = project(gBuffer.position[ys, xs], size)
+  if len(xs) > 0 and abs(res[:, 0] - xs).max() < 0.000001 and abs(res[:, 1] - ys).max() < 0.000001:
+    print("test_perspective_correct: Passed")
+  else:
+    print(abs(res[:, 0] - xs).max(), abs(res[:, 1] - ys).max())
+    print("test_perspective_correct: Failed")
+
+def test_binned():
+  size = 50
+  views = [[(-20, -5, -10), (30, -5, -200), (-10, 25, -60)],
+           [(-15, -15, -40), (10, 20, -30), (25, -10, -20)]]
+  colors = array([[(255, 0, 0), (0, 255, 0), (0, 0, 255)],
+                  [(255, 255, 0), (0, 255, 255), (255, 0, 255)]])
+  screen = array([project(view, size) for view in views])
+  setup = TriangleSetup(x = screen[:, :, 0], y = screen[:, :, 1], z = screen[:, :, 2],
+                        width = size, height = size, invW = screen[:, :, 2])
+
+  # same triangles drawn one at a time
+  zBuffer = []
+  for x in range(size):
+    zBuffer.append([None]*size)
+  for i in range(2):
+    corners = [Point(x = x, y = y, z = z) for x, y, z in screen[i]]
+    render_triangle(p1 = corners[0], p2 = corners[1], p3 = corners[2],
+                    c1 = colors[i][0], c2 = colors[i][1], c3 = colors[i][2],
+                    zBuffer = zBuffer, setup = setup, index = i)
+  expected = zeros((size, size, 3), dtype = int)
+  for x in range(size):
+    for y in range(size):
+      if zBuffer[x][y] != None:
+        expected[y, x] = zBuffer[x][y][1:]
+
+  winners, depth = rasterize_binned(setup, size, size, tileSize = 8)
+  image = interpolate_colors(setup, winners, colors)
+  diff = abs(image.astype(int) - expected).max()
+  if (winners >= 0).sum() > 0 and diff <= 1:
+    print("test_binned: Passed")
+  else:
+    print(diff)
+    print("test_binned: Failed")
+
+def test_samples():
+  size = 30
+  screen = project([(-20, -5, -10), (30, -5, -200), (-10, 25, -60)], size)
+  setup = TriangleSetup(x = screen[:, 0], y = screen[:, 1], z = screen[:, 2],
+                        width = size, height = size, invW = screen[:, 2], margin = 0.5)
+  winners, depth = rasterize_binned(setup, size, size, tileSize = 8, samples = 4)
+
+  # every sample tested directly
+  offsets = array(SAMPLE_PATTERNS[4])
+  ys, xs = mgrid[0:size, 0:size]
+  xs = xs[:, :, newaxis] + offsets[:, 0]
+  ys = ys[:, :, newaxis] + offsets[:, 1]
+  expected = ((setup.alpha[0, 0] * xs + setup.alpha[0, 1] * ys + setup.alpha[0, 2] >= 0) &
+              (setup.beta[0, 0] * xs + setup.beta[0, 1] * ys + setup.beta[0, 2] >= 0) &
+              (setup.gamma[0, 0] * xs + setup.gamma[0, 1] * ys + setup.gamma[0, 2] >= 0))
+  covered = winners >= 0
+  partial = covered.any(axis = 2) & ~covered.all(axis = 2)
+  if (covered == expected).all() and partial.any():
+    print("test_samples: Passed")
+  else:
+    print((covered != expected).sum(), partial.sum())
+    print("test_samples: Failed")
+
+def test_ties():
+  size = 30
+  screen = project([(-20, -5, -10), (30, -5, -200), (-10, 25, -60)], size)
+  screen = array([screen, screen]) # the same triangle twice, so every depth ties
+  setup = TriangleSetup(x = screen[:, :, 0], y = screen[:, :, 1], z = screen[:, :, 2],
+                        width = size, height = size, invW = screen[:, :, 2], margin = 0.5)
+  kept = []
+  for samples, drawOrder in ((1, None), (1, array([1, 0])), (4, array([1, 0]))):
+    winners, depth = rasterize_binned(setup, size, size, tileSize = 8, samples = samples, drawOrder = drawOrder)
+    kept.append(unique(winners[winners >= 0]).tolist())
+  if kept == [[0], [1], [1]]: # as render_triangle(), the first drawn is kept
+    print("test_ties: Passed")
+  else:
+    print(kept)
+    print("test_ties: Failed")
+
+
+if __name__ == "__main__":
+  test_degenerate()
+  test_perspective_correct()
+  test_binned()
+  test_samples()
+  test_ties()
@@ -0,0 +1,64 @@
+try:
+  from render_cache import *
+except Exception:
+  print("ERROR: Could not import 'render_cache' module. Is it in this folder?")
+try:
+  from scene_parser import parse_scene, convert_scene, SCENE_DIRECTORY, BINARY_EXTENSION
+except Exception:
+  print("ERROR: Could not import 'scene_parser' module. Is it in this folder?")
+import os
+import tempfile
+from PIL import Image
+
+def test_memory_lru():
+  cache = RenderCache(maxEntries = 2)
+  for i in range(3):
+    cache.put("key" + str(i), Image.new(mode = "RGB", size = (4, 4), color = (i, 0, 0)))
+    if i == 1:
+      cache.get("key0") # now used more recently than key1
+  found = [cache.get("key" + str(i)) != None for i in range(3)]
+  if found == [True, False, True] and cache.get("key2").getpixel((0, 0)) == (2, 0, 0):
+    print("test_memory_lru: Passed")
+  else:
+    print(found)
+    print("test_memory_lru: Failed")
+
+def test_disk_eviction():
+  with tempfile.TemporaryDirectory() as directory:
+    image = Image.effect_noise((64, 64), 64).convert("RGB") # compresses poorly, so files are large
+    first = RenderCache(maxEntries = 1, directory = directory, maxBytes = 10 ** 9)
+    first.put("a", image)
+    size = os.path.getsize(os.path.join(directory, "a" + RenderCache.EXTENSION))
+
+    # a new cache finds the saved image, then keeps only two of three
+    second = RenderCache(maxEntries = 1, directory = directory, maxBytes = int(size * 2.5))
+    loaded = second.get("a")
+    second.put("b", image)
+    second.get("a") # most recently used, so kept over b
+    second.put("c", image)
+    names = sorted(os.listdir(directory))
+  if (loaded != None and loaded.tobytes() == image.tobytes() and
+      names == ["a" + RenderCache.EXTENSION, "c" + RenderCache.EXTENSION]):
+    print("test_disk_eviction: Passed")
+  else:
+    print(loaded != None, names)
+    print("test_disk_eviction: Failed")
+
+def test_scene_key():
+  convert_scene("scene7.txt", "test_scene_key" + BINARY_EXTENSION)
+  try: # keys are found right away, since a mapped file cannot be removed on Windows
+    keys = [scene_key(*parse_scene(name)) for name in ("scene7.txt", "test_scene_key" + BINARY_EXTENSION,
+                                                      "scene6.txt")]
+  finally:
+    os.remove(SCENE_DIRECTORY + "test_scene_key" + BINARY_EXTENSION)
+  if keys[0] == keys[1] and keys[0] != keys[2]:
+    print("test_scene_key: Passed")
+  else:
+    print(keys)
+    print("test_scene_key: Failed")
+
+
+if __name__ == "__main__":
+  test_memory_lru()
+  test_disk_eviction()
+  test_scene_key()
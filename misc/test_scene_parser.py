@@ -0,0 +1,150 @@
+try:
+  from scene_parser import *
+except Exception:
+  print("ERROR: Could not import 'scene_parser' module. Is it in this folder?")
+import os
+import gc
+import weakref
+
+def test_evaluate_expression():
+  cases = {"0": 0,
+           "pi/4": pi / 4,
+           "3*pi/8": 3 * pi / 8,
+           "-pi/4": -pi / 4,
+           "-(pi + 1) * 2": -(pi + 1) * 2,
+           "1 - 2 - 3": -4,
+           "8/2/2": 2,
+           ".5e1": 5,
+           "-" * 5001 + "1": -1}
+  wrong = [text for text, expected in cases.items() if abs(evaluate_expression(text) - expected) > 0.0000001]
+  if len(wrong) == 0:
+    print("test_evaluate_expression: Passed")
+  else:
+    print(wrong)
+    print("test_evaluate_expression: Failed")
+
+def test_unsafe_expression():
+  accepted = []
+  for text in ["__import__('os').getcwd()", "pi.real", "(1", "1/0", "2 pi", "",
+               "(" * 5000 + "1" + ")" * 5000]:
+    try:
+      evaluate_expression(text)
+      accepted.append(text)
+    except ValueError:
+      pass
+  if len(accepted) == 0:
+    print("test_unsafe_expression: Passed")
+  else:
+    print(accepted)
+    print("test_unsafe_expression: Failed")
+
+def test_instances():
+  f = open(SCENE_DIRECTORY + "test_instances.txt", "w")
+  f.write("define crate cube 1 0.8,0.5,0.2\n" +
+          "instance crate 1,1,1 0,0,-3 0,0\n" +
+          "instance crate 2,1,1 4,0,0 pi/4,0\n" +
+          "instance barrel 1,1,1 0,0,0 0,0\n" + # not defined, so skipped
+          "cube 1 0.8,0.5,0.2 1,1,1 -4,0,0 0,0\n" +
+          "sphere 1 0.8,0.5,0.2 1,1,1 0,4,0 0,0\n")
+  f.close()
+  try:
+    models, lights = parse_scene("test_instances.txt")
+  finally:
+    os.remove(SCENE_DIRECTORY + "test_instances.txt")
+  meshes = [m.mesh for m in models]
+  if (len(models) == 4 and meshes[0] is meshes[1] and meshes[1] is meshes[2] and
+      meshes[3] is not meshes[0] and models[1].scale.x == 2):
+    print("test_instances: Passed")
+  else:
+    print(len(models))
+    print("test_instances: Failed")
+
+def test_binary_round_trip():
+  describe = lambda models, lights: ([(m.mesh.shape, m.mesh.size, m.color,
+                                       (m.scale.x, m.scale.y, m.scale.z),
+                                       (m.offset.x, m.offset.y, m.offset.z),
+                                       (m.rotation.phi, m.rotation.theta)) for m in models] +
+                                     [((l.loc.x, l.loc.y, l.loc.z), tuple(l.color)) for l in lights])
+  convert_scene("scene7.txt", "test_round_trip" + BINARY_EXTENSION)
+  convert_scene("test_round_trip" + BINARY_EXTENSION, "test_round_trip.txt")
+  try: # scenes are described right away, since a mapped file cannot be removed on Windows
+    described = [describe(*parse_scene(name)) for name in ("scene7.txt",
+                                                           "test_round_trip" + BINARY_EXTENSION,
+                                                           "test_round_trip.txt")]
+  finally:
+    os.remove(SCENE_DIRECTORY + "test_round_trip" + BINARY_EXTENSION)
+    os.remove(SCENE_DIRECTORY + "test_round_trip.txt")
+  wrong = [i for i in (1, 2) if described[i] != described[0]]
+  if len(wrong) == 0 and len(described[0]) > 0:
+    print("test_binary_round_trip: Passed")
+  else:
+    print(wrong)
+    print("test_binary_round_trip: Failed")
+
+def test_object_bounds():
+  convert_scene("scene7.txt", "test_object_bounds" + BINARY_EXTENSION)
+  try:
+    text = object_bounds(parse_scene("scene7.txt")[0])
+    models = parse_scene("test_object_bounds" + BINARY_EXTENSION)[0]
+    binary = object_bounds(models)
+    built = len(models._items) # records are measured, not built
+  finally:
+    os.remove(SCENE_DIRECTORY + "test_object_bounds" + BINARY_EXTENSION)
+  wrong = [i for i in range(len(text))
+           if text[i].shape != binary[i].shape or abs(text[i] - binary[i]).max() > 0.0000001]
+  if len(wrong) == 0 and built == 0 and len(text[0]) > 0:
+    print("test_object_bounds: Passed")
+  else:
+    print(wrong, built)
+    print("test_object_bounds: Failed")
+
+def test_corrupt_binary():
+  models, lights = parse_scene("scene7.txt")
+  rejected = []
+  for column, value in (("shape", 7), ("mesh", 1000)):
+    write_binary_scene("test_corrupt" + BINARY_EXTENSION, models, lights)
+    with open(SCENE_DIRECTORY + "test_corrupt" + BINARY_EXTENSION, "r+b") as f:
+      if column == "shape": # first field of the first mesh record
+        f.seek(HEADER_DTYPE.itemsize)
+        f.write(bytes([value]))
+      else: # first field of the first object record, after every mesh
+        header = fromfile(f, dtype = HEADER_DTYPE, count = 1)[0]
+        f.seek(HEADER_DTYPE.itemsize + int(header["meshes"]) * MESH_DTYPE.itemsize)
+        f.write(array([value], dtype = "<u4").tobytes())
+    try:
+      load_binary_scene("test_corrupt" + BINARY_EXTENSION)
+    except ValueError:
+      rejected.append(column)
+    finally:
+      os.remove(SCENE_DIRECTORY + "test_corrupt" + BINARY_EXTENSION)
+  if rejected == ["shape", "mesh"]:
+    print("test_corrupt_binary: Passed")
+  else:
+    print(rejected)
+    print("test_corrupt_binary: Failed")
+
+def test_mesh_lifetime():
+  models = parse_scene("scene7.txt", resolution = RES_HIGH)[0]
+  model = weakref.ref(models[0].model())
+  again = parse_scene("scene7.txt", resolution = RES_HIGH)[0][0].model() # must not reuse the first scene's
+  built = {}
+  first = SceneMesh("cube", 1.0, (1.0, 0.0, 0.0), RES_LOW, built = built)
+  second = SceneMesh("cube", 1.0, (1.0, 0.0, 0.0), RES_LOW, built = built)
+  shared = first.model() is second.model()
+  del models
+  gc.collect()
+  if model() is None and again is not None and shared: # released with its scene
+    print("test_mesh_lifetime: Passed")
+  else:
+    print(model() is None, shared)
+    print("test_mesh_lifetime: Failed")
+
+
+if __name__ == "__main__":
+  test_evaluate_expression()
+  test_unsafe_expression()
+  test_instances()
+  test_binary_round_trip()
+  test_object_bounds()
+  test_corrupt_binary()
+  test_mesh_lifetime()
@@ -29,7 +29,7 @@ def test_rotateX():
   p = Point(theta = -pi / 2, phi = pi / 4, radius = 5)
 
   expected = Point(x = 0, y = -5, z = 0)
-  res = Point(matrix = mat * p.mat())
+  res = Point(matrix = mat @ p.mat())
   if almost_equal(res, expected):
     print("test_rotateX: Passed")
   else:
@@ -42,7 +42,7 @@ def test_rotateY():
   p = Point(theta = 0, phi = 3 * pi / 4, radius = 5)
 
   expected = Point(x = 0, y = 0, z = -5)
-  res = Point(matrix = mat * p.mat())
+  res = Point(matrix = mat @ p.mat())
   if almost_equal(res, expected):
     print("test_rotateY: Passed")
   else:
@@ -55,7 +55,7 @@ def test_rotateZ():
   p = Point(theta = -pi/4, phi = pi / 2, radius = 5)
 
   expected = Point(x = 5, y = 0, z = 0)
-  res = Point(matrix = mat * p.mat())
+  res = Point(matrix = mat @ p.mat())
   if almost_equal(res, expected):
     print("test_rotateZ: Passed")
   else:
@@ -68,7 +68,7 @@ def test_translate():
   p = Point(x = -2, y = -2, z = -2)
 
   expected = Point(x = 1, y = 2, z = 4)
-  res = Point(matrix = mat * p.mat())
+  res = Point(matrix = mat @ p.mat())
   if almost_equal(res, expected):
     print("test_translate: Passed")
   else:
@@ -81,7 +81,7 @@ def test_scale():
   p = Point(x = 1, y = 100, z = 4)
 
   expected = Point(x = 4, y = 10, z = 10)
-  res = Point(matrix = mat * p.mat())
+  res = Point(matrix = mat @ p.mat())
   if almost_equal(res, expected):
     print("test_scale: Passed")
   else:
@@ -89,6 +89,16 @@ def test_scale():
     print(res)
     print("test_scale: Failed")
 
+def test_display_inverse():
+  p = Point(x = 3, y = -2, z = -40)
+  res = Point(matrix = display_inverse(300, 200, (10, 20)) @ display_matrix(300, 200, (10, 20)) @ p.mat())
+  if almost_equal(res, p):
+    print("test_display_inverse: Passed")
+  else:
+    print(p)
+    print(res)
+    print("test_display_inverse: Failed")
+
 
 if __name__ == "__main__":
   test_perspective_project()
@@ -96,4 +106,5 @@ if __name__ == "__main__":
   test_rotateY()
   test_rotateZ()
   test_translate()
-  test_scale()
\ No newline at end of file
+  test_scale()
+  test_display_inverse()
\ No newline at end of file
@@ -0,0 +1,316 @@
+################################
+# animation.py
+# Noah Ansel
+# nba38
+# 2016-11-17
+# ------------------------------
+# Records camera sweeps of a scene as animated GIF or PNG files. Frames
+# are encoded as soon as they are rendered, so memory use does not grow
+# with the length of the animation.
+################################
+
+# import validation
+fail = False
+try:
+  from PIL import Image, GifImagePlugin
+except Exception:
+  print("ERROR: Could not import 'PIL' module. Is pillow installed?")
+  fail = True
+try:
+  from numpy import asarray
+except Exception:
+  print("ERROR: Could not import 'numpy' module.")
+  fail = True
+try:
+  import struct
+  import zlib
+except Exception:
+  print("ERROR: Could not import 'struct' or 'zlib' modules.")
+  fail = True
+try:
+  from exporter import write_png_chunk, filter_png_rows
+except Exception:
+  print("ERROR: Could not import 'exporter' module. Is it in this folder?")
+  fail = True
+if fail:
+  input("Press ENTER to close this window.")
+  exit()
+
+# time each frame is shown, in milliseconds
+DEFAULT_DURATION = 50
+
+
+################
+# GifWriter: Writes an animated GIF one frame at a time. Every frame uses
+# one palette, chosen from the first few frames, so colors do not flicker.
+#   Members:
+#     path          : File being written.
+#     size          : Width and height of every frame, set by the first frame.
+#     frameCount    : Number of frames added so far.
+#     _file         : Open file, or None once closed.
+#     _pending      : Frames held until the palette is chosen, or None after.
+#     _palette      : Image in mode "P" holding the shared palette.
+class GifWriter:
+
+  # frames the shared palette is chosen from
+  DEFAULT_PALETTE_FRAMES = 4
+
+  ########
+  # Starts a new animation file.
+  #   Params:
+  #     path          : File to write.
+  #     duration      : Time each frame is shown, in milliseconds. GIF stores
+  #                     this in hundredths of a second.
+  #     loop          : Number of times to play, or 0 to repeat forever.
+  #     paletteFrames : Number of frames, from the start, the palette is
+  #                     chosen from. They are held in memory until then.
+  def __init__(self, path, duration = DEFAULT_DURATION, loop = 0, paletteFrames = DEFAULT_PALETTE_FRAMES):
+    self.path = path
+    self.size = None
+    self.frameCount = 0
+    self._duration = duration
+    self._loop = loop
+    self._paletteFrames = max((1, paletteFrames))
+    self._file = open(path, "wb")
+    self._pending = []
+    self._palette = None
+
+  ########
+  # Adds the next frame of the animation.
+  #   Params:
+  #     image : PIL.Image in RGB mode. Every frame must be the same size.
+  def add_frame(self, image):
+    if self.size == None:
+      self.size = image.size
+    elif image.size != self.size:
+      raise ValueError("Frame of size {} does not match {}.".format(image.size, self.size))
+    self.frameCount += 1
+
+    if self._pending != None:
+      self._pending.append(image.convert("RGB"))
+      if len(self._pending) >= self._paletteFrames:
+        self._start()
+      return
+    self._write_frame(image)
+
+  ########
+  # Finishes the file. Must be called once every frame has been added.
+  def close(self):
+    if self._file == None:
+      return
+    if self._pending != None and len(self._pending) > 0:
+      self._start()
+    if self._palette != None:
+      self._file.write(b";") # trailer
+    self._file.close()
+    self._file = None
+
+  ########
+  # Allows use in a with statement, which closes the file afterwards.
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  ########
+  # Chooses the palette from the frames held so far, then writes the file
+  # header and those frames.
+  def _start(self):
+    width, height = self.size
+    sample = Image.new(mode = "RGB", size = (width, height * len(self._pending)))
+    for i, frame in enumerate(self._pending):
+      sample.paste(frame, (0, height * i))
+    self._palette = sample.quantize(colors = 256)
+    colors = bytes(self._palette.getpalette()[:768])
+    colors += bytes(768 - len(colors)) # table always holds 256 colors
+
+    self._file.write(b"GIF89a" +
+                     struct.pack("<HHBBB", width, height, 0xF7, 0, 0) + # 256 color global table
+                     colors +
+                     b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", self._loop) + b"\x00")
+
+    pending = self._pending
+    self._pending = None
+    for frame in pending:
+      self._write_frame(frame)
+
+  ########
+  # Maps a frame to the shared palette and appends it to the file.
+  #   Params:
+  #     image : PIL.Image of the frame.
+  def _write_frame(self, image):
+    frame = image.convert("RGB").quantize(palette = self._palette)
+    for data in GifImagePlugin.getdata(frame, duration = self._duration):
+      self._file.write(data)
+# GifWriter
+################
+
+
+################
+# ApngWriter: Writes an animated PNG one frame at a time, without loss.
+#   Members:
+#     path       : File being written.
+#     size       : Width and height of every frame, set by the first frame.
+#     frameCount : Number of frames added so far.
+#     _file      : Open file, or None once closed.
+#     _sequence  : Sequence number of the next frame control or data chunk.
+#     _countAt   : Position in the file of the animation control chunk,
+#                  whose frame count is filled in by close().
+class ApngWriter:
+
+  ########
+  # Starts a new animation file.
+  #   Params:
+  #     path          : File to write. Must be seekable.
+  #     duration      : Time each frame is shown, in milliseconds.
+  #     loop          : Number of times to play, or 0 to repeat forever.
+  #     compressLevel : zlib compression level, 0 (none, fastest) to 9 (smallest).
+  def __init__(self, path, duration = DEFAULT_DURATION, loop = 0, compressLevel = 6):
+    self.path = path
+    self.size = None
+    self.frameCount = 0
+    self._duration = duration
+    self._loop = loop
+    self._compressLevel = compressLevel
+    self._file = open(path, "wb")
+    self._sequence = 0
+    self._countAt = None
+
+  ########
+  # Adds the next frame of the animation.
+  #   Params:
+  #     image : PIL.Image. Every frame must be the same size.
+  def add_frame(self, image):
+    if self.size == None:
+      self.size = image.size
+      self._file.write(b"\x89PNG\r\n\x1a\n")
+      self._chunk(b"IHDR", struct.pack(">IIBBBBB", self.size[0], self.size[1], 8, 2, 0, 0, 0)) # 8-bit RGB
+      self._countAt = self._file.tell()
+      self._chunk(b"acTL", struct.pack(">II", 0, self._loop))
+    elif image.size != self.size:
+      raise ValueError("Frame of size {} does not match {}.".format(image.size, self.size))
+
+    self._chunk(b"fcTL", struct.pack(">IIIIIHHBB", self._sequence, self.size[0], self.size[1], 0, 0,
+                                     self._duration, 1000, 0, 0))
+    self._sequence += 1
+    data = zlib.compress(filter_png_rows(asarray(image.convert("RGB"))), self._compressLevel)
+    if self.frameCount == 0: # the first frame doubles as the still image
+      self._chunk(b"IDAT", data)
+    else:
+      self._chunk(b"fdAT", struct.pack(">I", self._sequence) + data)
+      self._sequence += 1
+    self.frameCount += 1
+
+  ########
+  # Finishes the file, filling in the number of frames.
+  def close(self):
+    if self._file == None:
+      return
+    if self._countAt != None:
+      self._chunk(b"IEND", b"")
+      self._file.seek(self._countAt)
+      self._chunk(b"acTL", struct.pack(">II", self.frameCount, self._loop))
+    self._file.close()
+    self._file = None
+
+  ########
+  # Allows use in a with statement, which closes the file afterwards.
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  ########
+  # Writes one PNG chunk.
+  #   Params:
+  #     kind : Four byte chunk type.
+  #     data : Bytes of the chunk.
+  def _chunk(self, kind, data):
+    write_png_chunk(self._file, kind, data)
+# ApngWriter
+################
+
+########
+# Opens an animation writer for a file, choosing the format from its
+# extension: ".gif" for GifWriter, otherwise ApngWriter.
+#   Params:
+#     path     : File to write.
+#     **kwargs : Options of the writer.
+#   Returns: GifWriter or ApngWriter.
+def open_animation(path, **kwargs):
+  if path.lower().endswith(".gif"):
+    return GifWriter(path, **kwargs)
+  return ApngWriter(path, **kwargs)
+
+########
+# Renders frames while turning the camera around the origin and adds each
+# to an animation as soon as it is drawn. Only the current frame is kept.
+#   Params:
+#     renderer      : Renderer with a scene loaded (Display.renderer of a Display).
+#     writer        : GifWriter or ApngWriter to add frames to. Not closed here.
+#     frames        : Number of frames.
+#     width, height : Size of each frame in pixels.
+#     zoom          : Distance of the camera from the origin.
+#     incline       : Incline of the camera, in multiples of pi.
+#     start         : Rotation of the first frame, in multiples of pi.
+#     turns         : Number of full turns over the whole animation. The
+#                     last frame stops one step short, so the animation loops.
+#     **options     : Other options of Renderer.render().
+#   Returns: List of the render statistics of every frame.
+def record_sweep(renderer, writer, frames, width, height, zoom, incline, start = 0, turns = 1, **options):
+  stats = []
+  for i in range(frames):
+    renderer.update_camera(zoom = zoom, incline = incline, rotation = start + 2 * turns * i / frames)
+    stats.append(renderer.render(width = width, height = height, **options))
+    writer.add_frame(renderer.image)
+  return stats
+
+
+########
+# Main code architecture if run standalone.
+# Records a turntable animation of a scene from the command line.
+if __name__ == "__main__":
+  import argparse
+  try:
+    from renderer import Renderer
+  except Exception:
+    print("ERROR: Could not import 'renderer' module. Is it in this folder?")
+    exit()
+  parser = argparse.ArgumentParser(description = "Record a scene from a camera circling the origin.")
+  parser.add_argument("scene", nargs = "?", default = "scene1.txt",
+                      help = "scene file to render (default: scene1.txt)")
+  parser.add_argument("--output", default = "../images/rotation.gif",
+                      help = "animation to write, .gif or .png (default: ../images/rotation.gif)")
+  parser.add_argument("--frames", type = int, default = 40,
+                      help = "number of frames (default: 40)")
+  parser.add_argument("--size", default = "400x400",
+                      help = "frame size as WIDTHxHEIGHT (default: 400x400)")
+  parser.add_argument("--res", default = Renderer.RES_MEDIUM,
+                      choices = [Renderer.RES_LOW, Renderer.RES_MEDIUM, Renderer.RES_HIGH,
+                                 Renderer.RES_ULTRA, Renderer.RES_INSANE, Renderer.RES_REALISTIC],
+                      help = "resolution preset (default: RES_MEDIUM)")
+  parser.add_argument("--mode", default = Renderer.MODE_BATCH, choices = Renderer.MODES,
+                      help = "render mode (default: MODE_BATCH)")
+  parser.add_argument("--camera", nargs = 2, type = float, default = (30, 0.75),
+                      metavar = ("ZOOM", "INCLINE"),
+                      help = "camera distance and incline in multiples of pi (default: 30 0.75)")
+  parser.add_argument("--duration", type = int, default = DEFAULT_DURATION,
+                      help = "time each frame is shown in milliseconds (default: {})".format(DEFAULT_DURATION))
+  args = parser.parse_args()
+
+  width, height = [int(v) for v in args.size.lower().split("x")]
+  r = Renderer()
+  r.load_objects(args.scene, resolution = args.res)
+  with open_animation(args.output, duration = args.duration) as writer:
+    stats = record_sweep(r, writer,
+                         frames = args.frames,
+                         width = width,
+                         height = height,
+                         zoom = args.camera[0],
+                         incline = args.camera[1],
+                         mode = args.mode,
+                         reuseLighting = args.mode == Renderer.MODE_BATCH) # only the camera moves
+  print("Wrote {} frames to '{}' in {:.2f} sec.".format(args.frames, args.output,
+                                                        sum([s["total"] for s in stats])))
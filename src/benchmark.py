@@ -0,0 +1,268 @@
+################################
+# benchmark.py
+# Noah Ansel
+# nba38
+# 2016-11-17
+# ------------------------------
+# Renders the bundled scenes without a window over a fixed grid of
+# resolutions, image sizes, and options, and reports how long each
+# stage took. Results can be saved as a baseline and later runs
+# compared against it.
+#
+# Run from the src folder:
+#   python benchmark.py --res RES_LOW RES_MEDIUM --output ../baseline.json
+#   python benchmark.py --res RES_LOW RES_MEDIUM --compare ../baseline.json
+################################
+
+# import validation
+fail = False
+try:
+  import argparse
+except Exception:
+  print("ERROR: Could not import 'argparse' module.")
+  fail = True
+try:
+  import json
+except Exception:
+  print("ERROR: Could not import 'json' module.")
+  fail = True
+try:
+  import sys
+  import platform
+  from time import strftime
+except Exception:
+  print("ERROR: Could not import 'sys', 'platform', or 'time' modules.")
+  fail = True
+try:
+  from numpy import median, percentile
+  from numpy import __version__ as numpyVersion
+except Exception:
+  print("ERROR: Could not import 'numpy' module.")
+  fail = True
+try:
+  from renderer import Renderer
+except Exception:
+  print("ERROR: Could not import 'renderer' module. Is it in this folder?")
+  fail = True
+try:
+  from profiler import RenderStats
+except Exception:
+  print("ERROR: Could not import 'profiler' module. Is it in this folder?")
+  fail = True
+if fail:
+  input("Press ENTER to close this window.")
+  exit()
+
+
+# workload rendered when no options are given
+SCENES = ["scene{}.txt".format(i) for i in range(1, 10)]
+RESOLUTIONS = [Renderer.RES_LOW,
+               Renderer.RES_MEDIUM,
+               Renderer.RES_HIGH,
+               Renderer.RES_ULTRA,
+               Renderer.RES_INSANE]
+SIZES = [(160, 120), (400, 400)]
+
+# camera used for every render, matching the Controls defaults
+CAMERA = {"zoom": 30, "incline": 0.75, "rotation": 0.25}
+
+# timed values summarized for each case
+TIMED = ["total"] + [key for key, label in RenderStats.STAGES]
+
+DEFAULT_WARMUP = 1
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+
+########
+# Parses an image size given on the command line.
+#   Params:
+#     text : Size in the form WIDTHxHEIGHT, such as 400x300.
+#   Returns: Tuple of (width, height).
+def parse_size(text):
+  try:
+    width, height = text.lower().split("x")
+    return (int(width), int(height))
+  except ValueError:
+    raise argparse.ArgumentTypeError("Expected size as WIDTHxHEIGHT, got '{}'.".format(text))
+
+########
+# Generates the name a case is stored under in results.
+#   Params:
+#     scene, resolution, width, height, castShadows, mode : Settings of the case.
+#   Returns: String uniquely naming the case.
+def case_name(scene, resolution, width, height, castShadows, mode):
+  return "{}/{}/{}x{}/{}/{}".format(scene,
+                                    resolution,
+                                    width,
+                                    height,
+                                    "shadows" if castShadows else "noshadows",
+                                    mode)
+
+########
+# Reduces the results of repeated renders of one case.
+#   Params:
+#     samples : List of dictionaries as returned by Renderer.render().
+#   Returns: Dictionary with the median and 95th percentile of each stage,
+#            the work counters, and triangles and pixels drawn per second.
+def summarize(samples):
+  res = {}
+  for key in TIMED:
+    values = [s[key] for s in samples]
+    res[key] = {"median": float(median(values)),
+                "p95": float(percentile(values, 95))}
+  for key, label in RenderStats.COUNTERS: # same for every repeat
+    res[key] = samples[-1][key]
+  total = max((res["total"]["median"], 0.000001))
+  res["trisPerSec"] = res["trisDrawn"] / total
+  res["pixelsPerSec"] = res["pixelsWritten"] / total
+  return res
+
+########
+# Renders one case repeatedly with a loaded renderer.
+#   Params:
+#     renderer      : Renderer with the scene already loaded.
+#     width, height : Size of the image in pixels.
+#     castShadows   : If True, renders shadows.
+#     mode          : Render mode, one of Renderer.MODES.
+#     warmup        : Number of untimed renders done first.
+#     repeat        : Number of timed renders.
+#   Returns: Dictionary as returned by summarize().
+def run_case(renderer, width, height, castShadows, mode, warmup, repeat):
+  for i in range(warmup):
+    renderer.render(width = width, height = height, castShadows = castShadows, mode = mode)
+  samples = []
+  for i in range(repeat):
+    samples.append(renderer.render(width = width,
+                                   height = height,
+                                   castShadows = castShadows,
+                                   mode = mode))
+  return summarize(samples)
+
+########
+# Renders every combination of the provided settings.
+#   Params:
+#     scenes      : List of scene files.
+#     resolutions : List of resolution presets.
+#     sizes       : List of (width, height) image sizes.
+#     shadows     : List of castShadows settings.
+#     modes       : List of render modes.
+#     warmup      : Number of untimed renders done before each case.
+#     repeat      : Number of timed renders of each case.
+#     log         : Function called with a line of progress after each case, or None.
+#   Returns: Dictionary of machine information, settings, and case results.
+def run_suite(scenes, resolutions, sizes, shadows, modes, warmup, repeat, log = None):
+  results = {"machine": {"python": platform.python_version(),
+                         "numpy": numpyVersion,
+                         "platform": platform.platform(),
+                         "processor": platform.processor()},
+             "date": strftime("%Y-%m-%d %H:%M:%S"),
+             "settings": {"warmup": warmup, "repeat": repeat, "camera": CAMERA},
+             "cases": {}}
+
+  renderer = Renderer()
+  renderer.update_camera(**CAMERA)
+  for scene in scenes:
+    for resolution in resolutions:
+      renderer.load_objects(filename = scene, resolution = resolution)
+      for width, height in sizes:
+        for castShadows in shadows:
+          for mode in modes:
+            name = case_name(scene, resolution, width, height, castShadows, mode)
+            res = run_case(renderer, width, height, castShadows, mode, warmup, repeat)
+            results["cases"][name] = res
+            if log != None:
+              log(format_case(name, res))
+  return results
+
+########
+# Generates a one-line report of a case.
+#   Params:
+#     name : Name of the case, from case_name().
+#     res  : Dictionary as returned by summarize().
+#   Returns: String with the median and p95 times and throughput.
+def format_case(name, res):
+  return "{:<58} {:>9.4f}s  p95 {:>9.4f}s  {:>10.0f} tris/s  {:>11.0f} px/s".format(
+           name,
+           res["total"]["median"],
+           res["total"]["p95"],
+           res["trisPerSec"],
+           res["pixelsPerSec"])
+
+########
+# Finds cases that became slower than in a baseline.
+#   Params:
+#     results   : Dictionary as returned by run_suite().
+#     baseline  : Dictionary as returned by run_suite() in an earlier run.
+#     threshold : Allowed fractional increase of the median total time.
+#   Returns: List of strings describing each regression.
+def find_regressions(results, baseline, threshold):
+  regressions = []
+  for name, res in results["cases"].items():
+    if name not in baseline["cases"]: # nothing to compare against
+      continue
+    old = baseline["cases"][name]["total"]["median"]
+    new = res["total"]["median"]
+    if new > old * (1 + threshold):
+      regressions.append("{}: {:.4f}s -> {:.4f}s ({:+.0f}%)".format(name,
+                                                                old,
+                                                                new,
+                                                                100 * (new - old) / old))
+  return regressions
+
+########
+# Main code architecture if run standalone.
+# Runs the benchmark with settings from the command line.
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description = "Benchmark the renderer on the bundled scenes.")
+  parser.add_argument("--scenes", nargs = "+", default = SCENES,
+                      help = "scene files to render (default: scene1.txt to scene9.txt)")
+  parser.add_argument("--res", nargs = "+", default = RESOLUTIONS,
+                      choices = RESOLUTIONS + [Renderer.RES_REALISTIC],
+                      help = "resolution presets (default: RES_LOW to RES_INSANE)")
+  parser.add_argument("--sizes", nargs = "+", type = parse_size, default = SIZES,
+                      help = "image sizes as WIDTHxHEIGHT (default: 160x120 400x400)")
+  parser.add_argument("--shadows", choices = ["on", "off", "both"], default = "both",
+                      help = "whether to cast shadows (default: both)")
+  parser.add_argument("--modes", nargs = "+", default = list(Renderer.MODES),
+                      choices = Renderer.MODES,
+                      help = "render modes (default: all)")
+  parser.add_argument("--warmup", type = int, default = DEFAULT_WARMUP,
+                      help = "untimed renders before each case (default: {})".format(DEFAULT_WARMUP))
+  parser.add_argument("--repeat", type = int, default = DEFAULT_REPEAT,
+                      help = "timed renders of each case (default: {})".format(DEFAULT_REPEAT))
+  parser.add_argument("--output",
+                      help = "file to write results to as JSON, for use as a baseline")
+  parser.add_argument("--compare",
+                      help = "baseline file to compare against; exits with status 1 on regression")
+  parser.add_argument("--threshold", type = float, default = DEFAULT_THRESHOLD,
+                      help = "allowed fractional slowdown when comparing (default: {})".format(DEFAULT_THRESHOLD))
+  args = parser.parse_args()
+
+  if args.repeat < 1:
+    parser.error("--repeat must be at least 1.")
+  shadows = {"on": [True], "off": [False], "both": [True, False]}[args.shadows]
+
+  results = run_suite(scenes = args.scenes,
+                      resolutions = args.res,
+                      sizes = args.sizes,
+                      shadows = shadows,
+                      modes = args.modes,
+                      warmup = args.warmup,
+                      repeat = args.repeat,
+                      log = print)
+
+  if args.output != None:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent = 2)
+    print("Results written to '{}'.".format(args.output))
+
+  if args.compare != None:
+    with open(args.compare, 'r') as f:
+      baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold)
+    if len(regressions) > 0:
+      print("{} case(s) regressed by more than {:.0f}%:".format(len(regressions), 100 * args.threshold))
+      for line in regressions:
+        print("  " + line)
+      sys.exit(1)
+    print("No regressions beyond {:.0f}%.".format(100 * args.threshold))
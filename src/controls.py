@@ -20,7 +20,22 @@ except Exception:
   print("ERROR: Could not import 'display' module. Is it in this folder?")
   fail = True
 try:
-  from time import clock
+  from profiler import format_stats
+except Exception:
+  print("ERROR: Could not import 'profiler' module. Is it in this folder?")
+  fail = True
+try:
+  from exporter import ImageExporter
+except Exception:
+  print("ERROR: Could not import 'exporter' module. Is it in this folder?")
+  fail = True
+try:
+  from render_cache import RenderCache
+except Exception:
+  print("ERROR: Could not import 'render_cache' module. Is it in this folder?")
+  fail = True
+try:
+  from time import perf_counter
 except Exception:
   print("ERROR: Could not import 'time' module.")
   fail = True
@@ -51,11 +66,40 @@ class Controls(Frame):
                  ("Insane", Display.RES_INSANE),
                  ("Realistic", Display.RES_REALISTIC)]
 
+  # render modes (and labels)
+  MODE_OPTIONS = [("Forward",  Display.MODE_FORWARD),
+                  ("Deferred", Display.MODE_DEFERRED),
+                  ("Batch",    Display.MODE_BATCH),
+                  ("Ray cast", Display.MODE_RAYCAST)]
+
+  # anti-aliasing options (and labels), as samples per pixel
+  SAMPLE_OPTIONS = [("Off", 1),
+                    ("2x",  2),
+                    ("4x",  4),
+                    ("8x",  8)]
+
   # Directory in which to save images.
   IMAGE_DIRECTORY = "../images/"
 
   # Filename to save images to. Will be appended with a number.
-  IMAGE_OUTFILE = IMAGE_DIRECTORY + "generated_image"
+  IMAGE_PREFIX = "generated_image"
+
+  # Format of saved images, one of ImageExporter.FORMATS, and PNG compression
+  # level from 0 (fastest) to 9 (smallest). TGA and PPM are uncompressed.
+  IMAGE_FORMAT = "PNG"
+  IMAGE_COMPRESS_LEVEL = ImageExporter.DEFAULT_COMPRESS_LEVEL
+
+  # File that render statistics are appended to when logging is enabled.
+  STATS_FILE = "../render_stats.jsonl"
+
+  # Directory in which to save profiles when profiling is enabled.
+  PROFILE_DIRECTORY = "../profiles/"
+
+  # Number of renders kept in memory, so returning to an earlier view or
+  # setting shows it at once, and directory they are also saved in so they
+  # outlast the program (such as "../render_cache/"), or None.
+  CACHE_ENTRIES = RenderCache.DEFAULT_ENTRIES
+  CACHE_DIRECTORY = None
 
 
   ########
@@ -69,6 +113,12 @@ class Controls(Frame):
 
     super().__init__(master)
     self._display = display
+    self._exporter = ImageExporter(directory = Controls.IMAGE_DIRECTORY,
+                                   prefix = Controls.IMAGE_PREFIX,
+                                   format = Controls.IMAGE_FORMAT,
+                                   compressLevel = Controls.IMAGE_COMPRESS_LEVEL)
+    self._display.renderer.cache = RenderCache(maxEntries = Controls.CACHE_ENTRIES,
+                                               directory = Controls.CACHE_DIRECTORY)
 
     self._create_widgets()
     self._place_widgets()
@@ -159,9 +209,46 @@ class Controls(Frame):
     self._castShadowsCheck.select()
     self._castShadowsCheck.config(command = self._on_commit_press)
 
+    self._modeLabel = Label(self, text = "Render mode:")
+    self._modeVar = StringVar()
+    self._modeVar.set(Display.MODE_FORWARD)
+    self._modeFrame = Frame(self)
+    self._modeButtons = []
+    for label, val in Controls.MODE_OPTIONS:
+      b = Radiobutton(self._modeFrame,
+                      text = label,
+                      variable = self._modeVar,
+                      value = val,
+                      command = self._on_commit_press)
+      self._modeButtons.append(b)
+
+    self._samplesLabel = Label(self, text = "Anti-aliasing (Batch mode only):")
+    self._samplesVar = IntVar(self)
+    self._samplesVar.set(1)
+    self._samplesFrame = Frame(self)
+    self._samplesButtons = []
+    for label, val in Controls.SAMPLE_OPTIONS:
+      b = Radiobutton(self._samplesFrame,
+                      text = label,
+                      variable = self._samplesVar,
+                      value = val,
+                      command = self._on_commit_press)
+      self._samplesButtons.append(b)
+
+    self._logStatsVar = IntVar(self)
+    self._logStatsCheck = Checkbutton(self,
+                                      text = "Log timings to file",
+                                      variable = self._logStatsVar)
+
+    self._profileVar = IntVar(self)
+    self._profileCheck = Checkbutton(self,
+                                     text = "Profile renders",
+                                     variable = self._profileVar)
+
     self._renderTimeLabel = Label(self,
                                   text = "Not yet rendered.",
-                                  justify = LEFT)
+                                  justify = LEFT,
+                                  font = "TkFixedFont")
     self._loadTimeLabel = Label(self,
                                 text = "Not yet loaded.",
                                 justify = LEFT)
@@ -201,6 +288,18 @@ class Controls(Frame):
 
     self._castShadowsCheck.grid(row = 10, column = 0, columnspan = 2, sticky = W)
 
+    self._modeLabel.grid(row = 11, column = 0, columnspan = 2, sticky = W)
+    for i in range(len(self._modeButtons)):
+      self._modeButtons[i].grid(row = i, column = 0, sticky = W)
+    self._modeFrame.grid(row = 12, column = 0, columnspan = 2, sticky = W+E)
+
+    self._samplesLabel.grid(row = 13, column = 0, columnspan = 2, sticky = W)
+    for i in range(len(self._samplesButtons)):
+      self._samplesButtons[i].grid(row = 0, column = i, sticky = W)
+    self._samplesFrame.grid(row = 14, column = 0, columnspan = 2, sticky = W+E)
+
+    self._profileCheck.grid(row = 16, column = 0, columnspan = 2, sticky = W)
+    self._logStatsCheck.grid(row = 17, column = 0, columnspan = 2, sticky = W)
     self._loadTimeLabel.grid(row = 18, column = 0, columnspan = 2, sticky = W+E)
     self._renderTimeLabel.grid(row = 19, column = 0, columnspan = 2, sticky = W+E)
 
@@ -212,7 +311,6 @@ class Controls(Frame):
   # Updates the display's camera position and renders the scene.
   # Also updates timing information in bottom of controls pane.
   def _on_commit_press(self, *args, **kwargs):
-    start = clock()
     try:
       self._display._canvas.config(width = int(self._widthVar.get()),
                                    height = int(self._heightVar.get()))
@@ -223,40 +321,56 @@ class Controls(Frame):
       shadeType = 0
       for v in self._shadeTypeVars:
         shadeType += v.get()
-      rasterTime = self._display.render(shadeType = shadeType, castShadows = self._castShadowsVar.get())
-      elapsed = clock() - start
-      rasterPct = 100 * rasterTime / elapsed
-      self._renderTimeLabel.config(text = "Rendered in: {:.4f} sec\n\
-Rasterize: {:.2f}s ({:.0f}%)\n\
-Other:     {:.2f}s ({:.0f}%)".format(elapsed,
-                                     rasterTime,
-                                     rasterPct,
-                                     elapsed - rasterTime,
-                                     100 - rasterPct))
+      if self._logStatsVar.get():
+        statsFile = Controls.STATS_FILE
+      else:
+        statsFile = None
+      if self._profileVar.get():
+        profileFile = self._next_profile_file()
+      else:
+        profileFile = None
+      if self._modeVar.get() == Display.MODE_BATCH:
+        samples = self._samplesVar.get()
+      else: # only batch mode can anti-alias
+        samples = 1
+      stats = self._display.render(shadeType = shadeType,
+                                   castShadows = self._castShadowsVar.get(),
+                                   mode = self._modeVar.get(),
+                                   samples = samples,
+                                   statsFile = statsFile,
+                                   profileFile = profileFile)
+      self._renderTimeLabel.config(text = format_stats(stats))
 
   ########
-  # Saves the currently rendered image in the current directory.
-  def _on_save_press(self, *args, **kwargs):
+  # Finds an unused path to profile the next render to, named after the
+  # current scene and resolution.
+  #   Returns: Path without extension, as expected by Display.render().
+  def _next_profile_file(self):
+    base = Controls.PROFILE_DIRECTORY + "{}_{}_".format(os.path.splitext(os.path.basename(self._sceneVar.get()))[0],
+                                                        self._resVar.get())
     i = 0
-    try:
-      os.listdir(Controls.IMAGE_DIRECTORY)
-    except FileNotFoundError:
-      os.mkdir(Controls.IMAGE_DIRECTORY)
-    try:
-      while True:
-        f = open(Controls.IMAGE_OUTFILE + str(i) + '.png', 'r')
-        f.close()
-        i += 1
-    except FileNotFoundError: # found our next file
-      self._display._buffer.save(Controls.IMAGE_OUTFILE + str(i) + '.png', format = "PNG")
+    while os.path.exists(base + str(i) + ".pstats"):
+      i += 1
+    return base + str(i)
+
+  ########
+  # Saves the currently rendered image in IMAGE_DIRECTORY. The image is
+  # written in the background, so rendering can continue at once.
+  def _on_save_press(self, *args, **kwargs):
+    self._exporter.save(self._display._buffer)
+
+  ########
+  # Waits for every saved image to be written. Called before exiting.
+  def finish_saves(self):
+    self._exporter.flush()
 
   ########
   # Reloads scene with the current resolution and renders the scene.
   def _on_res_select(self, *args, **kwargs):
-    start = clock()
+    start = perf_counter()
     self._display.load_objects(filename = self._sceneVar.get(),
                                resolution = self._resVar.get())
-    elapsed = clock() - start
+    elapsed = perf_counter() - start
     self._loadTimeLabel.config(text = "Loaded in: {:.4f} sec".format(elapsed))
     self._on_commit_press()
 # Controls
@@ -0,0 +1,255 @@
+################################
+# culling.py
+# Noah Ansel
+# nba38
+# 2016-11-17
+# ------------------------------
+# Visibility tests used to discard objects and triangles
+# before they are shaded and rasterized.
+################################
+
+# import validation
+fail = False
+try:
+  from numpy import *
+except Exception:
+  print("ERROR: Could not import 'numpy' module.")
+  fail = True
+try:
+  from math import *
+except Exception:
+  print("ERROR: Could not import 'math' module.")
+  fail = True
+try:
+  from model_creator import Point
+except Exception:
+  print("ERROR: Could not import 'model_creator' module. Is it in this folder?")
+  fail = True
+try:
+  from transforms import NEAR_PLANE, FAR_PLANE
+except Exception:
+  print("ERROR: Could not import 'transforms' module. Is it in this folder?")
+  fail = True
+if fail:
+  input("Press ENTER to close this window.")
+  exit()
+
+########
+# Generates the planes of the viewing frustum in view space, matching the
+# projection from perspective_project() onto a viewport of the given size.
+# The camera looks towards negative Z and the near plane passes through the
+# camera location (z = 0).
+#   Params:
+#     viewx, viewy : Width and height of the viewport in pixels.
+#   Returns: List of (a, b, c, d) tuples with unit normals pointing inwards,
+#            so a point is inside a plane if a*x + b*y + c*z + d >= 0.
+def view_frustum(viewx, viewy):
+  viewMin = min((viewx, viewy))
+  kx = viewx / (NEAR_PLANE * viewMin) # half-width of view per unit depth
+  ky = viewy / (NEAR_PLANE * viewMin) # half-height of view per unit depth
+  nx = sqrt(1 + kx * kx)
+  ny = sqrt(1 + ky * ky)
+  return [( 0,  0, -1, 0),                                        # near
+          ( 0,  0,  1, FAR_PLANE - NEAR_PLANE),                   # far
+          ( 1 / nx,  0, -kx / nx, kx * NEAR_PLANE / nx),          # left
+          (-1 / nx,  0, -kx / nx, kx * NEAR_PLANE / nx),          # right
+          ( 0,  1 / ny, -ky / ny, ky * NEAR_PLANE / ny),          # bottom
+          ( 0, -1 / ny, -ky / ny, ky * NEAR_PLANE / ny)]          # top
+
+########
+# Determines if a bounding sphere is at least partially inside the frustum.
+#   Params:
+#     center : Center of the sphere in view space, as a Point.
+#     radius : Radius of the sphere.
+#     planes : Frustum planes as returned by view_frustum().
+#   Returns: False if sphere is entirely outside one plane, True otherwise.
+def sphere_in_frustum(center, radius, planes):
+  for a, b, c, d in planes:
+    if a * center.x + b * center.y + c * center.z + d < -radius:
+      return False
+  return True
+
+########
+# Determines which triangles of a model may be visible, using one array
+# operation over all triangles. A triangle is rejected if it faces away
+# from the camera, crosses the near plane, or lies entirely off-screen.
+# Facing is taken from the winding of the projected corners: triangles
+# wound counter-clockwise around their outward normal appear clockwise on
+# the canvas (negative signed area) when facing the camera.
+#   Params:
+#     screen       : Array of shape (N, 2) of canvas coordinates of the model's points.
+#     depth        : Array of shape (N,) of view-space z of the model's points.
+#     tris         : Integer array of shape (T, 3) of triangle corner indexes.
+#     viewx, viewy : Width and height of the viewport in pixels.
+#     margin       : Distance in pixels beyond the viewport within which
+#                    triangles are kept, so that samples taken away from
+#                    pixel centers are covered. See TriangleSetup.
+#   Returns: Array of indexes of the triangles that passed every test.
+def visible_triangles(screen, depth, tris, viewx, viewy, margin = 0):
+  x = screen[:, 0][tris]
+  y = screen[:, 1][tris]
+
+  # twice the signed area of each projected triangle
+  area = ((x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) -
+          (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0]))
+  keep = area < 0 # front-facing, also drops zero-area triangles
+
+  # triangles crossing the near plane project incorrectly
+  keep &= (depth[tris] < 0).all(axis = 1)
+
+  # pixels are sampled at integer coordinates, matching render_triangle()
+  keep &= ~((x < -margin).all(axis = 1) |
+            (y < -margin).all(axis = 1) |
+            (x > viewx - 1 + margin).all(axis = 1) |
+            (y > viewy - 1 + margin).all(axis = 1))
+
+  return nonzero(keep)[0]
+
+########
+# Computes a conservative canvas-space bounding box of a view-space bounding
+# sphere, along with the nearest depth value any point of the sphere can have.
+# Depth is measured as -1/w, as stored by the renderer's depth buffers.
+#   Params:
+#     center  : Center of the sphere in view space, as a Point.
+#     radius  : Radius of the sphere.
+#     dispMat : View -> Canvas matrix (before perspective divide).
+#   Returns: Tuple of (minX, minY, maxX, maxY, nearest), or None if the
+#            sphere crosses the near plane and cannot be projected.
+def sphere_screen_bounds(center, radius, dispMat):
+  if center.z + radius >= 0:
+    return None
+
+  corners = array([(center.x + dx, center.y + dy, center.z + dz, 1.0)
+                   for dx in (-radius, radius)
+                   for dy in (-radius, radius)
+                   for dz in (-radius, radius)]) @ dispMat.T
+  xs = corners[:, 0] / corners[:, 3]
+  ys = corners[:, 1] / corners[:, 3]
+
+  # depth only depends on view-space z, so the closest point is straight ahead
+  res = dispMat @ Point(x = center.x, y = center.y, z = center.z + radius).mat()
+  nearest = -1 / res.item((3,0))
+
+  return (xs.min(), ys.min(), xs.max(), ys.max(), nearest)
+
+
+################
+# HiZBuffer: Coarse depth buffer kept alongside a zBuffer, used to skip
+# triangles and objects that are hidden before they are shaded. The canvas
+# is split into square tiles, and each tile stores a depth that every pixel
+# in the tile is known to be at or in front of. As with render_triangle(),
+# larger depth values are closer to the camera.
+#   Members:
+#     tileSize : Width and height of a tile in pixels.
+#     width    : Width of the canvas in pixels.
+#     height   : Height of the canvas in pixels.
+#     tileMin  : Array of shape (columns, rows) holding the minimum (farthest)
+#                depth written in each tile. -inf if any pixel in the
+#                tile is still empty.
+class HiZBuffer:
+
+  DEFAULT_TILE_SIZE = 8
+
+  ########
+  # Creates an empty coarse depth buffer.
+  #   Params:
+  #     width, height : Size of the canvas in pixels.
+  #     tileSize      : Width and height of a tile in pixels.
+  def __init__(self, width, height, tileSize = DEFAULT_TILE_SIZE):
+    self.tileSize = tileSize
+    self.width = int(width)
+    self.height = int(height)
+    self.tileMin = full(((self.width + tileSize - 1) // tileSize,
+                         (self.height + tileSize - 1) // tileSize),
+                        -inf)
+
+  ########
+  # Determines if everything inside a canvas region is hidden behind
+  # already-rendered geometry.
+  #   Params:
+  #     minX, minY, maxX, maxY : Canvas-space bounds of the region.
+  #     nearest                : Nearest depth of anything in the region.
+  #   Returns: True if region is fully occluded, False otherwise.
+  def occluded(self, minX, minY, maxX, maxY, nearest):
+    minX = max((int(minX), 0))
+    minY = max((int(minY), 0))
+    maxX = min((int(maxX), self.width - 1))
+    maxY = min((int(maxY), self.height - 1))
+    if minX > maxX or minY > maxY: # nothing on screen
+      return True
+    region = self.tileMin[minX // self.tileSize : maxX // self.tileSize + 1,
+                          minY // self.tileSize : maxY // self.tileSize + 1]
+    return bool(nearest < region.min())
+
+  ########
+  # Recomputes the tiles overlapping a canvas region from the zBuffer.
+  # Should be called after geometry inside the region has been rasterized.
+  #   Params:
+  #     zBuffer                : zBuffer the region was rasterized into.
+  #     minX, minY, maxX, maxY : Canvas-space bounds of the updated region.
+  def update(self, zBuffer, minX, minY, maxX, maxY):
+    tiles = self._tile_range(minX, minY, maxX, maxY)
+    if tiles == None:
+      return
+    x0, y0, x1, y1 = self._pixel_range(*tiles)
+    self._store(tiles, [[-inf if v == None else v[0] for v in zBuffer[x][y0:y1]]
+                        for x in range(x0, x1)])
+
+  ########
+  # Same as update(), but reads depths from an array indexed [y, x] such as
+  # GBuffer.depth, where empty pixels hold -inf.
+  #   Params:
+  #     depth                  : Depth array the region was rasterized into.
+  #     minX, minY, maxX, maxY : Canvas-space bounds of the updated region.
+  def update_array(self, depth, minX, minY, maxX, maxY):
+    tiles = self._tile_range(minX, minY, maxX, maxY)
+    if tiles == None:
+      return
+    x0, y0, x1, y1 = self._pixel_range(*tiles)
+    self._store(tiles, depth[y0:y1, x0:x1].T)
+
+  ########
+  # Finds the tiles overlapping a canvas region.
+  #   Params:
+  #     minX, minY, maxX, maxY : Canvas-space bounds of the region.
+  #   Returns: Tuple of first and last tile columns and rows (tx0, ty0, tx1, ty1),
+  #            or None if region is off-screen.
+  def _tile_range(self, minX, minY, maxX, maxY):
+    minX = max((int(minX), 0))
+    minY = max((int(minY), 0))
+    maxX = min((int(maxX), self.width - 1))
+    maxY = min((int(maxY), self.height - 1))
+    if minX > maxX or minY > maxY: # nothing on screen
+      return None
+    ts = self.tileSize
+    return (minX // ts, minY // ts, maxX // ts, maxY // ts)
+
+  ########
+  # Finds the pixels covered by a range of tiles, clipped to the canvas.
+  #   Params:
+  #     tx0, ty0, tx1, ty1 : First and last tile columns and rows.
+  #   Returns: Tuple of pixel bounds (x0, y0, x1, y1), exclusive of x1 and y1.
+  def _pixel_range(self, tx0, ty0, tx1, ty1):
+    ts = self.tileSize
+    return (tx0 * ts,
+            ty0 * ts,
+            min(((tx1 + 1) * ts, self.width)),
+            min(((ty1 + 1) * ts, self.height)))
+
+  ########
+  # Replaces a range of tiles with the minimum of the provided depths.
+  #   Params:
+  #     tiles : Tile range as returned by _tile_range().
+  #     depth : Depths of the pixels covered by the tiles, indexed [x][y].
+  def _store(self, tiles, depth):
+    ts = self.tileSize
+    tx0, ty0, tx1, ty1 = tiles
+    x0, y0, x1, y1 = self._pixel_range(*tiles)
+
+    # pixels past the canvas edge are padded so they never lower a tile
+    padded = full(((tx1 - tx0 + 1) * ts, (ty1 - ty0 + 1) * ts), inf)
+    padded[:x1 - x0, :y1 - y0] = depth
+    self.tileMin[tx0 : tx1 + 1, ty0 : ty1 + 1] = padded.reshape((tx1 - tx0 + 1, ts,
+                                                                 ty1 - ty0 + 1, ts)).min(axis = (1, 3))
+# HiZBuffer
+################
@@ -0,0 +1,246 @@
+################################
+# exporter.py
+# Noah Ansel
+# nba38
+# 2016-11-17
+# ------------------------------
+# Saves rendered images on a background thread, so encoding and writing
+# files never holds up rendering, or a band of rows at a time, so images
+# larger than memory can be saved as they are drawn.
+################################
+
+# import validation
+fail = False
+try:
+  import os
+  import re
+except Exception:
+  print("ERROR: Could not import 'os' or 're' modules.")
+  fail = True
+try:
+  import threading
+  from queue import Queue
+except Exception:
+  print("ERROR: Could not import 'threading' or 'queue' modules.")
+  fail = True
+try:
+  import struct
+  import zlib
+except Exception:
+  print("ERROR: Could not import 'struct' or 'zlib' modules.")
+  fail = True
+try:
+  from numpy import asarray, concatenate, int16, uint8, zeros
+except Exception:
+  print("ERROR: Could not import 'numpy' module.")
+  fail = True
+if fail:
+  input("Press ENTER to close this window.")
+  exit()
+
+
+################
+# ImageExporter: Numbers and saves images in a directory. Images are
+# queued and written by a background thread, in the order they were saved.
+#   Members:
+#     directory     : Directory images are saved in.
+#     prefix        : Start of every file name, followed by a number.
+#     format        : One of FORMATS, the format images are saved in.
+#     compressLevel : PNG compression level, 0 (none, fastest) to 9 (smallest).
+#     errors        : List of (path, message) of saves that failed.
+class ImageExporter:
+
+  # file formats (and extensions); TGA and PPM are written uncompressed
+  FORMATS = {"PNG": ".png",
+             "TGA": ".tga",
+             "PPM": ".ppm"}
+
+  DEFAULT_COMPRESS_LEVEL = 6 # Pillow's default
+
+  # images waiting to be written before save() waits for the thread
+  DEFAULT_QUEUE_SIZE = 8
+
+  ########
+  # Sets up an exporter. Nothing is read or written until the first save.
+  #   Params:
+  #     directory     : Directory to save images in. Created if missing.
+  #     prefix        : Start of every file name.
+  #     format        : One of FORMATS.
+  #     compressLevel : PNG compression level, 0 to 9.
+  #     queueSize     : Most images waiting to be written at once.
+  def __init__(self, directory, prefix, format = "PNG", compressLevel = DEFAULT_COMPRESS_LEVEL,
+               queueSize = DEFAULT_QUEUE_SIZE):
+    if format not in ImageExporter.FORMATS:
+      raise ValueError("Unexpected format '{}'.".format(format))
+    if compressLevel not in range(10):
+      raise ValueError("PNG compression level must be 0 to 9, got {}.".format(compressLevel))
+    self.directory = directory
+    self.prefix = prefix
+    self.format = format
+    self.compressLevel = compressLevel
+    self.errors = []
+    self._queue = Queue(maxsize = queueSize)
+    self._thread = None
+    self._nextIndex = None # found by one directory scan, then counted up
+
+  ########
+  # Queues an image to be saved under the next free number. Returns at
+  # once unless the queue is full, in which case it waits for a free slot.
+  #   Params:
+  #     image : PIL.Image to save. It must not be modified afterwards.
+  #   Returns: Path the image will be written to.
+  def save(self, image):
+    path = self._next_path()
+    if self._thread == None:
+      self._thread = threading.Thread(target = self._write_loop, daemon = True)
+      self._thread.start()
+    self._queue.put((image, path, self.format, self.compressLevel))
+    return path
+
+  ########
+  # Waits until every queued image has been written.
+  def flush(self):
+    self._queue.join()
+
+  ########
+  # Picks the path of the next image. The directory is scanned for
+  # numbered images of any format on the first call only.
+  #   Returns: Path of an unused file.
+  def _next_path(self):
+    if self._nextIndex == None:
+      try:
+        names = os.listdir(self.directory)
+      except FileNotFoundError:
+        os.makedirs(self.directory)
+        names = []
+      extensions = "|".join([re.escape(e) for e in ImageExporter.FORMATS.values()])
+      numbered = re.compile(re.escape(self.prefix) + r"(\d+)(?:" + extensions + r")$")
+      used = [int(m.group(1)) for m in map(numbered.match, names) if m != None]
+      self._nextIndex = max(used + [-1]) + 1
+    path = os.path.join(self.directory, self.prefix + str(self._nextIndex) + ImageExporter.FORMATS[self.format])
+    self._nextIndex += 1
+    return path
+
+  ########
+  # Writes queued images until the program exits. Runs on the background
+  # thread; failures are recorded in errors rather than raised.
+  def _write_loop(self):
+    while True:
+      image, path, format, compressLevel = self._queue.get()
+      try:
+        if format == "PNG":
+          image.save(path, format = format, compress_level = compressLevel)
+        else:
+          image.save(path, format = format)
+      except Exception as e:
+        self.errors.append((path, str(e)))
+        print("ERROR: Could not save '{}': {}".format(path, e))
+      finally:
+        self._queue.task_done()
+# ImageExporter
+################
+
+
+########
+# Writes one PNG chunk.
+#   Params:
+#     file : Open binary file to write to.
+#     kind : Four byte chunk type.
+#     data : Bytes of the chunk.
+def write_png_chunk(file, kind, data):
+  file.write(struct.pack(">I", len(data)) + kind + data +
+             struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+########
+# Converts rows of pixels to PNG scanlines, each stored as its difference
+# from the row above (filter type 2), which compresses smooth renders well.
+#   Params:
+#     rows  : Array of shape (count, width, 3) of 8-bit RGB pixels.
+#     above : If provided, array of shape (width, 3) of the row before the
+#             first, when an image is written in parts.
+#   Returns: Bytes of every scanline, each starting with its filter type.
+def filter_png_rows(rows, above = None):
+  pixels = asarray(rows, dtype = uint8).reshape((len(rows), -1))
+  filtered = pixels.astype(int16)
+  filtered[1:] -= pixels[:-1]
+  if above is not None:
+    filtered[0] -= asarray(above, dtype = uint8).ravel()
+  return concatenate((zeros((len(rows), 1), dtype = uint8) + 2, filtered.astype(uint8)), axis = 1).tobytes()
+
+
+################
+# PngRowWriter: Writes an RGB PNG file a band of rows at a time, so only
+# the band being added is held in memory.
+#   Members:
+#     path        : File being written.
+#     width       : Width of the image in pixels.
+#     height      : Height of the image in pixels.
+#     rowsWritten : Number of rows added so far, from the top.
+class PngRowWriter:
+
+  # compressed bytes gathered before they are written as a chunk
+  CHUNK_SIZE = 1 << 20
+
+  ########
+  # Starts a new file.
+  #   Params:
+  #     path          : File to write.
+  #     width, height : Size of the image in pixels.
+  #     compressLevel : zlib compression level, 0 (none, fastest) to 9 (smallest).
+  def __init__(self, path, width, height, compressLevel = ImageExporter.DEFAULT_COMPRESS_LEVEL):
+    self.path = path
+    self.width = int(width)
+    self.height = int(height)
+    self.rowsWritten = 0
+    self._compressor = zlib.compressobj(compressLevel)
+    self._pending = b""
+    self._above = None
+    self._file = open(path, "wb")
+    self._file.write(b"\x89PNG\r\n\x1a\n")
+    write_png_chunk(self._file, b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0))
+
+  ########
+  # Adds the next rows of the image.
+  #   Params:
+  #     rows : Array of shape (count, width, 3) of 8-bit RGB pixels.
+  def write_rows(self, rows):
+    rows = asarray(rows, dtype = uint8)
+    if rows.shape[1:] != (self.width, 3):
+      raise ValueError("Rows of shape {} do not match width {}.".format(rows.shape, self.width))
+    if self.rowsWritten + len(rows) > self.height:
+      raise ValueError("Image only has {} rows.".format(self.height))
+    if len(rows) == 0:
+      return
+    self._pending += self._compressor.compress(filter_png_rows(rows, above = self._above))
+    self._above = rows[-1].copy()
+    self.rowsWritten += len(rows)
+    if len(self._pending) >= PngRowWriter.CHUNK_SIZE:
+      write_png_chunk(self._file, b"IDAT", self._pending)
+      self._pending = b""
+
+  ########
+  # Finishes the file. Every row must have been added.
+  def close(self):
+    if self._file == None:
+      return
+    write_png_chunk(self._file, b"IDAT", self._pending + self._compressor.flush())
+    write_png_chunk(self._file, b"IEND", b"")
+    self._file.close()
+    self._file = None
+    if self.rowsWritten != self.height:
+      raise ValueError("Only {} of {} rows were written.".format(self.rowsWritten, self.height))
+
+  ########
+  # Allows use in a with statement, which closes the file afterwards. If
+  # the block fails, the file is left unfinished.
+  def __enter__(self):
+    return self
+
+  def __exit__(self, kind, value, traceback):
+    if kind == None:
+      self.close()
+    elif self._file != None:
+      self._file.close()
+      self._file = None
+# PngRowWriter
+################
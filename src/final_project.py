@@ -40,5 +40,6 @@ def main():
   display.grid(row = 0, column = 1, sticky = N+W+E+S)
 
   root.mainloop()
+  controls.finish_saves() # images may still be being written
 
 main()
\ No newline at end of file
@@ -0,0 +1,210 @@
+################################
+# golden.py
+# Noah Ansel
+# nba38
+# 2016-11-17
+# ------------------------------
+# Guards render output against unintended changes. Golden images
+# of the sample scenes are rendered from fixed cameras with the
+# forward (reference) render mode and stored with the project.
+# Any render mode can then be compared against them pixel by
+# pixel, and difference images are written for failing cases.
+#
+# Run from the src folder:
+#   python golden.py --update
+#   python golden.py --mode MODE_DEFERRED --tolerance 16 --max-fraction 0.05
+################################
+
+# import validation
+fail = False
+try:
+  import argparse
+except Exception:
+  print("ERROR: Could not import 'argparse' module.")
+  fail = True
+try:
+  import os
+  import sys
+except Exception:
+  print("ERROR: Could not import 'os' or 'sys' modules.")
+  fail = True
+try:
+  from numpy import *
+except Exception:
+  print("ERROR: Could not import 'numpy' module.")
+  fail = True
+try:
+  from PIL import Image
+except Exception:
+  print("ERROR: Could not import 'PIL' module. Is pillow installed?")
+  fail = True
+try:
+  from renderer import Renderer
+except Exception:
+  print("ERROR: Could not import 'renderer' module. Is it in this folder?")
+  fail = True
+if fail:
+  input("Press ENTER to close this window.")
+  exit()
+
+
+# Directory golden images are stored in.
+GOLDEN_DIRECTORY = "../misc/golden/"
+
+# Directory difference images are written to.
+DIFF_DIRECTORY = "../images/golden_diff/"
+
+# Render mode golden images are made with.
+REFERENCE_MODE = Renderer.MODE_FORWARD
+
+# scenes, cameras, and settings every golden image is rendered with
+SCENES = ["scene{}.txt".format(i) for i in range(1, 10)]
+CAMERAS = [("front", {"zoom": 30, "incline": 0.75, "rotation": 0.25}),
+           ("side",  {"zoom": 40, "incline": 0.60, "rotation": 1.30})]
+WIDTH = 160
+HEIGHT = 120
+RESOLUTION = Renderer.RES_LOW
+
+# default (tolerance, maxFraction) of modes that do not match the reference
+# exactly. MODE_BATCH interpolates colors in another order, so channels can
+# differ by one, and tests corner shadows with intersects_array() rather than
+# intersects(), which disagree for corners lying on another object's face, as
+# where the overlapping cubes of scenes 6 and 7 meet.
+MODE_TOLERANCES = {Renderer.MODE_BATCH: (1, 0.005)}
+
+########
+# Generates the filename a golden image is stored under.
+#   Params:
+#     scene  : Scene file the image was rendered from.
+#     camera : Name of the camera, from CAMERAS.
+#   Returns: Filename of the image, without directory.
+def golden_name(scene, camera):
+  return "{}_{}.png".format(os.path.splitext(scene)[0], camera)
+
+########
+# Renders one golden case.
+#   Params:
+#     renderer : Renderer with the scene already loaded.
+#     camera   : Dictionary of update_camera() arguments.
+#     mode     : Render mode, one of Renderer.MODES.
+#   Returns: Rendered PIL.Image.
+def render_case(renderer, camera, mode):
+  renderer.update_camera(**camera)
+  renderer.render(width = WIDTH, height = HEIGHT, mode = mode)
+  return renderer.image
+
+########
+# Compares two images of the same size pixel by pixel.
+#   Params:
+#     expected  : Golden PIL.Image.
+#     actual    : Newly rendered PIL.Image.
+#     tolerance : Largest difference allowed in any color channel of a pixel.
+#   Returns: Tuple of (mismatched, maxDiff, diffImage), where mismatched is
+#            the number of pixels beyond the tolerance, maxDiff is the largest
+#            channel difference, and diffImage is a PIL.Image showing the
+#            golden image faded with mismatched pixels in red.
+def compare_images(expected, actual, tolerance):
+  if expected.size != actual.size:
+    raise ValueError("Expected image of size {}, got {}.".format(expected.size, actual.size))
+  a = asarray(expected.convert("RGB")).astype(int)
+  b = asarray(actual.convert("RGB")).astype(int)
+  diff = abs(a - b).max(axis = 2)
+  bad = diff > tolerance
+
+  faded = (a // 3 + 170).astype(uint8)
+  faded[bad] = (255, 0, 0)
+  return (int(bad.sum()), int(diff.max()), Image.fromarray(faded))
+
+########
+# Renders every golden case with the reference mode and saves the images.
+#   Params:
+#     log : Function called with a line of progress after each image, or None.
+def update_goldens(log = None):
+  try:
+    os.listdir(GOLDEN_DIRECTORY)
+  except FileNotFoundError:
+    os.makedirs(GOLDEN_DIRECTORY)
+  renderer = Renderer()
+  for scene in SCENES:
+    renderer.load_objects(filename = scene, resolution = RESOLUTION)
+    for camera, settings in CAMERAS:
+      image = render_case(renderer, settings, REFERENCE_MODE)
+      image.save(GOLDEN_DIRECTORY + golden_name(scene, camera), format = "PNG")
+      if log != None:
+        log("Saved " + golden_name(scene, camera))
+
+########
+# Renders every golden case with a render mode and compares it to the
+# stored golden image.
+#   Params:
+#     mode        : Render mode to check, one of Renderer.MODES.
+#     tolerance   : Largest difference allowed in any color channel of a pixel.
+#     maxFraction : Fraction of pixels allowed to exceed the tolerance.
+#     diffDir     : Directory to write difference images of failing cases to,
+#                   or None to not write them.
+#     log         : Function called with a line of progress after each case, or None.
+#   Returns: List of golden names that failed.
+def check_goldens(mode, tolerance = 0, maxFraction = 0.0, diffDir = DIFF_DIRECTORY, log = None):
+  failed = []
+  renderer = Renderer()
+  for scene in SCENES:
+    renderer.load_objects(filename = scene, resolution = RESOLUTION)
+    for camera, settings in CAMERAS:
+      name = golden_name(scene, camera)
+      expected = Image.open(GOLDEN_DIRECTORY + name)
+      actual = render_case(renderer, settings, mode)
+      mismatched, maxDiff, diffImage = compare_images(expected, actual, tolerance)
+      passed = mismatched <= maxFraction * WIDTH * HEIGHT
+      if not passed:
+        failed.append(name)
+        if diffDir != None:
+          try:
+            os.listdir(diffDir)
+          except FileNotFoundError:
+            os.makedirs(diffDir)
+          diffImage.save(diffDir + name, format = "PNG")
+      if log != None:
+        log("{:<20} {}  {:>5} px over tolerance, max diff {:>3}".format(name,
+                                                                       "ok  " if passed else "FAIL",
+                                                                       mismatched,
+                                                                       maxDiff))
+  return failed
+
+########
+# Main code architecture if run standalone.
+# Updates or checks golden images with settings from the command line.
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description = "Check render output against golden images.")
+  parser.add_argument("--update", action = "store_true",
+                      help = "re-render golden images with the reference mode instead of checking")
+  parser.add_argument("--mode", default = REFERENCE_MODE, choices = Renderer.MODES,
+                      help = "render mode to check (default: {})".format(REFERENCE_MODE))
+  parser.add_argument("--tolerance", type = int,
+                      help = "largest allowed difference per color channel, 0-255 " +
+                             "(default: 0, or 1 with MODE_BATCH)")
+  parser.add_argument("--max-fraction", type = float,
+                      help = "fraction of pixels allowed over the tolerance " +
+                             "(default: 0, or 0.005 with MODE_BATCH)")
+  parser.add_argument("--diff-dir", default = DIFF_DIRECTORY,
+                      help = "directory for difference images (default: {})".format(DIFF_DIRECTORY))
+  args = parser.parse_args()
+
+  tolerance, maxFraction = MODE_TOLERANCES.get(args.mode, (0, 0.0))
+  if args.tolerance != None:
+    tolerance = args.tolerance
+  if args.max_fraction != None:
+    maxFraction = args.max_fraction
+
+  if args.update:
+    update_goldens(log = print)
+  else:
+    failed = check_goldens(mode = args.mode,
+                           tolerance = tolerance,
+                           maxFraction = maxFraction,
+                           diffDir = args.diff_dir,
+                           log = print)
+    if len(failed) > 0:
+      print("{} of {} golden images differ. Difference images written to '{}'.".format(
+              len(failed), len(SCENES) * len(CAMERAS), args.diff_dir))
+      sys.exit(1)
+    print("All {} golden images match.".format(len(SCENES) * len(CAMERAS)))
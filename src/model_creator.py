@@ -26,7 +26,7 @@ except Exception:
   print("ERROR: Could not import 'copy' module.")
   fail = True
 try:
-  from time import clock
+  from time import perf_counter
 except Exception:
   print("ERROR: Could not import 'time' module.")
   fail = True
@@ -152,6 +152,97 @@ def sphere_intersect(size, p1, p2):
     else:
       return False
 
+########
+# Vectorized form of cube_intersect(). Tests one segment start against
+# many segment ends at once by checking each face for a crossing.
+#   Params:
+#     size : Side length of the cube.
+#     p1   : Shared start of all segments, as an array of shape (3,).
+#     p2   : Ends of the segments, as an array of shape (N, 3).
+#   Returns: Boolean array of shape (N,), True where the segment intersects.
+def cube_intersect_array(size, p1, p2):
+  minBound = -size / 2
+  maxBound = size / 2
+  lVec = p2 - p1
+  hit = zeros(len(p2), dtype = bool)
+  for axis in range(3):
+    others = [a for a in range(3) if a != axis]
+    moving = lVec[:, axis] != 0
+    step = where(moving, lVec[:, axis], 1) # avoid dividing by zero
+    for bound in (minBound, maxBound):
+      t = (bound - p1[axis]) / step # fraction along segment
+      res = p1[others] + t[:, newaxis] * lVec[:, others]
+      hit |= (moving & (0 < t) & (t < 1) &
+              (minBound < res[:, 0]) & (res[:, 0] < maxBound) &
+              (minBound < res[:, 1]) & (res[:, 1] < maxBound))
+  return hit
+
+########
+# Vectorized form of sphere_intersect(). Tests one segment start against
+# many segment ends at once.
+#   Params:
+#     size : Size parameter, used as in sphere_intersect().
+#     p1   : Shared start of all segments, as an array of shape (3,).
+#     p2   : Ends of the segments, as an array of shape (N, 3).
+#   Returns: Boolean array of shape (N,), True where the segment intersects.
+def sphere_intersect_array(size, p1, p2):
+  lVec = p2 - p1
+  maxD = (lVec * lVec).sum(axis = 1) ** 0.5
+  lVec = lVec / maxD[:, newaxis] # make unit vectors
+  proj = lVec.dot(p1)
+  res = proj ** 2 - p1.dot(p1) + size ** 2
+  d = -proj - where(res < 0, 0, res) ** 0.5
+  return (res >= 0) & (0 < d) & (d < maxD)
+
+########
+# Finds where rays first enter a cube (centered at origin), for ray casting.
+#   Params:
+#     size      : Side length of the cube.
+#     origin    : Shared start of all rays, as an array of shape (3,).
+#     direction : Directions of the rays, as an array of shape (N, 3).
+#   Returns: Tuple of (t, normal). t is an array of shape (N,) of the distance
+#            to each hit in multiples of the ray's direction, inf where the ray
+#            misses or starts inside. normal is an array of shape (N, 3) of
+#            unit outward normals at the hits.
+def cube_ray_array(size, origin, direction):
+  half = size / 2
+  with errstate(divide = "ignore", invalid = "ignore"):
+    step = 1 / direction
+    t1 = (-half - origin) * step # crossing of each pair of faces
+    t2 = (half - origin) * step
+  enter = minimum(t1, t2)
+  axis = enter.argmax(axis = 1) # last pair of faces entered is the one hit
+  tNear = enter.max(axis = 1)
+  tFar = maximum(t1, t2).min(axis = 1)
+  hit = (tNear <= tFar) & (tNear > 0)
+
+  normal = zeros(direction.shape)
+  rows = arange(len(direction))
+  normal[rows, axis] = -sign(direction[rows, axis])
+  return (where(hit, tNear, inf), normal)
+
+########
+# Finds where rays first enter a sphere (centered at origin), for ray casting.
+#   Params:
+#     radius    : Radius of the sphere.
+#     origin    : Shared start of all rays, as an array of shape (3,).
+#     direction : Directions of the rays, as an array of shape (N, 3).
+#   Returns: Tuple of (t, normal), as for cube_ray_array().
+def sphere_ray_array(radius, origin, direction):
+  a = (direction * direction).sum(axis = 1)
+  b = 2 * direction.dot(origin)
+  c = origin.dot(origin) - radius * radius
+  disc = b * b - 4 * a * c
+  t = (-b - where(disc < 0, 0, disc) ** 0.5) / (2 * a)
+  hit = (disc >= 0) & (t > 0)
+  t = where(hit, t, inf)
+  normal = (origin + where(hit, t, 0)[:, newaxis] * direction) / radius
+  return (t, normal)
+
+# vectorized forms of the intersect functions, used by Model.intersects_array()
+INTERSECT_ARRAY_FCNS = {cube_intersect: cube_intersect_array,
+                        sphere_intersect: sphere_intersect_array}
+
 ################
 # Point: Container class for a single 3-D point.
 #   Members:
@@ -174,7 +265,7 @@ class Point:
   #     phi     : Declination from positive z-axis. Supercedes x,y,z.
   #     theta   : Clockwise rotation from positive x-axis. Supercedes x,y,z.
   #     radius  : Distance from origin. Supercedes x,y,z.
-  #     matrix  : Matrix to set point from. Supersedes spherical and Cartesian coordinates.
+  #     matrix  : Array of shape (4, 1) to set point from. Supersedes spherical and Cartesian coordinates.
   def __init__(self,
                point = None,
                x = 0,
@@ -192,7 +283,7 @@ class Point:
       self.theta  = point.phi
       self.radius = point.radius
       return
-    elif matrix != None:
+    elif matrix is not None:
       self.x = matrix.item((0,0))
       self.y = matrix.item((1,0))
       self.z = matrix.item((2,0))
@@ -235,13 +326,13 @@ class Point:
   ########
   # Returns a vector matrix representation for translations.
   def mat(self):
-    return mat([[self.x], [self.y], [self.z], [1]])
+    return array([[self.x], [self.y], [self.z], [1.0]])
 
   ########
   # Computes the attenuation factor of this point for shading.
   def att(self):
-    return min(1 / (Point.C1 + Point.C2 * self.mag() + Point.C3 * (self.x * self.x + self.y * self.y + self.z * self.z)),
-               1)
+    return min((1 / (Point.C1 + Point.C2 * self.mag() + Point.C3 * (self.x * self.x + self.y * self.y + self.z * self.z)),
+                1))
 
   ########
   # Computes the magnitude of this vector.
@@ -269,9 +360,9 @@ class Point:
   ########
   # Sets a point from a vector matrix.
   #   Params:
-  #     matrix : Numpy matrix to set given point from.
+  #     matrix : Numpy array of shape (4, 1) to set given point from.
   def set(self, matrix = None):
-    if matrix != None:
+    if matrix is not None:
       self.x = matrix.item((0,0))
       self.y = matrix.item((1,0))
       self.z = matrix.item((2,0))
@@ -303,6 +394,12 @@ class Point:
 #     _size         : Size parameter used when calling intersectFcn
 #     _intersectFcn : Function to be used when determining if given line segment
 #                     intersects with this model. See intersects().
+#     _boundRadius  : Cached result of bounding_radius(), None until computed.
+#     _triIndices   : Cached result of tri_indices(), None until computed.
+#     _triNorms     : Cached result of tri_norms(), None until computed.
+#     _triColors    : Cached result of tri_colors(), None until computed.
+#     _pointArray   : Cached result of point_array(), None until computed.
+#     _normArray    : Cached result of norm_array(), None until computed.
 class Model:
 
   DEFAULT_NAME = "unnamedModel"
@@ -433,6 +530,12 @@ class Model:
 
     self._size = size
     self._intersectFcn = intersectFcn
+    self._boundRadius = None
+    self._triIndices = None
+    self._triNorms = None
+    self._triColors = None
+    self._pointArray = None
+    self._normArray = None
 
   ########
   # Generates a multi-line string representation of the model.
@@ -515,6 +618,73 @@ class Model:
     self.tris.append(tri)
     return len(self.tris) - 1
 
+  ########
+  # Returns the corner indexes of all triangles as an array, for use in
+  # vectorized operations. Result is cached after the first call.
+  #   Returns: Integer array of shape (len(tris), 3).
+  def tri_indices(self):
+    if self._triIndices is None:
+      self._triIndices = array([(t.p1, t.p2, t.p3) for t in self.tris], dtype = int).reshape((-1, 3))
+    return self._triIndices
+
+  ########
+  # Returns the normal index of all triangles as an array, for use in
+  # vectorized operations. Result is cached after the first call.
+  #   Returns: Integer array of shape (len(tris),).
+  def tri_norms(self):
+    if self._triNorms is None:
+      self._triNorms = array([t.norm for t in self.tris], dtype = int)
+    return self._triNorms
+
+  ########
+  # Returns the color of all triangles as an array, for use in vectorized
+  # operations. Result is cached after the first call.
+  #   Returns: Array of shape (len(tris), 3).
+  def tri_colors(self):
+    if self._triColors is None:
+      self._triColors = array([t.color for t in self.tris], dtype = float64).reshape((-1, 3))
+    return self._triColors
+
+  ########
+  # Returns all points as homogeneous coordinates in an array, for use in
+  # vectorized transforms. Result is cached after the first call.
+  #   Returns: Array of shape (len(points), 4), with 1 in the last column.
+  def point_array(self):
+    if self._pointArray is None:
+      self._pointArray = array([(p.x, p.y, p.z, 1.0) for p in self.points], dtype = float64).reshape((-1, 4))
+    return self._pointArray
+
+  ########
+  # Returns all normals as an array, for use in vectorized transforms.
+  # Result is cached after the first call.
+  #   Returns: Array of shape (len(norms), 3).
+  def norm_array(self):
+    if self._normArray is None:
+      self._normArray = array([(n.x, n.y, n.z) for n in self.norms], dtype = float64).reshape((-1, 3))
+    return self._normArray
+
+  ########
+  # Moves every point of the model to new coordinates.
+  #   Params:
+  #     coords : Array of shape (len(points), 3) or more columns. Only the
+  #              first three columns are used.
+  def set_points(self, coords):
+    for p, (x, y, z) in zip(self.points, coords[:, :3].tolist()):
+      p.x = x
+      p.y = y
+      p.z = z
+
+  ########
+  # Changes the direction of every normal of the model.
+  #   Params:
+  #     coords : Array of shape (len(norms), 3) or more columns. Only the
+  #              first three columns are used.
+  def set_norms(self, coords):
+    for n, (x, y, z) in zip(self.norms, coords[:, :3].tolist()):
+      n.x = x
+      n.y = y
+      n.z = z
+
   ########
   # Divides all triangles in model into 4 smaller triangles. Used to generate
   # higher resolution cube.
@@ -550,6 +720,17 @@ class Model:
       tri.p2 = mid12idx
       tri.p3 = mid31idx
 
+  ########
+  # Computes the radius of a sphere centered at the model's origin that
+  # contains all of its points. Result is cached after the first call.
+  #   Returns: Radius of the bounding sphere in model space.
+  def bounding_radius(self):
+    if self._boundRadius == None:
+      self._boundRadius = 0
+      for p in self.points:
+        self._boundRadius = max((self._boundRadius, p.mag()))
+    return self._boundRadius
+
   ########
   # Determines if the line segment intersects the given model using the
   # intersect function provided on initialization.
@@ -558,6 +739,15 @@ class Model:
   #   Returns: True if segment intersects model, False otherwise
   def intersects(self, p1, p2):
     return self._intersectFcn(self._size, p1, p2)
+
+  ########
+  # Vectorized form of intersects(), testing many segments sharing a start.
+  #   Params:
+  #     p1 : Shared start of all segments, as an array of shape (3,).
+  #     p2 : Ends of the segments, as an array of shape (N, 3).
+  #   Returns: Boolean array of shape (N,), True where the segment intersects.
+  def intersects_array(self, p1, p2):
+    return INTERSECT_ARRAY_FCNS[self._intersectFcn](self._size, p1, p2)
 # Model
 ################
 
@@ -586,6 +776,19 @@ class Light:
   # Returns a vector matrix representation of location for translations.
   def mat(self):
     return self.loc.mat()
+
+  ########
+  # Finds how far the light reaches. Beyond this distance its light,
+  # attenuated as by Point.att(), adds less than one 8-bit step to a color.
+  #   Params:
+  #     gain : Largest factor a surface multiplies the attenuated light by.
+  #   Returns: Distance from the light, or 0 if it never adds a full step.
+  def radius(self, gain):
+    limit = gain * max(self.color) * 255 # 1 / att where the light adds one step
+    if limit < 1:
+      return 0.0
+    c = Point.C1 - limit # solve C1 + C2*d + C3*d^2 = limit
+    return max((0.0, (-Point.C2 + sqrt(Point.C2 * Point.C2 - 4 * Point.C3 * c)) / (2 * Point.C3)))
 # Light
 ################
 
@@ -642,7 +845,7 @@ def generate_sphere(radius = 1, numLaterals = 4, numVerticals = 6, color = Model
         normIdx = m.add_norm(phi = phi, theta = theta, radius = radius)
         norm = m.norms[normIdx]
         
-        m.add_tri(p1 = topLeftIdx, p2 = topRightIdx, p3 = botLeftIdx, norm = normIdx)
+        m.add_tri(p1 = topLeftIdx, p2 = botLeftIdx, p3 = topRightIdx, norm = normIdx)
       if j < numLaterals - 1: # not the bottom, so include upright triangle
         botRightIdx = m.add_point(phi = botPhi, theta = rightTheta, radius = radius)
         botRight = m.points[botRightIdx]
@@ -775,7 +978,7 @@ if __name__ == "__main__":
 
   # generate various models
   print("Generating models... ", end = "")
-  start = clock()
+  start = perf_counter()
 
   sphereLowModel = generate_sphere(radius = 1, numLaterals = 6, numVerticals = 9)
   sphereLowModel.name = "sphereLow"
@@ -798,7 +1001,7 @@ if __name__ == "__main__":
   torusHighModel = generate_torus(outRadius = 1, inRadius = 0.5, numStripes = 10, numDivisions = 12)
   torusHighModel.name = "torusHigh"
 
-  elapsed = clock() - start
+  elapsed = perf_counter() - start
   print("Completed in {:.3f}s.".format(elapsed))
 
   # validate file okay
@@ -811,7 +1014,7 @@ if __name__ == "__main__":
   if f != None:
     # write objects to file
     print("Writing models to file... ", end = "")
-    start = clock()
+    start = perf_counter()
 
     f.write(str(sphereLowModel))
     f.write(str(cubeLowModel))
@@ -826,7 +1029,7 @@ if __name__ == "__main__":
     f.write(str(torusHighModel))
 
     f.close()
-    elapsed = clock() - start
+    elapsed = perf_counter() - start
     print("Completed in {:.3f}s.".format(elapsed))
 
   input("Press ENTER to close this window.")
\ No newline at end of file
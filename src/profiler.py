@@ -0,0 +1,301 @@
+################################
+# profiler.py
+# Noah Ansel
+# nba38
+# 2016-11-17
+# ------------------------------
+# Collects per-stage timings and work counters for a render,
+# and profiles which functions a render spends its time in.
+################################
+
+# import validation
+fail = False
+try:
+  from time import perf_counter
+except Exception:
+  print("ERROR: Could not import 'time' module.")
+  fail = True
+try:
+  import json
+except Exception:
+  print("ERROR: Could not import 'json' module.")
+  fail = True
+try:
+  from contextlib import contextmanager
+except Exception:
+  print("ERROR: Could not import 'contextlib' module.")
+  fail = True
+try:
+  import cProfile
+except Exception:
+  print("ERROR: Could not import 'cProfile' module.")
+  fail = True
+try:
+  import os
+  import sys
+  import threading
+except Exception:
+  print("ERROR: Could not import 'os', 'sys', or 'threading' modules.")
+  fail = True
+if fail:
+  input("Press ENTER to close this window.")
+  exit()
+
+
+################
+# RenderStats: Timers and counters for one render. Stage timers are
+# exclusive, so time spent in a nested stage (such as shadow tests inside
+# shading) is not also charged to the enclosing stage.
+#   Members:
+#     times  : Dictionary of seconds spent in each stage.
+#     counts : Dictionary of work counters.
+#     tags   : Dictionary of extra information to report, such as scene name.
+#     total  : Wall time between start() and stop() in seconds.
+#     _stack : Stages currently running, innermost last, with their start times.
+#     _start : Time start() was called.
+class RenderStats:
+
+  # stages in pipeline order (and labels)
+  STAGES = [("parse",   "Parse"),
+            ("cache",   "Cache"),
+            ("mesh",    "Mesh build"),
+            ("vertex",  "Vertex"),
+            ("cull",    "Culling"),
+            ("shade",   "Shading"),
+            ("shadow",  "Shadows"),
+            ("raster",  "Rasterize"),
+            ("trace",   "Ray casting"),
+            ("image",   "To image"),
+            ("present", "Tk update")]
+
+  # stages that happen while loading a scene rather than while rendering.
+  # Meshes are built by the first render that draws them, so are not one.
+  LOAD_STAGES = ("parse",)
+
+  # work counters (and labels)
+  COUNTERS = [("trisSubmitted", "Tris submitted"),
+              ("trisCulled",    "Tris culled"),
+              ("trisDrawn",     "Tris drawn"),
+              ("pixelsWritten", "Pixels written"),
+              ("shadowRays",    "Shadow rays"),
+              ("occluderTests", "Occluder tests"),
+              ("lightsCulled",  "Lights culled"),
+              ("cornersReused", "Corners reused")]
+
+  ########
+  # Creates a set of empty timers and counters.
+  #   Params:
+  #     tags : Dictionary of extra information to report with the results.
+  def __init__(self, tags = None):
+    self.times = {}
+    for key, label in RenderStats.STAGES:
+      self.times[key] = 0.0
+    self.counts = {}
+    for key, label in RenderStats.COUNTERS:
+      self.counts[key] = 0
+    if tags != None:
+      self.tags = dict(tags)
+    else:
+      self.tags = {}
+    self.total = 0.0
+    self._stack = []
+    self._start = None
+
+  ########
+  # Starts the wall clock for the whole render.
+  def start(self):
+    self._start = perf_counter()
+
+  ########
+  # Stops the wall clock for the whole render.
+  def stop(self):
+    self.total = perf_counter() - self._start
+
+  ########
+  # Begins timing a stage. Pauses the enclosing stage, if any.
+  #   Params:
+  #     name : Key of the stage, from STAGES.
+  def begin(self, name):
+    now = perf_counter()
+    if len(self._stack) > 0:
+      outer, since = self._stack[-1]
+      self.times[outer] += now - since
+    self._stack.append([name, now])
+
+  ########
+  # Ends timing the innermost stage. Resumes the enclosing stage, if any.
+  def end(self):
+    now = perf_counter()
+    name, since = self._stack.pop()
+    self.times[name] += now - since
+    if len(self._stack) > 0:
+      self._stack[-1][1] = now
+
+  ########
+  # Context manager timing a stage for the duration of a with block.
+  #   Params:
+  #     name : Key of the stage, from STAGES.
+  @contextmanager
+  def stage(self, name):
+    self.begin(name)
+    try:
+      yield self
+    finally:
+      self.end()
+
+  ########
+  # Increments a work counter.
+  #   Params:
+  #     name   : Key of the counter, from COUNTERS.
+  #     amount : Amount to add.
+  def count(self, name, amount = 1):
+    self.counts[name] += amount
+
+  ########
+  # Copies stage times from another set of stats, such as those collected
+  # while loading the scene.
+  #   Params:
+  #     other  : RenderStats to copy from.
+  #     stages : Keys of the stages to copy.
+  def merge_times(self, other, stages):
+    for name in stages:
+      self.times[name] = other.times[name]
+
+  ########
+  # Generates a flat dictionary of all results, suitable for JSON.
+  #   Returns: Dictionary of tags, total, stage times, and counters.
+  def as_dict(self):
+    res = dict(self.tags)
+    res["total"] = self.total
+    res.update(self.times)
+    res.update(self.counts)
+    return res
+
+  ########
+  # Appends the results to a file as a single line of JSON.
+  #   Params:
+  #     filename : File to append to.
+  def dump(self, filename):
+    with open(filename, 'a') as f:
+      f.write(json.dumps(self.as_dict()) + "\n")
+
+  ########
+  # Generates a multi-line report of the results.
+  #   Returns: String with one line per stage and counter.
+  def __str__(self):
+    return format_stats(self.as_dict())
+# RenderStats
+################
+
+########
+# Generates a multi-line report from a dictionary of render results.
+#   Params:
+#     stats : Dictionary as returned by RenderStats.as_dict().
+#   Returns: String with one line per stage and counter.
+def format_stats(stats):
+  total = max((stats["total"], 0.000001))
+  lines = ["Rendered in: {:.4f} sec".format(stats["total"])]
+  for key, label in RenderStats.STAGES:
+    if key in RenderStats.LOAD_STAGES: # not part of the render's total
+      lines.append("{:<15}{:>8.3f}s".format(label + ":", stats[key]))
+    else:
+      lines.append("{:<15}{:>8.3f}s ({:.0f}%)".format(label + ":",
+                                                    stats[key],
+                                                    100 * stats[key] / total))
+  for key, label in RenderStats.COUNTERS:
+    lines.append("{:<15}{:>9}".format(label + ":", stats[key]))
+  return "\n".join(lines)
+
+################
+# ProfileSession: Profiles the code run inside a with block, using both
+# cProfile and a sampling thread. The sampler periodically records the
+# call stack of the profiled thread, so the results show where time goes
+# along each call path rather than only per function. On exit, writes
+#   <basename>.pstats : cProfile results, readable with the pstats module
+#                       or tools such as snakeviz.
+#   <basename>.folded : One line per distinct call stack, with frames
+#                       separated by semicolons and followed by the number
+#                       of samples, as read by flamegraph.pl or speedscope.
+#   Members:
+#     basename : Path of output files, without extension.
+#     tags     : List of strings put at the root of every sampled stack,
+#                such as the scene name and resolution.
+#     interval : Seconds between samples.
+#     samples  : Dictionary of sample counts for each collapsed stack.
+#     _profile : cProfile.Profile in use.
+#     _target  : Thread identifier of the profiled thread.
+#     _done    : threading.Event set when profiling ends.
+#     _thread  : Sampling thread.
+class ProfileSession:
+
+  DEFAULT_INTERVAL = 0.001
+
+  ########
+  # Prepares a profiling session. Profiling starts when the with block is entered.
+  #   Params:
+  #     basename : Path of output files, without extension.
+  #     tags     : List of strings put at the root of every sampled stack.
+  #     interval : Seconds between samples. Samples can only be taken when the
+  #                profiled thread releases the interpreter, so the real
+  #                interval may be longer.
+  def __init__(self, basename, tags = None, interval = DEFAULT_INTERVAL):
+    self.basename = basename
+    if tags != None:
+      self.tags = [str(t).replace(";", ",") for t in tags]
+    else:
+      self.tags = []
+    self.interval = interval
+    self.samples = {}
+    self._profile = None
+    self._target = None
+    self._done = None
+    self._thread = None
+
+  ########
+  # Starts the profiler and sampling thread.
+  #   Returns: This session.
+  def __enter__(self):
+    self.samples = {}
+    self._target = threading.get_ident()
+    self._done = threading.Event()
+    self._thread = threading.Thread(target = self._sample_loop, daemon = True)
+    self._thread.start()
+    self._profile = cProfile.Profile()
+    self._profile.enable()
+    return self
+
+  ########
+  # Stops profiling and writes the output files.
+  def __exit__(self, *excInfo):
+    self._profile.disable()
+    self._done.set()
+    self._thread.join()
+
+    folder = os.path.dirname(self.basename)
+    if folder != "" and not os.path.isdir(folder):
+      os.makedirs(folder)
+    self._profile.dump_stats(self.basename + ".pstats")
+    with open(self.basename + ".folded", 'w') as f:
+      for stack, count in sorted(self.samples.items()):
+        f.write("{} {}\n".format(stack, count))
+    return False
+
+  ########
+  # Records the profiled thread's call stack until profiling ends.
+  def _sample_loop(self):
+    while not self._done.wait(self.interval):
+      frame = sys._current_frames().get(self._target)
+      if frame == None:
+        continue
+      stack = []
+      while frame != None:
+        code = frame.f_code
+        stack.append("{} ({}:{})".format(code.co_name,
+                                         os.path.basename(code.co_filename),
+                                         code.co_firstlineno))
+        frame = frame.f_back
+      stack.reverse()
+      key = ";".join(self.tags + stack)
+      self.samples[key] = self.samples.get(key, 0) + 1
+# ProfileSession
+################
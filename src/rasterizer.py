@@ -27,7 +27,7 @@ except Exception:
   print("ERROR: Could not import 'PIL' library. Is pillow installed?")
   fail = True
 try:
-  from time import clock
+  from time import perf_counter
 except Exception:
   print("ERROR: Could not import 'time' module.")
   fail = True
@@ -35,6 +35,125 @@ if fail:
   input("Press ENTER to close this window.")
   exit()
 
+# width and height of the screen tiles used by rasterize_binned()
+TILE_SIZE = 32
+
+# number of (triangle, sample) pairs rasterize_binned() evaluates at once
+BATCH_ELEMENTS = 2 ** 17
+
+# offsets from the pixel center of the samples taken for each supported
+# number of samples per pixel (standard MSAA patterns)
+SAMPLE_PATTERNS = {1: ((0, 0),),
+                   2: ((0.25, 0.25), (-0.25, -0.25)),
+                   4: ((-0.125, -0.375), (0.375, -0.125), (-0.375, 0.125), (0.125, 0.375)),
+                   8: ((0.0625, -0.1875), (-0.0625, 0.1875), (0.3125, 0.0625), (-0.1875, -0.3125),
+                       (-0.3125, 0.3125), (-0.4375, -0.0625), (0.1875, 0.4375), (0.4375, -0.4375))}
+
+################
+# TriangleSetup: Constants needed to rasterize a batch of triangles, computed
+# in closed form for every triangle at once. At a pixel (x, y), each
+# barycentric weight and the depth are linear functions
+# xStep * x + yStep * y + const, so rasterizers only need to add steps.
+#   Members:
+#     count              : Number of triangles in the batch.
+#     valid              : Boolean array, False for triangles that are degenerate
+#                          (zero area) or cover no pixel centers.
+#     bounds             : Integer array of shape (count, 4) of the first and last
+#                          pixel columns and rows (minX, minY, maxX, maxY) that
+#                          may be covered, clipped to the canvas.
+#     alpha, beta, gamma : Arrays of shape (count, 3) of (xStep, yStep, const) of
+#                          the barycentric weights of the first, second, and
+#                          third corners.
+#     depth              : Array of shape (count, 3) of (xStep, yStep, const) of
+#                          depth.
+#     invW               : Array of shape (count, 3) of each corner's 1/w. Weighting
+#                          alpha, beta, and gamma by these and dividing by their sum
+#                          interpolates attributes with correct perspective.
+#     nearest            : Array of the largest (closest) corner depth of each triangle.
+#     _rows              : Cached per-triangle lists used by triangle(), None until needed.
+class TriangleSetup:
+
+  # triangles with less than this much area (in pixels) are degenerate
+  MIN_AREA = 0.000000001
+
+  ########
+  # Computes the constants of a batch of triangles. Depth is interpolated
+  # linearly across the canvas, so it should be a value that is linear in
+  # screen space, such as 1/w.
+  #   Params:
+  #     x, y, z       : Arrays of shape (count, 3) of canvas coordinates and depth
+  #                     of each triangle's corners.
+  #     width, height : Size of the canvas in pixels.
+  #     invW          : Array of shape (count, 3) of 1/w of each triangle's corners,
+  #                     from the perspective divide. If None, attributes are
+  #                     interpolated linearly across the canvas.
+  #     margin        : Distance in pixels to widen bounds by, so that samples
+  #                     taken away from pixel centers are included.
+  def __init__(self, x, y, z, width, height, invW = None, margin = 0):
+    x = asarray(x, dtype = float64).reshape((-1, 3))
+    y = asarray(y, dtype = float64).reshape((-1, 3))
+    z = asarray(z, dtype = float64).reshape((-1, 3))
+    if invW is None:
+      self.invW = ones(x.shape)
+    else:
+      self.invW = abs(asarray(invW, dtype = float64).reshape((-1, 3)))
+    x1, x2, x3 = x[:, 0], x[:, 1], x[:, 2]
+    y1, y2, y3 = y[:, 0], y[:, 1], y[:, 2]
+    self.count = len(x)
+
+    # twice the signed area
+    area = (x2 - x1) * (y3 - y1) - (x3 - x1) * (y2 - y1)
+    degenerate = abs(area) < 2 * TriangleSetup.MIN_AREA
+    area = where(degenerate, 1, area) # avoid dividing by zero
+
+    # pixels are sampled at integer coordinates
+    self.bounds = stack((maximum(ceil(x.min(axis = 1) - margin), 0),
+                         maximum(ceil(y.min(axis = 1) - margin), 0),
+                         minimum(floor(x.max(axis = 1) + margin), width - 1),
+                         minimum(floor(y.max(axis = 1) + margin), height - 1)), axis = 1).astype(int)
+    self.valid = (~degenerate &
+                  (self.bounds[:, 0] <= self.bounds[:, 2]) &
+                  (self.bounds[:, 1] <= self.bounds[:, 3]))
+
+    # each weight is the area of the triangle opposite its corner
+    self.alpha = stack(((y2 - y3) / area, (x3 - x2) / area, (x2 * y3 - x3 * y2) / area), axis = 1)
+    self.beta = stack(((y3 - y1) / area, (x1 - x3) / area, (x3 * y1 - x1 * y3) / area), axis = 1)
+    self.gamma = stack(((y1 - y2) / area, (x2 - x1) / area, (x1 * y2 - x2 * y1) / area), axis = 1)
+    self.depth = (self.alpha * z[:, 0:1] +
+                  self.beta * z[:, 1:2] +
+                  self.gamma * z[:, 2:3])
+    self.nearest = z.max(axis = 1)
+    self._rows = None
+
+  ########
+  # Looks up the constants of one triangle as plain numbers, for use in
+  # per-pixel loops.
+  #   Params:
+  #     index : Index of the triangle in the batch.
+  #   Returns: List of minX, minY, maxX, maxY, followed by (xStep, yStep, const)
+  #            of alpha, beta, gamma, and depth, followed by invW of the corners.
+  def triangle(self, index):
+    if self._rows is None:
+      self._rows = hstack((self.bounds, self.alpha, self.beta, self.gamma, self.depth, self.invW)).tolist()
+      for row in self._rows:
+        row[0:4] = [int(v) for v in row[0:4]]
+    return self._rows[index]
+# TriangleSetup
+################
+
+########
+# Computes the setup of a single triangle given by its corners.
+#   Params:
+#     p1, p2, p3    : Corners of triangle in canvas coordinates.
+#     width, height : Size of the canvas in pixels.
+#   Returns: TriangleSetup of one triangle.
+def setup_triangle(p1, p2, p3, width, height):
+  return TriangleSetup(x = (p1.x, p2.x, p3.x),
+                       y = (p1.y, p2.y, p3.y),
+                       z = (p1.z, p2.z, p3.z),
+                       width = width,
+                       height = height)
+
 ########
 # Renders a triangle in the provided zBuffer. Ported and modified from
 # assignment 2 submission. Rasterized pixels only overwrite points with
@@ -44,62 +163,28 @@ if fail:
 #     c1, c2, c3 : Colors of p1, p2, and p3, respectively.
 #                  Should be 3-tuple of RGB values between 0 and 1.
 #     zBuffer    : zBuffer to use when rasterizing triangle.
-def render_triangle(p1, p2, p3, c1, c2, c3, zBuffer):
-
-  # obtain min and max coordinates
-  xArr = (int(p1.x), int(p2.x), int(p3.x))
-  yArr = (int(p1.y), int(p2.y), int(p3.y))
-  minX = min(xArr)
-  minY = min(yArr)
-  if minX < 0:
-    minX = 0
-  if minY < 0:
-    minY = 0
-  maxX = max(xArr)
-  maxY = max(yArr)
-  if maxX > len(zBuffer) - 1:
-    maxX = len(zBuffer) - 1
-  if maxY > len(zBuffer[0]) - 1:
-    maxY = len(zBuffer[0]) - 1 
-
-  # calculate x-mul, y-mul, and offset for z value
-  temp = mat([[p1.x, p1.y, 1],
-              [p2.x, p2.y, 1],
-              [p3.x, p3.y, 1]])
-  zMat = mat([[p1.z],
-              [p2.z],
-              [p3.z]])
-
-  resMat = linalg.inv(temp) * zMat
-  xZinc = resMat.item((0,0))
-  yZinc = resMat.item((1,0))
-  zInit = resMat.item((2,0)) + xZinc * minX + yZinc * minY # init to lower
-
-  # calculate coefficients & constants
-  f12xStep = p1.y - p2.y
-  f23xStep = p2.y - p3.y
-  f31xStep = p3.y - p1.y
-  f12yStep = p2.x - p1.x
-  f23yStep = p3.x - p2.x
-  f31yStep = p1.x - p3.x
-
-  f12Const = p1.x * p2.y - p2.x * p1.y
-  f23Const = p2.x * p3.y - p3.x * p2.y
-  f31Const = p3.x * p1.y - p1.x * p3.y
-  f23_1 = f23xStep * p1.x + f23yStep * p1.y + f23Const
-  f31_2 = f31xStep * p2.x + f31yStep * p2.y + f31Const
-  f12_3 = f12xStep * p3.x + f12yStep * p3.y + f12Const
-
-  # pre-calculate alpha, beta, gamma constants
-  alphaYstep = f23yStep / f23_1
-  alphaXstep = f23xStep / f23_1
-  alphaInit = alphaXstep * minX + alphaYstep * minY + f23Const / f23_1
-  betaYstep = f31yStep / f31_2
-  betaXstep = f31xStep / f31_2
-  betaInit = betaXstep * minX + betaYstep * minY + f31Const / f31_2
-  gammaYstep = f12yStep / f12_3
-  gammaXstep = f12xStep / f12_3
-  gammaInit = gammaXstep * minX + gammaYstep * minY + f12Const / f12_3
+#     setup      : TriangleSetup holding this triangle, if already computed.
+#     index      : Index of this triangle in setup.
+#   Returns: Number of pixels written.
+def render_triangle(p1, p2, p3, c1, c2, c3, zBuffer, setup = None, index = 0):
+  written = 0
+
+  if setup == None:
+    setup = setup_triangle(p1, p2, p3, len(zBuffer), len(zBuffer[0]))
+  if not setup.valid[index]: # degenerate or too small to cover a pixel
+    return 0
+  (minX, minY, maxX, maxY,
+   alphaXstep, alphaYstep, alphaConst,
+   betaXstep, betaYstep, betaConst,
+   gammaXstep, gammaYstep, gammaConst,
+   xZinc, yZinc, zConst,
+   w1, w2, w3) = setup.triangle(index)
+
+  # start at lower corner of bounding box
+  alphaInit = alphaXstep * minX + alphaYstep * minY + alphaConst
+  betaInit = betaXstep * minX + betaYstep * minY + betaConst
+  gammaInit = gammaXstep * minX + gammaYstep * minY + gammaConst
+  zInit = xZinc * minX + yZinc * minY + zConst
   
   # must provide minimum value because of float imprecision
   minVal = -0.00000001
@@ -114,10 +199,16 @@ def render_triangle(p1, p2, p3, c1, c2, c3, zBuffer):
     for x in range(minX, maxX + 1):
       
       if alpha >= minVal and beta >= minVal and gamma >= minVal:
-        color = [int(c1[i] * alpha + c2[i] * beta + c3[i] * gamma) for i in range(3)]
+        # weight by 1/w so colors follow the surface rather than the screen
+        a = alpha * w1
+        b = beta * w2
+        g = gamma * w3
+        total = a + b + g
+        color = [int((c1[i] * a + c2[i] * b + c3[i] * g) / total) for i in range(3)]
 
         if zBuffer[x][y] == None or zBuffer[x][y][0] < zVal:
           zBuffer[x][y] = [zVal] + color # TODO: put z calculation here
+          written += 1
       alpha += alphaXstep
       beta += betaXstep
       gamma += gammaXstep
@@ -129,6 +220,269 @@ def render_triangle(p1, p2, p3, c1, c2, c3, zBuffer):
 
     zInit += yZinc
 
+  return written
+
+
+################
+# GBuffer: Per-pixel surface attributes written by render_triangle_attributes()
+# for deferred shading. Arrays are indexed [y, x].
+#   Members:
+#     width, height : Size of the buffer in pixels.
+#     depth         : Depth of the nearest surface. Larger values are closer.
+#     position      : View-space position of the nearest surface.
+#     normal        : View-space unit normal of the nearest surface.
+#     color         : Base RGB color of the nearest surface, between 0 and 1.
+#     objId         : Index of the object owning the nearest surface, -1 if empty.
+class GBuffer:
+
+  ########
+  # Creates an empty G-buffer.
+  #   Params:
+  #     width, height : Size of the buffer in pixels.
+  def __init__(self, width, height):
+    self.width = int(width)
+    self.height = int(height)
+    self.depth = full((self.height, self.width), -inf)
+    self.position = zeros((self.height, self.width, 3))
+    self.normal = zeros((self.height, self.width, 3))
+    self.color = zeros((self.height, self.width, 3))
+    self.objId = full((self.height, self.width), -1, dtype = int)
+# GBuffer
+################
+
+########
+# Renders a triangle's surface attributes into a G-buffer for deferred
+# shading. Coverage and depth match render_triangle(), but all pixels of the
+# bounding box are evaluated at once. Rasterized pixels only overwrite
+# points with lower depth values.
+#   Params:
+#     p1, p2, p3 : Corners of triangle in canvas coordinates.
+#     v1, v2, v3 : View-space positions of p1, p2, and p3, respectively.
+#     normal     : View-space unit normal of the triangle.
+#     color      : Base color of the triangle as an RGB 3-tuple between 0 and 1.
+#     objId      : Index of the object the triangle belongs to.
+#     gBuffer    : GBuffer to rasterize into.
+#     setup      : TriangleSetup holding this triangle, if already computed.
+#     index      : Index of this triangle in setup.
+#   Returns: Number of pixels written.
+def render_triangle_attributes(p1, p2, p3, v1, v2, v3, normal, color, objId, gBuffer, setup = None, index = 0):
+
+  if setup == None:
+    setup = setup_triangle(p1, p2, p3, gBuffer.width, gBuffer.height)
+  if not setup.valid[index]: # degenerate or too small to cover a pixel
+    return 0
+  minX, minY, maxX, maxY = setup.triangle(index)[0:4]
+
+  # barycentric coordinates over the bounding box, shape (rows, columns)
+  xs = arange(minX, maxX + 1)[newaxis, :]
+  ys = arange(minY, maxY + 1)[:, newaxis]
+  aX, aY, aC = setup.alpha[index]
+  bX, bY, bC = setup.beta[index]
+  gX, gY, gC = setup.gamma[index]
+  alpha = aX * xs + aY * ys + aC
+  beta = bX * xs + bY * ys + bC
+  gamma = gX * xs + gY * ys + gC
+
+  # must provide minimum value because of float imprecision
+  minVal = -0.00000001
+  zX, zY, zC = setup.depth[index]
+  zVal = zX * xs + zY * ys + zC
+  region = (slice(minY, maxY + 1), slice(minX, maxX + 1))
+  write = ((alpha >= minVal) & (beta >= minVal) & (gamma >= minVal) &
+           (gBuffer.depth[region] < zVal))
+
+  gBuffer.depth[region][write] = zVal[write]
+
+  # weight by 1/w so positions follow the surface rather than the screen
+  w1, w2, w3 = setup.invW[index]
+  a = alpha[write] * w1
+  b = beta[write] * w2
+  g = gamma[write] * w3
+  total = (a + b + g)[:, newaxis]
+  gBuffer.position[region][write] = (a[:, newaxis] * (v1.x, v1.y, v1.z) +
+                                     b[:, newaxis] * (v2.x, v2.y, v2.z) +
+                                     g[:, newaxis] * (v3.x, v3.y, v3.z)) / total
+  gBuffer.normal[region][write] = (normal.x, normal.y, normal.z)
+  gBuffer.color[region][write] = color
+  gBuffer.objId[region][write] = objId
+  return int(write.sum())
+
+########
+# Sorts a batch of triangles into the square screen tiles they overlap.
+# Within each tile, triangles are ordered nearest first, and triangles
+# equally near in the order they are drawn.
+#   Params:
+#     setup         : TriangleSetup of the batch. Only valid triangles are binned.
+#     width, height : Size of the canvas in pixels.
+#     tileSize      : Width and height of a tile in pixels.
+#     drawOrder     : Integer array of the position of each triangle in drawing
+#                     order, or None to draw them in the order of the batch.
+#   Returns: Tuple of (tiles, tris, starts). tiles holds the index
+#            (row * columns + column) of every tile with triangles, in
+#            increasing order. tris holds triangle indexes grouped by tile,
+#            and the triangles of tiles[i] are tris[starts[i]:starts[i + 1]].
+def bin_triangles(setup, width, height, tileSize = TILE_SIZE, drawOrder = None):
+  if drawOrder is None:
+    drawOrder = arange(setup.count)
+  columns = (int(width) + tileSize - 1) // tileSize
+  valid = nonzero(setup.valid)[0]
+  bounds = setup.bounds[valid] // tileSize # first and last tile column and row
+  spanX = bounds[:, 2] - bounds[:, 0] + 1
+  spanY = bounds[:, 3] - bounds[:, 1] + 1
+
+  # one entry per (triangle, tile) pair
+  counts = spanX * spanY
+  tris = repeat(valid, counts)
+  first = repeat(cumsum(counts) - counts, counts)
+  offset = arange(len(tris)) - first # position of the tile within each triangle's span
+  span = repeat(spanX, counts)
+  tileX = repeat(bounds[:, 0], counts) + offset % span
+  tileY = repeat(bounds[:, 1], counts) + offset // span
+  tileIds = tileY * columns + tileX
+
+  # by tile, then nearest first, then first drawn
+  order = lexsort((drawOrder[tris], -setup.nearest[tris], tileIds))
+  tris = tris[order]
+  tileIds = tileIds[order]
+  tiles, starts = unique(tileIds, return_index = True)
+  return (tiles, tris, append(starts, len(tris)))
+
+########
+# Rasterizes a whole batch of triangles at once, one screen tile at a time.
+# Every triangle overlapping a tile is tested against every pixel of the
+# tile in a single array operation, and each pixel keeps the nearest one.
+# As in render_triangle(), of triangles at the same depth the one drawn
+# first is kept, so coplanar surfaces resolve as they do when drawn one by
+# one. With one sample per pixel, coverage and depth match render_triangle().
+# With more, pixels are first tested at their centers against each edge
+# widened by the sample spread. Only pixels crossed by an edge are then
+# tested at every sample; the rest take the result of their center.
+#   Params:
+#     setup         : TriangleSetup of the batch. Its margin must reach the
+#                     farthest sample from the pixel center.
+#     width, height : Size of the canvas in pixels.
+#     tileSize      : Width and height of a tile in pixels.
+#     samples       : Number of samples per pixel. One of SAMPLE_PATTERNS.
+#     drawOrder     : Integer array of the position of each triangle in drawing
+#                     order, or None to draw them in the order of the batch.
+#   Returns: Tuple of (winners, depthBuffer), arrays of shape
+#            (height, width, samples) holding the index of the nearest
+#            triangle at each sample (-1 if empty) and its depth (-inf if empty).
+def rasterize_binned(setup, width, height, tileSize = TILE_SIZE, samples = 1, drawOrder = None):
+  if drawOrder is None:
+    drawOrder = arange(setup.count)
+  last = iinfo(drawOrder.dtype).max # drawn after every triangle
+  width = int(width)
+  height = int(height)
+  columns = (width + tileSize - 1) // tileSize
+  offsets = array(SAMPLE_PATTERNS[samples], dtype = float64).T[:, newaxis, :] # x and y, each (1, samples)
+  depthBuffer = full((height, width, samples), -inf)
+  winners = full((height, width, samples), -1, dtype = int)
+
+  # must provide minimum value because of float imprecision
+  minVal = -0.00000001
+
+  tiles, tris, starts = bin_triangles(setup, width, height, tileSize, drawOrder = drawOrder)
+  chunk = max((1, BATCH_ELEMENTS // (tileSize * tileSize)))
+  for i in range(len(tiles)):
+    x0 = (tiles[i] % columns) * tileSize
+    y0 = (tiles[i] // columns) * tileSize
+    x1 = min((x0 + tileSize, width))
+    y1 = min((y0 + tileSize, height))
+    ys, xs = mgrid[y0:y1, x0:x1]
+    xs = xs.reshape((1, -1))
+    ys = ys.reshape((1, -1))
+    best = full((xs.shape[1], samples), -inf)
+    winner = full((xs.shape[1], samples), -1, dtype = int)
+
+    for c in range(starts[i], starts[i + 1], chunk):
+      batch = tris[c : min((c + chunk, starts[i + 1]))]
+      # batch is nearest first, so stop once the tile is covered by nearer surfaces
+      if best.min() > setup.nearest[batch[0]]:
+        break
+
+      # weights and depth at pixel centers, one row per triangle
+      planes = [setup.alpha[batch], setup.beta[batch], setup.gamma[batch], setup.depth[batch]]
+      centers = [p[:, 0:1] * xs + p[:, 1:2] * ys + p[:, 2:3] for p in planes]
+      if samples == 1:
+        inside = (centers[0] >= minVal) & (centers[1] >= minVal) & (centers[2] >= minVal)
+        edges = []
+      else:
+        # change of each plane from the center to each sample
+        steps = [p[:, 0:1] * offsets[0] + p[:, 1:2] * offsets[1] for p in planes]
+        spread = [abs(step).max(axis = 1)[:, newaxis] for step in steps[0:3]]
+        inside = ((centers[0] >= minVal + spread[0]) &
+                  (centers[1] >= minVal + spread[1]) &
+                  (centers[2] >= minVal + spread[2]))
+        touched = ((centers[0] >= minVal - spread[0]) &
+                   (centers[1] >= minVal - spread[1]) &
+                   (centers[2] >= minVal - spread[2]))
+        edges = nonzero((touched & ~inside).any(axis = 0))[0]
+
+      depth = where(inside, centers[3], -inf)
+      drawn = drawOrder[batch][:, newaxis]
+      nearest = where(depth == depth.max(axis = 0), drawn, last).argmin(axis = 0) # first drawn of the nearest
+      nearestDepth = repeat(depth[nearest, arange(depth.shape[1])][:, newaxis], samples, axis = 1)
+      nearest = repeat(batch[nearest][:, newaxis], samples, axis = 1)
+
+      if len(edges) > 0: # test pixels crossed by an edge at every sample
+        pix, tri = nonzero(touched[:, edges].T) # pairs of edge pixel and triangle touching it, by pixel
+        sampled = [center[tri, edges[pix]][:, newaxis] + step[tri] for center, step in zip(centers, steps)]
+        depth = where((sampled[0] >= minVal) & (sampled[1] >= minVal) & (sampled[2] >= minVal),
+                      sampled[3], -inf)
+        edgeDepth = maximum.reduceat(depth, nonzero(diff(pix, prepend = -1))[0], axis = 0)
+        rows, cols = nonzero((depth == edgeDepth[pix]) & (depth > -inf))
+        later = argsort(-drawOrder[batch[tri[rows]]], kind = "stable") # first drawn is written last, so kept
+        rows = rows[later]
+        cols = cols[later]
+        nearestDepth[edges] = edgeDepth
+        nearest[edges] = -1
+        nearest[edges[pix[rows]], cols] = batch[tri[rows]]
+
+      closer = nearestDepth > best
+      closer |= ((nearestDepth == best) & (winner >= 0) & (nearest >= 0) &
+                 (drawOrder[nearest] < drawOrder[winner])) # same depth, but drawn first
+      best[closer] = nearestDepth[closer]
+      winner[closer] = nearest[closer]
+
+    depthBuffer[y0:y1, x0:x1] = best.reshape((y1 - y0, x1 - x0, samples))
+    winners[y0:y1, x0:x1] = winner.reshape((y1 - y0, x1 - x0, samples))
+  return (winners, depthBuffer)
+
+########
+# Colors the pixels of a rasterized batch by interpolating the corner colors
+# of the triangles visible at each pixel, as render_triangle() does. Each
+# distinct triangle is interpolated once per pixel, at its center, and
+# weighted by the number of samples it covers (a box filter), with empty
+# samples counting as black.
+#   Params:
+#     setup   : TriangleSetup of the batch.
+#     winners : Array of shape (height, width, samples) of triangle indexes,
+#               as returned by rasterize_binned().
+#     colors  : Array of shape (count, 3, 3) of the RGB colors of each
+#               triangle's corners, 0-255.
+#   Returns: Array of shape (height, width, 3) of 8-bit RGB colors.
+def interpolate_colors(setup, winners, colors):
+  samples = winners.shape[2]
+  total = zeros(winners.shape[0:2] + (3,), dtype = int)
+
+  # the first sample's triangle, plus any other sample showing a different one
+  distinct = winners >= 0
+  distinct[:, :, 1:] &= winners[:, :, 1:] != winners[:, :, 0:1]
+  counts = where(distinct, 1, 0)
+  counts[:, :, 0] = (winners == winners[:, :, 0:1]).sum(axis = 2)
+
+  ys, xs, ss = nonzero(distinct)
+  t = winners[ys, xs, ss]
+  w = setup.invW[t] # weight by 1/w so colors follow the surface
+  weights = stack(((setup.alpha[t, 0] * xs + setup.alpha[t, 1] * ys + setup.alpha[t, 2]) * w[:, 0],
+                   (setup.beta[t, 0] * xs + setup.beta[t, 1] * ys + setup.beta[t, 2]) * w[:, 1],
+                   (setup.gamma[t, 0] * xs + setup.gamma[t, 1] * ys + setup.gamma[t, 2]) * w[:, 2]),
+                  axis = 1)
+  weights /= weights.sum(axis = 1)[:, newaxis]
+  color = clip((weights[:, :, newaxis] * colors[t]).sum(axis = 1), 0, 255).astype(int)
+  add.at(total, (ys, xs), color * counts[ys, xs, ss][:, newaxis])
+  return ((total + samples // 2) // samples).astype(uint8)
 
 ########
 # Main code architecture if run standalone.
@@ -151,7 +505,7 @@ if __name__ == "__main__":
   zBuffer = []
   for x in range(500):
     zBuffer.append([None]*300)
-  start = clock()
+  start = perf_counter()
   render_triangle(p1 = p1,
                   p2 = p2,
                   p3 = p3,
@@ -166,15 +520,15 @@ if __name__ == "__main__":
                   c2 = c5,
                   c3 = c6,
                   zBuffer = zBuffer)
-  elapsed = clock() - start
+  elapsed = perf_counter() - start
   print("Render took {:.3f}s.".format(elapsed))
-  start = clock()
+  start = perf_counter()
   img = Image.new(mode = 'RGB', size = (500,500))
   for x in range(500):
     for y in range(500):
       if zBuffer[x][y] != None:
         img.putpixel(xy=(x,y),value=tuple(zBuffer[x][y][1:]))
-  elapsed = clock() - start
+  elapsed = perf_counter() - start
   print("Pixels tool {:.3f}s.".format(elapsed))
   img.save('test.png')
 
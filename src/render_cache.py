@@ -0,0 +1,214 @@
+################################
+# render_cache.py
+# Noah Ansel
+# nba38
+# 2016-11-17
+# ------------------------------
+# Keeps rendered images so that the same scene, seen from the same camera
+# with the same options, is only rendered once. Images are held in memory
+# and optionally in a directory, so they outlast the program.
+################################
+
+# import validation
+fail = False
+try:
+  from PIL import Image
+except Exception:
+  print("ERROR: Could not import 'PIL' module. Is pillow installed?")
+  fail = True
+try:
+  import hashlib
+  import os
+  from collections import OrderedDict
+except Exception:
+  print("ERROR: Could not import 'hashlib', 'os', or 'collections' modules.")
+  fail = True
+if fail:
+  input("Press ENTER to close this window.")
+  exit()
+
+
+########
+# Summarizes everything in a parsed scene that affects how it looks, so two
+# scenes with the same objects and lights give the same key whichever file
+# or format they were read from.
+#   Params:
+#     objects : List of SceneObjects, as returned by parse_scene().
+#     lights  : List of Lights, as returned by parse_scene().
+#   Returns: String of hexadecimal digits.
+def scene_key(objects, lights):
+  digest = hashlib.sha1()
+  for obj in objects:
+    mesh = obj.mesh
+    digest.update(repr((mesh.shape, float(mesh.size), tuple(float(c) for c in mesh.color), mesh.resolution,
+                        float(obj.scale.x), float(obj.scale.y), float(obj.scale.z),
+                        float(obj.offset.x), float(obj.offset.y), float(obj.offset.z),
+                        float(obj.rotation.phi), float(obj.rotation.theta),
+                        float(obj.specular), float(obj.diffuse))).encode())
+  digest.update(b"lights")
+  for light in lights:
+    digest.update(repr((float(light.loc.x), float(light.loc.y), float(light.loc.z),
+                        tuple(float(c) for c in light.color))).encode())
+  return digest.hexdigest()
+
+
+################
+# RenderCache: Holds rendered images by key. The most recently used images
+# are kept in memory, and every image is also saved to a directory if one
+# is given, which is trimmed to a size limit by removing the images used
+# least recently.
+#   Members:
+#     maxEntries : Most images kept in memory.
+#     directory  : Directory images are saved in, or None to keep them in memory only.
+#     maxBytes   : Most bytes of images kept in directory.
+#     hits       : Number of lookups that found an image.
+#     misses     : Number of lookups that did not.
+class RenderCache:
+
+  # raise when a change to the renderer changes its images, so images saved
+  # by earlier versions are not used
+  VERSION = 1
+
+  DEFAULT_ENTRIES = 32
+  DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+  EXTENSION = ".png"
+
+  ########
+  # Creates a cache. If a directory is given, images already saved there
+  # can be used at once.
+  #   Params:
+  #     maxEntries : Most images kept in memory.
+  #     directory  : Directory to save images in, created if missing, or None.
+  #     maxBytes   : Most bytes of images kept in directory.
+  def __init__(self, maxEntries = DEFAULT_ENTRIES, directory = None, maxBytes = DEFAULT_MAX_BYTES):
+    self.maxEntries = maxEntries
+    self.directory = directory
+    self.maxBytes = maxBytes
+    self.hits = 0
+    self.misses = 0
+    self._memory = OrderedDict() # key -> image, least recently used first
+    self._files = OrderedDict()  # key -> bytes on disk, least recently used first
+    self._fileBytes = 0
+
+    if directory != None:
+      os.makedirs(directory, exist_ok = True)
+      found = []
+      for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(RenderCache.EXTENSION):
+          info = entry.stat()
+          found.append((info.st_mtime, entry.name[:-len(RenderCache.EXTENSION)], info.st_size))
+      for mtime, key, size in sorted(found):
+        self._files[key] = size
+        self._fileBytes += size
+      self._trim_files()
+
+  ########
+  # Generates the key of a render from everything that affects its image.
+  #   Params:
+  #     sceneKey : Key of the scene, as returned by scene_key().
+  #     *options : Camera, size, and render options, as numbers, strings,
+  #                booleans, or tuples of these.
+  #   Returns: String of hexadecimal digits.
+  @staticmethod
+  def make_key(sceneKey, *options):
+    return hashlib.sha1(repr((RenderCache.VERSION, sceneKey) + options).encode()).hexdigest()
+
+  ########
+  # Looks up an image, first in memory and then in the directory.
+  #   Params:
+  #     key : Key of the render. See make_key().
+  #   Returns: Copy of the image, or None if it is not held.
+  def get(self, key):
+    if key in self._memory:
+      self._memory.move_to_end(key)
+      self.hits += 1
+      return self._memory[key].copy()
+
+    if key in self._files:
+      path = self._path(key)
+      try:
+        with Image.open(path) as f:
+          image = f.convert("RGB")
+        os.utime(path) # most recently used
+      except OSError: # removed or damaged since
+        self._forget_file(key)
+      else:
+        self._files.move_to_end(key)
+        self._remember(key, image)
+        self.hits += 1
+        return image.copy()
+
+    self.misses += 1
+    return None
+
+  ########
+  # Adds an image, replacing any held under the same key.
+  #   Params:
+  #     key   : Key of the render. See make_key().
+  #     image : PIL.Image to keep. It is copied, so may be changed afterwards.
+  def put(self, key, image):
+    image = image.copy()
+    self._remember(key, image)
+    if self.directory == None:
+      return
+
+    path = self._path(key)
+    partial = path + ".part" # never leave a half-written image under its key
+    try:
+      image.save(partial, format = "PNG", compress_level = 1)
+      os.replace(partial, path)
+    except OSError as e:
+      print("ERROR: Could not save '{}' to the render cache: {}".format(path, e))
+      return
+    if key in self._files:
+      self._fileBytes -= self._files.pop(key)
+    self._files[key] = os.path.getsize(path)
+    self._fileBytes += self._files[key]
+    self._trim_files()
+
+  ########
+  # Removes every image from memory and from the directory.
+  def clear(self):
+    self._memory.clear()
+    for key in list(self._files):
+      self._forget_file(key)
+
+  ########
+  # Adds an image to memory, removing the least recently used past maxEntries.
+  #   Params:
+  #     key   : Key of the render.
+  #     image : PIL.Image to keep.
+  def _remember(self, key, image):
+    self._memory[key] = image
+    self._memory.move_to_end(key)
+    while len(self._memory) > self.maxEntries:
+      self._memory.popitem(last = False)
+
+  ########
+  # Removes the least recently used images from the directory until it
+  # holds no more than maxBytes.
+  def _trim_files(self):
+    while self._fileBytes > self.maxBytes and len(self._files) > 0:
+      self._forget_file(next(iter(self._files)))
+
+  ########
+  # Removes one image from the directory.
+  #   Params:
+  #     key : Key of the render.
+  def _forget_file(self, key):
+    self._fileBytes -= self._files.pop(key)
+    try:
+      os.remove(self._path(key))
+    except OSError: # already gone
+      pass
+
+  ########
+  # Finds the file of an image in the directory.
+  #   Params:
+  #     key : Key of the render.
+  #   Returns: Path of the file.
+  def _path(self, key):
+    return os.path.join(self.directory, key + RenderCache.EXTENSION)
+# RenderCache
+################
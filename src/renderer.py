@@ -0,0 +1,1317 @@
+################################
+# renderer.py
+# Noah Ansel
+# nba38
+# 2016-11-17
+# ------------------------------
+# Main rendering class. All render code except rasterization
+# and matrix generation is contained in this class. Does not
+# depend on Tkinter, so scenes can be rendered without a window.
+################################
+
+# import validation
+fail = False
+try:
+  from PIL import Image
+except Exception:
+  print("ERROR: Could not import 'PIL' module. Is pillow installed?")
+  fail = True
+try:
+  from profiler import RenderStats, ProfileSession, format_stats
+except Exception:
+  print("ERROR: Could not import 'profiler' module. Is it in this folder?")
+  fail = True
+
+try:
+  from model_creator import *
+except Exception:
+  print("ERROR: Could not import 'model_creator' module. Is it in this folder?")
+  fail = True
+try:
+  from transforms import *
+except Exception:
+  print("ERROR: Could not import 'transforms' module. Is it in this folder?")
+  fail = True
+try:
+  from rasterizer import *
+except Exception:
+  print("ERROR: Could not import 'rasterizer' module. Is it in this folder?")
+  fail = True
+try:
+  from scene_parser import *
+except Exception:
+  print("ERROR: Could not import 'scene_parser' module. Is it in this folder?")
+  fail = True
+try:
+  from culling import *
+except Exception:
+  print("ERROR: Could not import 'culling' module. Is it in this folder?")
+  fail = True
+try:
+  from exporter import PngRowWriter
+except Exception:
+  print("ERROR: Could not import 'exporter' module. Is it in this folder?")
+  fail = True
+try:
+  from render_cache import RenderCache, scene_key
+except Exception:
+  print("ERROR: Could not import 'render_cache' module. Is it in this folder?")
+  fail = True
+if fail:
+  input("Press ENTER to close this window.")
+  exit()
+
+
+########
+# Looks up the transformation matrices of a model from its placement.
+# See model_matrix(). Matrices are kept on the object with the placement
+# they were made for, so they are only made again once it moves.
+#   Params:
+#     obj : SceneObject to place in the world.
+#   Returns: Tuple of (model, inverse, normal) matrices.
+def object_matrices(obj):
+  placement = (obj.offset.x, obj.offset.y, obj.offset.z,
+               obj.rotation.theta, obj.rotation.phi,
+               obj.scale.x, obj.scale.y, obj.scale.z)
+  if obj.matrices == None or obj.matrices[0] != placement:
+    obj.matrices = (placement, model_matrix(offset = placement[0:3],
+                                            rotation = placement[3:5],
+                                            scale = placement[5:8]))
+  return obj.matrices[1]
+
+
+################
+# LightingCache: Remembers the lighting of triangle corners that does not
+# depend on where the camera is, so it is worked out once for a sequence
+# of renders of a scene that does not move.
+#   Members:
+#     keys : Sorted integer array of the corners held. See corner_keys().
+#     base : Array of shape (count, 3) of ambient and diffuse light of each corner.
+#     lit  : Boolean array of shape (count, lights), True where a light reaches
+#            the corner, faces it, and is not blocked by another object.
+class LightingCache:
+
+  ########
+  # Creates an empty cache.
+  #   Params:
+  #     numLights : Number of lights in the scene.
+  def __init__(self, numLights):
+    self.keys = zeros(0, dtype = int64)
+    self.base = zeros((0, 3))
+    self.lit = zeros((0, numLights), dtype = bool)
+
+  ########
+  # Numbers triangle corners so they can be found again in later renders.
+  #   Params:
+  #     objId : Integer array of the object of each triangle.
+  #     triId : Integer array of the index of each triangle in its model.
+  #   Returns: Integer array of shape (count, 3) of the key of each corner.
+  @staticmethod
+  def corner_keys(objId, triId):
+    return ((asarray(objId, dtype = int64) << 32) + 3 * asarray(triId, dtype = int64))[:, newaxis] + arange(3)
+
+  ########
+  # Looks corners up in the cache.
+  #   Params:
+  #     keys : Integer array of corner keys.
+  #   Returns: Tuple of (found, base, lit). found is a boolean array of the
+  #            corners held; base and lit are as the members, with zeros
+  #            for corners not held.
+  def lookup(self, keys):
+    base = zeros((len(keys), 3))
+    lit = zeros((len(keys), self.lit.shape[1]), dtype = bool)
+    if len(self.keys) == 0:
+      return zeros(len(keys), dtype = bool), base, lit
+    index = minimum(searchsorted(self.keys, keys), len(self.keys) - 1)
+    found = self.keys[index] == keys
+    base[found] = self.base[index[found]]
+    lit[found] = self.lit[index[found]]
+    return found, base, lit
+
+  ########
+  # Adds corners that are not yet held.
+  #   Params:
+  #     keys : Integer array of corner keys, each only once.
+  #     base : Array of shape (count, 3) of ambient and diffuse light.
+  #     lit  : Boolean array of shape (count, lights) of lights each corner sees.
+  def add(self, keys, base, lit):
+    keys = concatenate((self.keys, keys))
+    order = argsort(keys, kind = "stable")
+    self.keys = keys[order]
+    self.base = concatenate((self.base, base))[order]
+    self.lit = concatenate((self.lit, lit))[order]
+# LightingCache
+################
+
+
+################
+# Renderer: Renders a loaded scene into a PIL.Image from a movable camera.
+#   Members:
+#     image : PIL.Image holding the most recent render.
+#     cache : RenderCache that renders are looked up in and added to, or None.
+class Renderer:
+
+  AMBIENT = 0.3
+  ALPHA = 4
+  SPECULAR = (1.0,1.0,1.0)
+
+  # shading options
+  SHADE_AMBIENT = 0x1
+  SHADE_DIFFUSE = 0x2
+  SHADE_SPECULAR = 0x4
+  SHADE_ALL = SHADE_AMBIENT | SHADE_DIFFUSE | SHADE_SPECULAR
+
+  # resolution options
+  RES_LOW = "RES_LOW"
+  RES_MEDIUM = "RES_MEDIUM"
+  RES_HIGH = "RES_HIGH"
+  RES_ULTRA = "RES_ULTRA" # NOTE: using this or below takes a long time to render
+  RES_INSANE = "RES_INSANE"
+  RES_REALISTIC = "RES_REALISTIC"
+
+  # render modes
+  MODE_FORWARD = "MODE_FORWARD"   # shades triangle corners, then rasterizes colors
+  MODE_DEFERRED = "MODE_DEFERRED" # rasterizes surface attributes, then shades visible pixels
+  MODE_BATCH = "MODE_BATCH"       # rasterizes all triangles together in screen tiles, then shades
+                                  # the corners of visible triangles
+  MODE_RAYCAST = "MODE_RAYCAST"   # casts a ray per pixel against the exact shapes, then shades
+                                  # visible pixels
+  MODES = (MODE_FORWARD, MODE_DEFERRED, MODE_BATCH, MODE_RAYCAST)
+
+  # anti-aliasing options, as samples per pixel (MODE_BATCH only)
+  SAMPLES = tuple(sorted(SAMPLE_PATTERNS))
+
+  # width and height of the parts render_tiled() draws one at a time
+  DEFAULT_TILE_SIZE = 512
+
+  ########
+  # Creates a renderer with the default camera. No scene is loaded.
+  def __init__(self):
+    self._zoomDist = 30
+    self._cameraLoc = Point(theta = pi, phi = pi/4, radius = self._zoomDist)
+    self._cameraDir = Point(theta = 0, phi = 3*pi/4, radius = 1)
+
+    self._sceneName = None
+    self._resolution = None
+    self._loadStats = RenderStats()
+    self._objects = []
+    self._lights = []
+    self._camViewMeshes = {}
+    self._perspectiveMeshes = {}
+    self._camViewLights = []
+    self._objLights = {}
+    self._litBy = zeros((0, 0), dtype = bool)
+    self._lighting = {}
+    self._sceneKey = None
+
+    self.image = None
+    self.cache = None
+
+  ########
+  # Loads objects into renderer, replacing any previous scene.
+  #   Params:
+  #     filename   : Specifies file of scene to be loaded
+  #     resolution : Specifies polygon resolution of objects.
+  #                  One of RES_LOW, RES_MEDIUM, RES_HIGH, or RES_ULTRA.
+  def load_objects(self, filename = "scene1.txt", resolution = RES_MEDIUM):
+    self._sceneName = filename
+    self._resolution = resolution
+    self._loadStats = RenderStats()
+    self._loadStats.start()
+    self._objects, self._lights = parse_scene(filename, resolution = resolution, stats = self._loadStats)
+    self._loadStats.stop()
+
+    # copies for per-point rendering, made once a mesh is first drawn and
+    # reused by each of its instances in turn
+    self._camViewMeshes = {}
+    self._perspectiveMeshes = {}
+
+    self._camViewLights = []
+    for i in range(len(self._lights)):
+      self._camViewLights.append(Light(color = self._lights[i].color))
+    self._cull_lights()
+
+    # lighting kept between renders, per (shadeType, castShadows)
+    self._lighting = {}
+    self._sceneKey = None # found when first needed, see _cache_key()
+
+  ########
+  # Finds the lights that reach each object, so shading can skip the rest.
+  # A light reaches an object if its radius (see Light.radius()) touches
+  # the object's bounding sphere. Objects and lights never move, so this
+  # holds for every frame. Objects are measured with object_bounds(), so
+  # the objects of a binary scene are not built here.
+  def _cull_lights(self):
+    self._litBy = zeros((len(self._objects), len(self._lights)), dtype = bool)
+    self._objLights = {}
+    if len(self._objects) == 0 or len(self._lights) == 0:
+      return
+
+    centers, radii, colors, diffuse, specular = object_bounds(self._objects)
+    # brightest any surface in the scene can be lit, per unit of light
+    gain = (10 * (colors * diffuse + max(Renderer.SPECULAR) * specular)).max()
+    reach = array([l.radius(gain) for l in self._lights])
+
+    locs = array([(l.loc.x, l.loc.y, l.loc.z) for l in self._lights])
+    dist = ((centers[:, newaxis] - locs) ** 2).sum(axis = 2) ** 0.5
+    self._litBy = dist <= radii[:, newaxis] + reach
+
+  ########
+  # Lists the lights that reach an object, found by _cull_lights(). Lists
+  # are made the first time an object is shaded.
+  #   Params:
+  #     o : Index of the object.
+  #   Returns: List of the camera-view Lights reaching the object.
+  def _object_lights(self, o):
+    if o not in self._objLights:
+      self._objLights[o] = [self._camViewLights[l] for l in nonzero(self._litBy[o])[0]]
+    return self._objLights[o]
+
+  ########
+  # Renders the scene into image with the provided shading selection.
+  #   Params:
+  #     width, height : Size of the image in pixels.
+  #     shadeType     : The shading to be used.
+  #                     One of SHADE_AMBIENT, SHADE_DIFFUSE, SHADE_SPECULAR, or SHADE_ALL.
+  #     castShadows   : If True, renders shadows. Disabling speeds up performance.
+  #     occlusionCull : If True, skips objects and triangles hidden behind those
+  #                     already drawn, before shading them.
+  #     frontToBack   : If True, draws nearer objects first so more are occluded.
+  #     mode          : The render mode to be used. One of MODE_FORWARD, MODE_DEFERRED,
+  #                     MODE_BATCH, or MODE_RAYCAST. MODE_BATCH ignores occlusionCull
+  #                     and frontToBack, since its tiles skip hidden triangles
+  #                     themselves. MODE_RAYCAST ignores them and the resolution,
+  #                     since it uses no triangles.
+  #     samples       : Number of samples per pixel, one of SAMPLES. Above 1,
+  #                     coverage and depth are found at every sample while
+  #                     lighting is still done once per corner, then samples are
+  #                     averaged to smooth edges. Requires MODE_BATCH.
+  #     reuseLighting : If True, the ambient and diffuse light and the shadows of
+  #                     each triangle corner are kept for the following renders,
+  #                     which only work out light for corners not seen before and
+  #                     the specular light, which depends on the camera. Speeds up
+  #                     moving the camera around a scene, such as in animations.
+  #                     Requires MODE_BATCH.
+  #     window        : If provided, tuple of (x0, y0, x1, y1) of the part of the
+  #                     image to render, from pixel (x0, y0) up to but not including
+  #                     (x1, y1). image then only holds that part, and only the
+  #                     memory for it is used. See render_tiled().
+  #     statsFile     : If provided, appends the render's statistics to this file
+  #                     as a line of JSON.
+  #     present       : If provided, called with the finished image. Its time
+  #                     is reported as part of the render.
+  #     profileFile   : If provided, profiles the render and writes the results to
+  #                     this path with .pstats and .folded extensions.
+  #                     See ProfileSession.
+  #   Returns: Dictionary of per-stage times in seconds and work counters.
+  #            See RenderStats. If the image was found in cache, no stage
+  #            but "cache" and "present" takes any time and the "cached"
+  #            tag is True.
+  def render(self,
+             width = 400,
+             height = 400,
+             shadeType = SHADE_ALL,
+             castShadows = True,
+             occlusionCull = True,
+             frontToBack = True,
+             mode = MODE_FORWARD,
+             samples = 1,
+             reuseLighting = False,
+             window = None,
+             statsFile = None,
+             present = None,
+             profileFile = None):
+    if mode not in Renderer.MODES:
+      raise ValueError("Unexpected render mode.")
+    if samples not in Renderer.SAMPLES:
+      raise ValueError("Unexpected number of samples.")
+    if samples > 1 and mode != Renderer.MODE_BATCH:
+      raise ValueError("Anti-aliasing requires MODE_BATCH.")
+    if reuseLighting and mode != Renderer.MODE_BATCH:
+      raise ValueError("Reusing lighting requires MODE_BATCH.")
+
+    if profileFile != None: # repeat this call inside a profiling session
+      with ProfileSession(profileFile, tags = [self._sceneName, self._resolution]):
+        return self.render(width = width,
+                           height = height,
+                           shadeType = shadeType,
+                           castShadows = castShadows,
+                           occlusionCull = occlusionCull,
+                           frontToBack = frontToBack,
+                           mode = mode,
+                           samples = samples,
+                           reuseLighting = reuseLighting,
+                           window = window,
+                           statsFile = statsFile,
+                           present = present)
+
+    fullx = float(int(width))
+    fully = float(int(height))
+    if window == None:
+      window = (0, 0, int(fullx), int(fully))
+    if not (0 <= window[0] < window[2] <= fullx and 0 <= window[1] < window[3] <= fully):
+      raise ValueError("Window must lie inside the image.")
+    viewx = float(window[2] - window[0]) # size of the part drawn
+    viewy = float(window[3] - window[1])
+
+    stats = RenderStats(tags = {"scene": self._sceneName,
+                                "resolution": self._resolution,
+                                "width": int(fullx),
+                                "height": int(fully),
+                                "mode": mode,
+                                "samples": samples,
+                                "shadeType": shadeType,
+                                "castShadows": True if castShadows else False,
+                                "cached": False})
+    stats.merge_times(self._loadStats, RenderStats.LOAD_STAGES)
+    stats.start()
+
+    if self.cache != None: # the same image may have been rendered before
+      with stats.stage("cache"):
+        cacheKey = self._cache_key(fullx, fully, window, shadeType, castShadows, occlusionCull, frontToBack,
+                                   mode, samples)
+        image = self.cache.get(cacheKey)
+      if image != None:
+        self.image = image
+        stats.tags["cached"] = True
+        return self._finish_render(stats, present, statsFile)
+
+    self.image = Image.new(mode = 'RGB', size = (int(viewx), int(viewy)))
+
+    with stats.stage("raster"):
+      if mode in (Renderer.MODE_DEFERRED, Renderer.MODE_RAYCAST):
+        gBuffer = GBuffer(viewx, viewy)
+      elif mode == Renderer.MODE_BATCH: # triangles of all objects, gathered for one pass
+        batch = {"screen": [], "view": [], "normal": [], "color": [], "objId": [], "triId": [], "draw": []}
+      else:
+        zBuffer = []
+        for i in range(int(viewx)):
+          zBuffer.append([None]*int(viewy))
+
+    stats.begin("vertex")
+    dispMat = display_matrix(fullx, fully, origin = window[:2]) # for conversion to canvas coordinates
+    viewMat, viewWorldMat, viewNormMat = view_matrix( # to view space, and back to world space
+                                           location = (self._cameraLoc.x, self._cameraLoc.y, self._cameraLoc.z),
+                                           direction = (self._cameraDir.theta, self._cameraDir.phi))
+
+    planes = view_frustum(fullx, fully)
+
+    for l in range(len(self._lights)):
+      res = viewMat @ self._lights[l].mat()
+      self._camViewLights[l].loc.set(matrix = res)
+
+    objMats = []
+    worldObjMats = []
+    objNormMats = []
+    for obj in self._objects:
+      objMat, worldObjMat, objNormMat = object_matrices(obj)
+      objMats.append(objMat)             # for conversion from model space to world space
+      worldObjMats.append(worldObjMat)   # for conversion from world space to model space
+      objNormMats.append(objNormMat)
+    stats.end()
+
+    # find objects inside the view
+    stats.begin("cull")
+    order = []
+    for o in range(len(self._objects)):
+      obj = self._objects[o]
+      stats.count("trisSubmitted", obj.tri_count())
+      objMat = objMats[o]
+
+      # skip objects whose bounding sphere is outside the view
+      center = Point(matrix = viewMat @ objMat @ Point(x = 0, y = 0, z = 0).mat())
+      radius = obj.bounding_radius() * max((abs(obj.scale.x), abs(obj.scale.y), abs(obj.scale.z)))
+      if not sphere_in_frustum(center, radius, planes):
+        stats.count("trisCulled", obj.tri_count())
+        continue
+      # and those outside the part of the image drawn, allowing for anti-aliasing samples
+      if viewx < fullx or viewy < fully:
+        bounds = sphere_screen_bounds(center, radius, dispMat)
+        if bounds != None and (bounds[2] < -1 or bounds[3] < -1 or bounds[0] > viewx or bounds[1] > viewy):
+          stats.count("trisCulled", obj.tri_count())
+          continue
+      order.append((o, objMat, center, radius))
+
+    if frontToBack: # camera looks towards negative z
+      order.sort(key = lambda entry: -entry[2].z)
+
+    if occlusionCull and mode in (Renderer.MODE_FORWARD, Renderer.MODE_DEFERRED):
+      hiZ = HiZBuffer(viewx, viewy)
+    else:
+      hiZ = None
+    stats.end()
+
+    if mode == Renderer.MODE_RAYCAST: # objects are found by rays instead of drawn one by one
+      self._cast_rays(order = order,
+                      gBuffer = gBuffer,
+                      viewx = fullx,
+                      viewy = fully,
+                      window = window,
+                      dispMat = dispMat,
+                      viewWorldMat = viewWorldMat,
+                      viewNormMat = viewNormMat,
+                      objMats = worldObjMats,
+                      objNormMats = objNormMats,
+                      stats = stats)
+      order = []
+    elif mode == Renderer.MODE_BATCH: # instances of each mesh are transformed together
+      self._gather_instances(order = order,
+                             batch = batch,
+                             viewx = viewx,
+                             viewy = viewy,
+                             margin = 0 if samples == 1 else 0.5,
+                             viewMat = viewMat,
+                             dispMat = dispMat,
+                             viewNormMat = viewNormMat,
+                             objNormMats = objNormMats,
+                             stats = stats)
+      order = []
+
+    for o, objMat, center, radius in order:
+      obj = self._objects[o]
+
+      # skip objects hidden behind those already drawn
+      if hiZ != None:
+        with stats.stage("cull"):
+          bounds = sphere_screen_bounds(center, radius, dispMat)
+          if bounds != None and hiZ.occluded(*bounds):
+            stats.count("trisCulled", obj.tri_count())
+            continue
+
+      # only objects that may be seen are generated
+      model = obj.model(stats = stats)
+      if obj.mesh not in self._camViewMeshes:
+        with stats.stage("mesh"):
+          self._camViewMeshes[obj.mesh] = Model(points = model.points, norms = model.norms, tris = model.tris)
+          self._perspectiveMeshes[obj.mesh] = Model(points = model.points, norms = model.norms, tris = model.tris)
+      camView = self._camViewMeshes[obj.mesh]
+      perspective = self._perspectiveMeshes[obj.mesh]
+
+      stats.begin("vertex")
+      points = model.point_array() @ (viewMat @ objMat).T
+      screen = points @ dispMat.T
+      invW = -1 / screen[:, 3] # positive in front of the camera, larger when closer
+      screen /= screen[:, 3:] # normalize
+      screen[:, 2] = invW # depth is kept as 1/w, which is linear across the canvas
+      norms = model.norm_array() @ (viewNormMat @ objNormMats[o])[:3, :3].T
+      camView.set_points(points)
+      perspective.set_points(screen)
+      perspective.set_norms(norms)
+      norms /= ((norms * norms).sum(axis = 1) ** 0.5)[:, newaxis] # need it in unit-vector format
+      camView.set_norms(norms)
+      stats.end()
+
+      stats.begin("cull")
+      visible = visible_triangles(screen = screen[:, :2],
+                                  depth = points[:, 2],
+                                  tris = model.tri_indices(),
+                                  viewx = viewx,
+                                  viewy = viewy)
+      stats.end()
+
+      # prepare all remaining triangles for rasterization at once
+      with stats.stage("raster"):
+        corners = model.tri_indices()[visible]
+        setup = TriangleSetup(x = screen[corners, 0],
+                              y = screen[corners, 1],
+                              z = screen[corners, 2],
+                              width = viewx,
+                              height = viewy,
+                              invW = screen[corners, 2])
+      stats.count("trisCulled", len(model.tris) - int(setup.valid.sum()))
+
+      for k in nonzero(setup.valid)[0]:
+        t = visible[k]
+        tri = perspective.tris[t]
+
+        pp1 = perspective.points[tri.p1]
+        pp2 = perspective.points[tri.p2]
+        pp3 = perspective.points[tri.p3]
+        if hiZ != None:
+          stats.begin("cull")
+          minX, minY, maxX, maxY = setup.triangle(k)[0:4]
+          hidden = hiZ.occluded(minX = minX,
+                                minY = minY,
+                                maxX = maxX,
+                                maxY = maxY,
+                                nearest = setup.nearest[k])
+          stats.end()
+          if hidden:
+            stats.count("trisCulled")
+            continue
+        stats.count("trisDrawn")
+
+        p1 = camView.points[tri.p1]
+        p2 = camView.points[tri.p2]
+        p3 = camView.points[tri.p3]
+
+        if mode == Renderer.MODE_DEFERRED: # shading happens once rasterization is done
+          with stats.stage("raster"):
+            written = render_triangle_attributes(p1 = pp1,
+                                                 p2 = pp2,
+                                                 p3 = pp3,
+                                                 v1 = p1,
+                                                 v2 = p2,
+                                                 v3 = p3,
+                                                 normal = camView.norms[tri.norm],
+                                                 color = tri.color,
+                                                 objId = o,
+                                                 gBuffer = gBuffer,
+                                                 setup = setup,
+                                                 index = k)
+          stats.count("pixelsWritten", written)
+          continue
+
+        stats.begin("shade")
+        c1 = self._shade(point = p1,
+                         normal = camView.norms[tri.norm],
+                         color = tri.color,
+                         specular = obj.specular,
+                         diffuse = obj.diffuse,
+                         shadeType = shadeType,
+                         viewWorldMat = viewWorldMat,
+                         objMats = worldObjMats,
+                         myObj = o,
+                         castShadows = castShadows,
+                         stats = stats)
+        c2 = self._shade(point = p2,
+                         normal = camView.norms[tri.norm],
+                         color = tri.color,
+                         specular = obj.specular,
+                         diffuse = obj.diffuse,
+                         shadeType = shadeType,
+                         viewWorldMat = viewWorldMat,
+                         objMats = worldObjMats,
+                         myObj = o,
+                         castShadows = castShadows,
+                         stats = stats)
+        c3 = self._shade(point = p3,
+                         normal = camView.norms[tri.norm],
+                         color = tri.color,
+                         specular = obj.specular,
+                         diffuse = obj.diffuse,
+                         shadeType = shadeType,
+                         viewWorldMat = viewWorldMat,
+                         objMats = worldObjMats,
+                         myObj = o,
+                         castShadows = castShadows,
+                         stats = stats)
+        stats.end()
+
+        with stats.stage("raster"):
+          written = render_triangle(p1 = pp1,
+                                    p2 = pp2,
+                                    p3 = pp3,
+                                    c1 = c1,
+                                    c2 = c2,
+                                    c3 = c3,
+                                    zBuffer = zBuffer,
+                                    setup = setup,
+                                    index = k)
+        stats.count("pixelsWritten", written)
+
+      if hiZ != None and len(visible) > 0:
+        stats.begin("cull")
+        drawn = screen[corners]
+        bounds = {"minX": drawn[:, :, 0].min(),
+                  "minY": drawn[:, :, 1].min(),
+                  "maxX": drawn[:, :, 0].max(),
+                  "maxY": drawn[:, :, 1].max()}
+        if mode == Renderer.MODE_DEFERRED:
+          hiZ.update_array(depth = gBuffer.depth, **bounds)
+        else:
+          hiZ.update(zBuffer = zBuffer, **bounds)
+        stats.end()
+
+    if mode == Renderer.MODE_BATCH:
+      self._render_batch(batch = batch,
+                         viewx = viewx,
+                         viewy = viewy,
+                         samples = samples,
+                         shadeType = shadeType,
+                         viewWorldMat = viewWorldMat,
+                         objMats = worldObjMats,
+                         castShadows = castShadows,
+                         reuseLighting = reuseLighting,
+                         stats = stats)
+    elif mode in (Renderer.MODE_DEFERRED, Renderer.MODE_RAYCAST):
+      with stats.stage("shade"):
+        colors = self._shade_deferred(gBuffer = gBuffer,
+                                      shadeType = shadeType,
+                                      viewWorldMat = viewWorldMat,
+                                      objMats = worldObjMats,
+                                      castShadows = castShadows,
+                                      stats = stats)
+      with stats.stage("image"):
+        self.image = Image.fromarray(colors)
+    else:
+      with stats.stage("image"):
+        width = int(viewx)
+        pixels = [(0, 0, 0)] * (width * int(viewy)) # framebuffer, one row after another
+        for x in range(width):
+          column = zBuffer[x]
+          for y in range(int(viewy)):
+            if column[y] != None:
+              pixels[y * width + x] = tuple(column[y][1:])
+        self.image.putdata(pixels)
+
+    if self.cache != None:
+      with stats.stage("cache"):
+        self.cache.put(cacheKey, self.image)
+    return self._finish_render(stats, present, statsFile)
+
+  ########
+  # Shows a finished image and records the statistics of its render.
+  #   Params:
+  #     stats     : RenderStats of the render.
+  #     present   : If provided, called with the finished image. See render().
+  #     statsFile : If provided, file to append the statistics to. See render().
+  #   Returns: Dictionary of per-stage times in seconds and work counters.
+  def _finish_render(self, stats, present, statsFile):
+    if present != None:
+      with stats.stage("present"):
+        present(self.image)
+
+    stats.stop()
+    if statsFile != None:
+      stats.dump(statsFile)
+    return stats.as_dict()
+
+  ########
+  # Generates the cache key of a render from the scene, the camera, and
+  # every option that changes the image. See RenderCache.
+  #   Params:
+  #     See render(). viewx and viewy are the size of the whole image.
+  #   Returns: String of hexadecimal digits.
+  def _cache_key(self, viewx, viewy, window, shadeType, castShadows, occlusionCull, frontToBack, mode, samples):
+    if self._sceneKey == None:
+      self._sceneKey = scene_key(self._objects, self._lights)
+    return RenderCache.make_key(self._sceneKey,
+                                self._resolution,
+                                (self._cameraLoc.x, self._cameraLoc.y, self._cameraLoc.z),
+                                (self._cameraDir.theta, self._cameraDir.phi),
+                                (int(viewx), int(viewy)),
+                                tuple(window),
+                                shadeType,
+                                True if castShadows else False,
+                                True if occlusionCull else False,
+                                True if frontToBack else False,
+                                mode,
+                                samples)
+
+  ########
+  # Renders an image a tile at a time, writing out each row of tiles as soon
+  # as it is finished. Memory use depends on the width of the image and the
+  # tile size, not the whole image, so images too large to hold in memory
+  # can be made. The result matches a render of the whole image at once, to
+  # within one color level of rounding.
+  #   Params:
+  #     output        : Path of a PNG file to write, or a writable array of shape
+  #                     (height, width, 3) of 8-bit RGB pixels to fill, such as a
+  #                     numpy.memmap.
+  #     width, height : Size of the image in pixels.
+  #     tileSize      : Width and height of each tile in pixels.
+  #     **options     : Other options of render(), apart from window. image
+  #                     holds the last tile afterwards.
+  #   Returns: Dictionary of per-stage times in seconds and work counters,
+  #            added up over every tile. See RenderStats.
+  def render_tiled(self, output, width = 400, height = 400, tileSize = DEFAULT_TILE_SIZE, **options):
+    width = int(width)
+    height = int(height)
+    if isinstance(output, str):
+      with PngRowWriter(output, width, height) as writer:
+        return self._render_tiles(writer, None, width, height, tileSize, options)
+    return self._render_tiles(None, output, width, height, tileSize, options)
+
+  ########
+  # Renders the tiles of render_tiled() into a PNG file or an array.
+  #   Params:
+  #     writer        : PngRowWriter to add each row of tiles to, or None.
+  #     pixels        : Array to fill if writer is None.
+  #     width, height : Size of the image in pixels.
+  #     tileSize      : Width and height of each tile in pixels.
+  #     options       : Dictionary of other options of render().
+  #   Returns: Dictionary of per-stage times and work counters of every tile.
+  def _render_tiles(self, writer, pixels, width, height, tileSize, options):
+    if writer != None: # one row of tiles, reused
+      band = zeros((min((tileSize, height)), width, 3), dtype = uint8)
+    totals = None
+    for y0 in range(0, height, tileSize):
+      y1 = min((height, y0 + tileSize))
+      if writer != None:
+        rows = band[:y1 - y0]
+      else:
+        rows = pixels[y0:y1]
+      for x0 in range(0, width, tileSize):
+        x1 = min((width, x0 + tileSize))
+        stats = self.render(width = width, height = height, window = (x0, y0, x1, y1), **options)
+        rows[:, x0:x1] = asarray(self.image)
+        if totals == None:
+          totals = stats
+          totals["tiles"] = 0
+        else:
+          for key, label in RenderStats.STAGES + RenderStats.COUNTERS:
+            if key not in RenderStats.LOAD_STAGES:
+              totals[key] += stats[key]
+          totals["total"] += stats["total"]
+        totals["tiles"] += 1
+      if writer != None:
+        writer.write_rows(rows)
+    return totals
+
+  ########
+  # Transforms the objects inside the view and gathers their visible
+  # triangles for _render_batch(). All instances of a mesh are transformed
+  # and culled together, in one array operation per mesh.
+  #   Params:
+  #     order        : List of (index, model matrix, view-space center, radius)
+  #                    of the objects inside the view.
+  #     batch        : Dictionary of lists to append to. See _render_batch().
+  #     viewx, viewy : Size of the part of the image drawn, in pixels.
+  #     margin       : Distance in pixels beyond the image within which triangles
+  #                    are kept, for anti-aliasing samples. See visible_triangles().
+  #     viewMat      : World -> View matrix
+  #     dispMat      : View -> Canvas matrix
+  #     viewNormMat  : World -> View matrix for normals
+  #     objNormMats  : Object -> World matrices for normals
+  #     stats        : RenderStats to record the render in.
+  def _gather_instances(self, order, batch, viewx, viewy, margin, viewMat, dispMat, viewNormMat, objNormMats,
+                        stats):
+    instances = {} # mesh -> list of (index, model matrix)
+    ranks = {}     # index -> position in order, in which MODE_FORWARD would draw it
+    for o, objMat, center, radius in order:
+      instances.setdefault(self._objects[o].mesh, []).append((o, objMat))
+      ranks[o] = len(ranks)
+
+    for mesh, placements in instances.items():
+      model = mesh.model(stats = stats)
+      ids = array([o for o, objMat in placements], dtype = int)
+      numPoints = len(model.points)
+      numTris = len(model.tris)
+
+      with stats.stage("vertex"):
+        mats = array([(viewMat @ objMat).T for o, objMat in placements])
+        points = (model.point_array() @ mats).reshape((-1, 4)) # every instance, one after another
+        screen = points @ dispMat.T
+        invW = -1 / screen[:, 3] # positive in front of the camera, larger when closer
+        screen /= screen[:, 3:] # normalize
+        screen[:, 2] = invW # depth is kept as 1/w, which is linear across the canvas
+        normMats = array([(viewNormMat @ objNormMats[o])[:3, :3].T for o in ids])
+        norms = model.norm_array() @ normMats
+        norms /= ((norms * norms).sum(axis = 2) ** 0.5)[:, :, newaxis] # need it in unit-vector format
+
+      with stats.stage("cull"):
+        offsets = arange(len(ids)) * numPoints
+        tris = (model.tri_indices() + offsets[:, newaxis, newaxis]).reshape((-1, 3))
+        visible = visible_triangles(screen = screen[:, :2],
+                                    depth = points[:, 2],
+                                    tris = tris,
+                                    viewx = viewx,
+                                    viewy = viewy,
+                                    margin = margin)
+      instance = visible // numTris
+      local = visible % numTris
+
+      corners = tris[visible]
+      batch["screen"].append(screen[corners, :3])
+      batch["view"].append(points[corners, :3])
+      batch["normal"].append(norms[instance, model.tri_norms()[local]])
+      batch["color"].append(model.tri_colors()[local])
+      batch["objId"].append(ids[instance])
+      batch["triId"].append(local)
+      batch["draw"].append((array([ranks[o] for o in ids], dtype = int64)[instance] << 32) + local)
+      stats.count("trisCulled", len(tris) - len(visible))
+
+  ########
+  # Draws the triangles of all objects gathered by render() into image in
+  # one pass. Triangles are binned into screen tiles and rasterized a tile
+  # at a time, then only the corners of triangles left visible are shaded.
+  #   Params:
+  #     batch         : Dictionary of lists of per-object arrays, concatenated here:
+  #                     "screen" (count, 3, 3) canvas x, y, and depth of each corner,
+  #                     "view" (count, 3, 3) view space corners, "normal" (count, 3)
+  #                     unit normals, "color" (count, 3) colors, "objId" (count,)
+  #                     object indexes, "triId" (count,) indexes of each
+  #                     triangle in its model, and "draw" (count,) keys ordering
+  #                     the triangles as MODE_FORWARD draws them, which decide
+  #                     between triangles at the same depth.
+  #     viewx, viewy  : Size of the part of the image drawn, in pixels.
+  #     samples       : Number of samples per pixel.
+  #     shadeType     : The shading to be used.
+  #                     One of SHADE_AMBIENT, SHADE_DIFFUSE, SHADE_SPECULAR, or SHADE_ALL.
+  #     viewWorldMat  : View -> World matrix
+  #     objMats       : World -> Object matrices
+  #     castShadows   : If True, renders shadows. Disabling speeds up performance.
+  #     reuseLighting : If True, keeps the lighting of each corner for later renders.
+  #                     See render().
+  #     stats         : RenderStats to record the render in.
+  def _render_batch(self, batch, viewx, viewy, samples, shadeType, viewWorldMat, objMats, castShadows,
+                    reuseLighting, stats):
+    with stats.stage("raster"):
+      screen = concatenate(batch["screen"] + [zeros((0, 3, 3))])
+      setup = TriangleSetup(x = screen[:, :, 0],
+                            y = screen[:, :, 1],
+                            z = screen[:, :, 2],
+                            width = viewx,
+                            height = viewy,
+                            invW = screen[:, :, 2],
+                            margin = 0 if samples == 1 else 0.5)
+      drawn = int(setup.valid.sum())
+      drawOrder = concatenate(batch["draw"] + [zeros(0, dtype = int64)])
+      winners, depth = rasterize_binned(setup, viewx, viewy, samples = samples, drawOrder = drawOrder)
+    stats.count("trisCulled", setup.count - drawn)
+    stats.count("trisDrawn", drawn)
+    stats.count("pixelsWritten", int((winners >= 0).any(axis = 2).sum()))
+
+    with stats.stage("shade"):
+      visible = unique(winners[winners >= 0])
+      objId = concatenate(batch["objId"] + [zeros(0, dtype = int)])[visible]
+      if reuseLighting:
+        keys = LightingCache.corner_keys(objId, concatenate(batch["triId"] + [zeros(0, dtype = int)])[visible])
+        keys = keys.ravel()
+      else:
+        keys = None
+      colors = zeros((setup.count, 3, 3), dtype = int)
+      colors[visible] = self._shade_points(
+                          point = concatenate(batch["view"] + [zeros((0, 3, 3))])[visible].reshape((-1, 3)),
+                          normal = repeat(concatenate(batch["normal"] + [zeros((0, 3))])[visible], 3, axis = 0),
+                          color = repeat(concatenate(batch["color"] + [zeros((0, 3))])[visible], 3, axis = 0),
+                          objId = repeat(objId, 3),
+                          shadeType = shadeType,
+                          viewWorldMat = viewWorldMat,
+                          objMats = objMats,
+                          castShadows = castShadows,
+                          keys = keys,
+                          stats = stats).reshape((-1, 3, 3))
+
+    with stats.stage("image"):
+      self.image = Image.fromarray(interpolate_colors(setup, winners, colors))
+
+  ########
+  # Fills a G-buffer by casting a ray through every pixel and finding where
+  # it first hits the exact shape of an object. Each object's rays are
+  # limited to the pixels covered by its bounding sphere.
+  #   Params:
+  #     order        : List of (index, model matrix, view-space center, radius)
+  #                    of the objects inside the view.
+  #     gBuffer      : GBuffer to fill.
+  #     viewx, viewy : Size of the whole image in pixels.
+  #     window       : Tuple of (x0, y0, x1, y1) of the part of the image in gBuffer.
+  #                    See render().
+  #     dispMat      : View -> Canvas matrix
+  #     viewWorldMat : View -> World matrix
+  #     viewNormMat  : World -> View matrix for normals
+  #     objMats      : World -> Object matrices
+  #     objNormMats  : Object -> World matrices for normals
+  #     stats        : RenderStats to record the render in.
+  def _cast_rays(self, order, gBuffer, viewx, viewy, window, dispMat, viewWorldMat, viewNormMat, objMats,
+                 objNormMats, stats):
+    with stats.stage("vertex"):
+      eye, rays = pixel_rays(viewx, viewy, window = window)
+      nearest = full((gBuffer.height, gBuffer.width), inf) # distance along each ray
+
+    for o, objMat, center, radius in order:
+      obj = self._objects[o]
+      with stats.stage("cull"):
+        bounds = sphere_screen_bounds(center, radius, dispMat)
+        if bounds == None: # reaches behind the camera, so may cover any pixel
+          x0, y0, x1, y1 = (0, 0, gBuffer.width, gBuffer.height)
+        else:
+          x0 = max((0, int(floor(bounds[0]))))
+          y0 = max((0, int(floor(bounds[1]))))
+          x1 = min((gBuffer.width, int(ceil(bounds[2])) + 1))
+          y1 = min((gBuffer.height, int(ceil(bounds[3])) + 1))
+        if x0 >= x1 or y0 >= y1:
+          continue
+
+      with stats.stage("trace"):
+        toObj = objMats[o] @ viewWorldMat
+        direction = rays[y0:y1, x0:x1].reshape((-1, 3))
+        t, normal = obj.ray_array(origin = toObj[:3, :3] @ eye + toObj[:3, 3],
+                                  direction = direction @ toObj[:3, :3].T)
+        region = (slice(y0, y1), slice(x0, x1))
+        closer = t < nearest[region].ravel()
+        if not closer.any():
+          continue
+        ys, xs = nonzero(closer.reshape((y1 - y0, x1 - x0)))
+        ys += y0
+        xs += x0
+        point = eye + t[closer][:, newaxis] * direction[closer]
+        normal = normal[closer] @ (viewNormMat @ objNormMats[o])[:3, :3].T
+        normal /= ((normal * normal).sum(axis = 1) ** 0.5)[:, newaxis]
+
+        nearest[ys, xs] = t[closer]
+        gBuffer.depth[ys, xs] = -1 / (point @ dispMat[3, :3] + dispMat[3, 3]) # -1/w, as when rasterizing
+        gBuffer.position[ys, xs] = point
+        gBuffer.normal[ys, xs] = normal
+        gBuffer.color[ys, xs] = obj.color
+        gBuffer.objId[ys, xs] = o
+    stats.count("pixelsWritten", int((gBuffer.objId >= 0).sum()))
+
+  ########
+  # Moves the camera to a new location. Camera is always looking at origin.
+  #   Params:
+  #     zoom     : Distance from the origin.
+  #     incline  : View vector's phi component, from positive z-axis.
+  #     rotation : View vector's theta component, from positive x-axis.
+  def update_camera(self, zoom, incline, rotation):
+    self._zoomDist = zoom
+    self._cameraLoc = Point(theta = pi + rotation * pi,
+                            phi = pi - incline * pi,
+                            radius = self._zoomDist)
+    self._cameraDir = Point(theta = rotation * pi, phi = incline * pi, radius = 1)
+
+  ########
+  # Determines the color of a point using a simplified lighting model.
+  #   Params:
+  #     point        : Point to be colored
+  #     normal       : Surface normal at point
+  #     color        : Color of point
+  #     specular     : Specular coefficient for the point
+  #     diffuse      : Diffuse coefficient for the point
+  #     shadeType    : The shading to be used.
+  #                    One of SHADE_AMBIENT, SHADE_DIFFUSE, SHADE_SPECULAR, or SHADE_ALL.
+  #     viewWorldMat : View -> World matrix
+  #     objMats      : World -> Object matrices
+  #     myObj        : Index of the object this point belongs to
+  #     castShadows  : If True, renders shadows. Disabling speeds up performance.
+  #     stats        : RenderStats to record shadow tests in, or None.
+  def _shade(self,
+             point,
+             normal,
+             color,
+             specular,
+             diffuse,
+             shadeType,
+             viewWorldMat,
+             objMats,
+             myObj,
+             castShadows,
+             stats = None):
+
+    if shadeType & Renderer.SHADE_AMBIENT: # ambient portion
+      r = Renderer.AMBIENT * color[0]
+      g = Renderer.AMBIENT * color[1]
+      b = Renderer.AMBIENT * color[2]
+    else: # no ambient
+      r = 0
+      g = 0
+      b = 0
+
+    viewdir = Point(x = -point.x, y = -point.y, z = -point.z)
+    viewdir.normalize()
+
+    if shadeType & (Renderer.SHADE_DIFFUSE | Renderer.SHADE_SPECULAR):
+      if stats != None:
+        stats.count("lightsCulled", len(self._camViewLights) - len(self._object_lights(myObj)))
+      for l in self._object_lights(myObj): # lights too far away add nothing
+        lightdir = Point(matrix = l.mat() - point.mat())
+        att = lightdir.att()
+        lightdir.normalize()
+        dotLightNorm = lightdir.dot(normal)
+
+        if dotLightNorm > 0: # isVisible
+          useLight = True
+
+          if castShadows:
+            if stats != None:
+              stats.begin("shadow")
+              stats.count("shadowRays")
+            for o in range(len(self._objects)):
+              if o == myObj: # don't process our own object
+                continue
+              worldObjMat = objMats[o]
+              p1 = Point(matrix = worldObjMat @ viewWorldMat @ l.loc.mat())
+              p2 = Point(matrix = worldObjMat @ viewWorldMat @ point.mat())
+              # determine if occluded
+              if stats != None:
+                stats.count("occluderTests")
+              if self._objects[o].intersects(p1 = p1, p2 = p2):
+                useLight = False
+                break
+            if stats != None:
+              stats.end()
+          if not useLight:
+            continue # skip to next light
+
+
+          # Formula from: http://math.stackexchange.com/questions/13261/how-to-get-a-reflection-vector
+          if shadeType & Renderer.SHADE_SPECULAR:
+            dot = lightdir.dot(normal)
+            reflectdir = Point(matrix = lightdir.mat() - 2 * dot * normal.mat())
+
+          if shadeType & Renderer.SHADE_DIFFUSE: # diffuse portion
+            r += att * 10 * l.color[0] * color[0] * diffuse * dotLightNorm
+            g += att * 10 * l.color[1] * color[1] * diffuse * dotLightNorm
+            b += att * 10 * l.color[2] * color[2] * diffuse * dotLightNorm
+
+          if shadeType & Renderer.SHADE_SPECULAR: # specular portion
+            dot = -reflectdir.dot(viewdir)
+            if dot > 0:
+              r += att * 10 * l.color[0] * Renderer.SPECULAR[0] * specular * dot ** Renderer.ALPHA
+              g += att * 10 * l.color[1] * Renderer.SPECULAR[1] * specular * dot ** Renderer.ALPHA
+              b += att * 10 * l.color[2] * Renderer.SPECULAR[2] * specular * dot ** Renderer.ALPHA
+
+    # if r > 1 or g > 1 or b > 1:
+    #   print("ERROR: {:.2f},{:.2f},{:.2f}".format(r,g,b))
+    return (min((255, int(255*r))),
+            min((255, int(255*g))),
+            min((255, int(255*b))))
+    # return color
+
+  ########
+  # Determines the color of every covered pixel of a G-buffer at once.
+  # See _shade_points().
+  #   Params:
+  #     gBuffer      : GBuffer holding the visible surface at each pixel.
+  #     shadeType    : The shading to be used.
+  #                    One of SHADE_AMBIENT, SHADE_DIFFUSE, SHADE_SPECULAR, or SHADE_ALL.
+  #     viewWorldMat : View -> World matrix
+  #     objMats      : World -> Object matrices
+  #     castShadows  : If True, renders shadows. Disabling speeds up performance.
+  #     stats        : RenderStats to record shadow tests in, or None.
+  #   Returns: Array of shape (height, width, 3) of 8-bit RGB colors.
+  def _shade_deferred(self, gBuffer, shadeType, viewWorldMat, objMats, castShadows, stats = None):
+    image = zeros((gBuffer.height, gBuffer.width, 3), dtype = uint8)
+    covered = gBuffer.objId >= 0
+    image[covered] = self._shade_points(point = gBuffer.position[covered],
+                                        normal = gBuffer.normal[covered],
+                                        color = gBuffer.color[covered],
+                                        objId = gBuffer.objId[covered],
+                                        shadeType = shadeType,
+                                        viewWorldMat = viewWorldMat,
+                                        objMats = objMats,
+                                        castShadows = castShadows,
+                                        stats = stats)
+    return image
+
+  ########
+  # Determines the color of many points at once, using the same lighting
+  # model and constants as _shade().
+  #   Params:
+  #     point        : Array of shape (count, 3) of points in view space.
+  #     normal       : Array of shape (count, 3) of unit surface normals in view space.
+  #     color        : Array of shape (count, 3) of surface colors.
+  #     objId        : Integer array of shape (count,) of the object each point belongs to.
+  #     shadeType    : The shading to be used.
+  #                    One of SHADE_AMBIENT, SHADE_DIFFUSE, SHADE_SPECULAR, or SHADE_ALL.
+  #     viewWorldMat : View -> World matrix
+  #     objMats      : World -> Object matrices
+  #     castShadows  : If True, renders shadows. Disabling speeds up performance.
+  #     keys         : If provided, integer array of shape (count,) naming each point
+  #                    as a triangle corner (see LightingCache.corner_keys()). The
+  #                    lighting of corners shaded by earlier renders is reused, and
+  #                    that of the rest is kept for later ones.
+  #     stats        : RenderStats to record shadow tests in, or None.
+  #   Returns: Integer array of shape (count, 3) of RGB colors, 0-255.
+  def _shade_points(self, point, normal, color, objId, shadeType, viewWorldMat, objMats, castShadows,
+                    keys = None, stats = None):
+    if keys is None:
+      rgb, lit = self._light_points(point = point,
+                                    normal = normal,
+                                    color = color,
+                                    objId = objId,
+                                    shadeType = shadeType,
+                                    viewWorldMat = viewWorldMat,
+                                    objMats = objMats,
+                                    castShadows = castShadows,
+                                    stats = stats)
+    else:
+      cache = self._lighting.setdefault((shadeType, True if castShadows else False),
+                                        LightingCache(len(self._lights)))
+      found, rgb, lit = cache.lookup(keys)
+      new = ~found
+      if stats != None:
+        stats.count("cornersReused", int(found.sum()))
+      if new.any():
+        rgb[new], lit[new] = self._light_points(point = point[new],
+                                                normal = normal[new],
+                                                color = color[new],
+                                                objId = objId[new],
+                                                shadeType = shadeType,
+                                                viewWorldMat = viewWorldMat,
+                                                objMats = objMats,
+                                                castShadows = castShadows,
+                                                stats = stats)
+        cache.add(keys[new], rgb[new], lit[new])
+
+    if shadeType & Renderer.SHADE_SPECULAR: # specular portion
+      rgb += self._specular_points(point = point, normal = normal, objId = objId, lit = lit)
+
+    return minimum(255, (255 * rgb).astype(int))
+
+  ########
+  # Determines the part of the light on many points that does not depend on
+  # the camera: the ambient and diffuse portions, and which lights each
+  # point sees.
+  #   Params:
+  #     See _shade_points().
+  #   Returns: Tuple of (rgb, lit). rgb is an array of shape (count, 3) of
+  #            ambient and diffuse light, and lit a boolean array of shape
+  #            (count, lights), True where a light reaches a point, faces
+  #            it, and is not blocked by another object.
+  def _light_points(self, point, normal, color, objId, shadeType, viewWorldMat, objMats, castShadows, stats = None):
+    diffuse = array([m.diffuse for m in self._objects])[objId][:, newaxis]
+    lit = zeros((len(point), len(self._lights)), dtype = bool)
+
+    if shadeType & Renderer.SHADE_AMBIENT: # ambient portion
+      rgb = Renderer.AMBIENT * color
+    else: # no ambient
+      rgb = zeros(color.shape)
+
+    if shadeType & (Renderer.SHADE_DIFFUSE | Renderer.SHADE_SPECULAR):
+      for l in range(len(self._camViewLights)):
+        light = self._camViewLights[l]
+        reached = self._litBy[objId, l] # points on objects within the light's radius
+        count = int(reached.sum())
+        if stats != None:
+          stats.count("lightsCulled", len(reached) - count)
+        if count == 0:
+          continue
+        if count == len(reached): # every point, so no copies are needed
+          reached = slice(None)
+        p = point[reached]
+        n = normal[reached]
+        ids = objId[reached]
+
+        lightdir = (light.loc.x, light.loc.y, light.loc.z) - p
+        dist = (lightdir * lightdir).sum(axis = 1) ** 0.5
+        att = minimum(1 / (Point.C1 + Point.C2 * dist + Point.C3 * dist * dist), 1)[:, newaxis]
+        lightdir /= dist[:, newaxis]
+        dotLightNorm = (lightdir * n).sum(axis = 1)
+
+        useLight = dotLightNorm > 0 # isVisible
+        if castShadows:
+          if stats != None:
+            stats.begin("shadow")
+            stats.count("shadowRays", int(useLight.sum()))
+          for o in range(len(self._objects)):
+            test = useLight & (ids != o) # don't process our own object
+            if not test.any():
+              continue
+            toObj = objMats[o] @ viewWorldMat
+            p1 = toObj[:3, :3].dot((light.loc.x, light.loc.y, light.loc.z)) + toObj[:3, 3]
+            p2 = p[test].dot(toObj[:3, :3].T) + toObj[:3, 3]
+            # determine if occluded
+            if stats != None:
+              stats.count("occluderTests", int(test.sum()))
+            useLight[test] = ~self._objects[o].intersects_array(p1 = p1, p2 = p2)
+          if stats != None:
+            stats.end()
+        lit[reached, l] = useLight
+
+        if shadeType & Renderer.SHADE_DIFFUSE: # diffuse portion
+          dotLightNorm = where(useLight, dotLightNorm, 0)[:, newaxis]
+          rgb[reached] += att * 10 * array(light.color) * color[reached] * diffuse[reached] * dotLightNorm
+
+    return rgb, lit
+
+  ########
+  # Determines the specular portion of the light on many points, which
+  # depends on the camera.
+  #   Params:
+  #     point  : Array of shape (count, 3) of points in view space.
+  #     normal : Array of shape (count, 3) of unit surface normals in view space.
+  #     objId  : Integer array of shape (count,) of the object each point belongs to.
+  #     lit    : Boolean array of shape (count, lights) of the lights each point
+  #              sees. See _light_points().
+  #   Returns: Array of shape (count, 3) of specular light.
+  def _specular_points(self, point, normal, objId, lit):
+    specular = array([m.specular for m in self._objects])[objId][:, newaxis]
+    rgb = zeros(point.shape)
+    viewdir = -point / ((point * point).sum(axis = 1) ** 0.5)[:, newaxis]
+
+    for l in nonzero(lit.any(axis = 0))[0]:
+      light = self._camViewLights[l]
+      seen = lit[:, l]
+      p = point[seen]
+      n = normal[seen]
+
+      lightdir = (light.loc.x, light.loc.y, light.loc.z) - p
+      dist = (lightdir * lightdir).sum(axis = 1) ** 0.5
+      att = minimum(1 / (Point.C1 + Point.C2 * dist + Point.C3 * dist * dist), 1)[:, newaxis]
+      lightdir /= dist[:, newaxis]
+      dotLightNorm = (lightdir * n).sum(axis = 1)[:, newaxis]
+
+      reflectdir = lightdir - 2 * dotLightNorm * n
+      dot = -(reflectdir * viewdir[seen]).sum(axis = 1)[:, newaxis]
+      dot = where(dot > 0, dot, 0)
+      rgb[seen] += (att * 10 * array(light.color) * array(Renderer.SPECULAR) * specular[seen] *
+                    dot ** Renderer.ALPHA)
+    return rgb
+# Renderer
+################
+
+
+########
+# Main code architecture if run standalone.
+# Renders a scene with settings from the command line, prints its
+# timings, and optionally saves the image and profiles the render.
+if __name__ == "__main__":
+  import argparse
+  parser = argparse.ArgumentParser(description = "Render a scene without opening a window.")
+  parser.add_argument("scene", nargs = "?", default = "scene1.txt",
+                      help = "scene file to render (default: scene1.txt)")
+  parser.add_argument("--res", default = Renderer.RES_MEDIUM,
+                      choices = [Renderer.RES_LOW, Renderer.RES_MEDIUM, Renderer.RES_HIGH,
+                                 Renderer.RES_ULTRA, Renderer.RES_INSANE, Renderer.RES_REALISTIC],
+                      help = "resolution preset (default: RES_MEDIUM)")
+  parser.add_argument("--size", default = "400x400",
+                      help = "image size as WIDTHxHEIGHT (default: 400x400)")
+  parser.add_argument("--mode", default = Renderer.MODE_FORWARD, choices = Renderer.MODES,
+                      help = "render mode (default: MODE_FORWARD)")
+  parser.add_argument("--samples", type = int, default = 1, choices = Renderer.SAMPLES,
+                      help = "anti-aliasing samples per pixel, MODE_BATCH only (default: 1)")
+  parser.add_argument("--no-shadows", action = "store_true",
+                      help = "do not cast shadows")
+  parser.add_argument("--camera", nargs = 3, type = float, default = (30, 0.75, 0.25),
+                      metavar = ("ZOOM", "INCLINE", "ROTATION"),
+                      help = "camera distance, incline and rotation (default: 30 0.75 0.25)")
+  parser.add_argument("--output",
+                      help = "file to save the image to")
+  parser.add_argument("--cache", metavar = "DIRECTORY",
+                      help = "reuse the image if this scene, camera, and options were rendered " +
+                             "with the same --cache before, and keep it there otherwise")
+  parser.add_argument("--tile", type = int, metavar = "SIZE",
+                      help = "render SIZExSIZE pixel tiles one at a time, writing each row of them " +
+                             "to --output as it is finished, a .png or a memory-mapped .npy file")
+  parser.add_argument("--profile", metavar = "BASENAME",
+                      help = "profile the render, writing BASENAME.pstats and BASENAME.folded")
+  args = parser.parse_args()
+  if args.samples > 1 and args.mode != Renderer.MODE_BATCH:
+    parser.error("--samples requires --mode MODE_BATCH.")
+  if args.tile != None and (args.output == None or args.profile != None):
+    parser.error("--tile requires --output and cannot be profiled.")
+
+  width, height = [int(v) for v in args.size.lower().split("x")]
+  r = Renderer()
+  r.load_objects(filename = args.scene, resolution = args.res)
+  r.update_camera(*args.camera)
+  if args.cache != None:
+    r.cache = RenderCache(directory = args.cache)
+  if args.tile != None:
+    if args.output.lower().endswith(".npy"):
+      from numpy.lib.format import open_memmap
+      output = open_memmap(args.output, mode = "w+", dtype = uint8, shape = (height, width, 3))
+    else:
+      output = args.output
+    print(format_stats(r.render_tiled(output,
+                                      width = width,
+                                      height = height,
+                                      tileSize = args.tile,
+                                      castShadows = not args.no_shadows,
+                                      mode = args.mode,
+                                      samples = args.samples)))
+    if not isinstance(output, str):
+      output.flush()
+  else:
+    print(format_stats(r.render(width = width,
+                                height = height,
+                                castShadows = not args.no_shadows,
+                                mode = args.mode,
+                                samples = args.samples,
+                                profileFile = args.profile)))
+    if args.output != None:
+      r.image.save(args.output)
+  if args.profile != None:
+    print("Profile written to '{0}.pstats' and '{0}.folded'.".format(args.profile))
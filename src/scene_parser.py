@@ -4,7 +4,10 @@
 # nba38
 # 2016-11-17
 # ------------------------------
-# Parses a scene file and generates models for the desired resolution.
+# Parses a scene file into lightweight object descriptions. The
+# models of an object are only generated once a render needs them, and
+# are shared by every object of the same shape. Scenes may also be stored
+# in a compact binary format, which loads without reading each object.
 ################################
 
 fail = False
@@ -18,6 +21,17 @@ try:
 except Exception:
   print("ERROR: Could not import 'math' module.")
   fail = True
+try:
+  import re
+  from functools import lru_cache
+except Exception:
+  print("ERROR: Could not import 're' or 'functools' modules.")
+  fail = True
+try:
+  from numpy import array, dtype, full, memmap, uint8, where, zeros
+except Exception:
+  print("ERROR: Could not import 'numpy' module.")
+  fail = True
 if fail:
   input("Press ENTER to close this window.")
   exit()
@@ -47,123 +61,718 @@ SHAPE_RESOLUTIONS = {"cube":  {RES_LOW:       2,
 # directory where scenes are located
 SCENE_DIRECTORY = "../scenes/"
 
+# number of distinct expressions and value lists remembered while parsing
+EXPRESSION_CACHE_SIZE = 1024
+
+# tokens of rotation expressions: a number, a name, or any other character
+EXPRESSION_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)|([A-Za-z_]\w*)|(.))")
+
+# names allowed in rotation expressions
+EXPRESSION_NAMES = {"pi": pi}
+
+# most parentheses an expression may nest, which bounds the parser's recursion
+EXPRESSION_MAX_DEPTH = 32
+
+# binary scene files: a header, then one array each of meshes, objects,
+# and lights, stored back to back without padding
+BINARY_EXTENSION = ".scnb"
+BINARY_MAGIC = b"SCNB"
+BINARY_VERSION = 1
+BINARY_SHAPES = ("cube", "sphere") # stored as an index into this tuple
+HEADER_DTYPE = dtype([("magic",   "S4"),
+                      ("version", "<u4"),
+                      ("meshes",  "<u8"),
+                      ("objects", "<u8"),
+                      ("lights",  "<u8")])
+MESH_DTYPE = dtype([("shape", "u1"),
+                    ("size",  "<f8"),
+                    ("color", "<f8", (3,))])
+OBJECT_DTYPE = dtype([("mesh",     "<u4"),
+                      ("scale",    "<f8", (3,)),
+                      ("offset",   "<f8", (3,)),
+                      ("rotation", "<f8", (2,))])
+LIGHT_DTYPE = dtype([("loc",   "<f8", (3,)),
+                     ("color", "<f8", (3,))])
+
 ########
-# Parses a scene file and generates models for the desired resolution.
+# Generates the model of a shape.
+#   Params:
+#     shape      : "cube" or "sphere".
+#     size       : Side length of a cube or radius of a sphere.
+#     color      : Model color as a 3-tuple of RGB values between 0 and 1.
+#     resolution : The desired resolution of the model.
+#   Returns: Model in its own model space.
+def build_mesh(shape, size, color, resolution):
+  if shape == "cube":
+    return generate_cube(size = size,
+                         trisPerSide = SHAPE_RESOLUTIONS[shape][resolution],
+                         color = color)
+  return generate_sphere(radius = size,
+                         numLaterals = SHAPE_RESOLUTIONS[shape][resolution][0],
+                         numVerticals = SHAPE_RESOLUTIONS[shape][resolution][1],
+                         color = color)
+
+
+################
+# SceneMesh: Description of a cube or sphere shape, shared by every object
+# of a scene drawn with it. Its model is generated at most once, and
+# shared with the other meshes of its scene with the same shape, size,
+# and color.
+#   Members:
+#     shape      : "cube" or "sphere".
+#     size       : Side length of a cube or radius of a sphere.
+#     color      : 3-tuple of RGB format representing the shape's color
+#     resolution : Resolution the model is generated at.
+#     _model     : Model once generated by model(), otherwise None.
+#     _built     : Dictionary of models generated for the scene, by
+#                  (shape, size, color, resolution), or None.
+class SceneMesh:
+
+  ########
+  # Describes a new shape. No model is generated.
+  #   Params:
+  #     shape      : "cube" or "sphere".
+  #     size       : Side length of a cube or radius of a sphere.
+  #     color      : Color as a 3-tuple of RGB values between 0 and 1.
+  #     resolution : Resolution the model is generated at.
+  #     built      : Dictionary shared by the meshes of one scene, so identical
+  #                  meshes share a model. It is released with the scene.
+  def __init__(self, shape, size, color, resolution, built = None):
+    self.shape = shape
+    self.size = size
+    self.color = color
+    self.resolution = resolution
+    self._model = None
+    self._built = built
+
+  ########
+  # Returns the model of this shape, generating it on the first call.
+  #   Params:
+  #     stats : RenderStats to record the mesh build time in, or None.
+  #   Returns: Model in model space, which must not be modified.
+  def model(self, stats = None):
+    if self._model is None:
+      if stats != None:
+        stats.begin("mesh")
+      key = (self.shape, self.size, self.color, self.resolution)
+      if self._built != None and key in self._built:
+        self._model = self._built[key]
+      else:
+        self._model = build_mesh(*key)
+        if self._built != None:
+          self._built[key] = self._model
+      if stats != None:
+        stats.end()
+    return self._model
+
+  ########
+  # Computes the number of triangles in the model without generating it.
+  #   Returns: Number of triangles.
+  def tri_count(self):
+    if self.shape == "cube":
+      return 6 * SHAPE_RESOLUTIONS["cube"][self.resolution]
+    laterals, verticals = SHAPE_RESOLUTIONS["sphere"][self.resolution]
+    return verticals * (2 * laterals - 2)
+
+  ########
+  # Computes the radius of a sphere centered at the origin that contains
+  # the model, without generating it.
+  #   Returns: Radius of the bounding sphere in model space.
+  def bounding_radius(self):
+    if self.shape == "cube":
+      return self.size * sqrt(3) / 2 # half the diagonal
+    return self.size
+
+  ########
+  # Determines if the line segment intersects the shape. Matches
+  # Model.intersects() of the generated model.
+  #   Params:
+  #     p1, p2 : Line endpoints in model space.
+  #   Returns: True if segment intersects shape, False otherwise
+  def intersects(self, p1, p2):
+    if self.shape == "cube":
+      return cube_intersect(1, p1, p2) # generate_cube() always tests a unit cube
+    return sphere_intersect(self.size * 2, p1, p2)
+
+  ########
+  # Vectorized form of intersects(), testing many segments sharing a start.
+  #   Params:
+  #     p1 : Shared start of all segments, as an array of shape (3,).
+  #     p2 : Ends of the segments, as an array of shape (N, 3).
+  #   Returns: Boolean array of shape (N,), True where the segment intersects.
+  def intersects_array(self, p1, p2):
+    if self.shape == "cube":
+      return cube_intersect_array(1, p1, p2)
+    return sphere_intersect_array(self.size * 2, p1, p2)
+
+  ########
+  # Finds where rays first hit the exact shape, which unlike the model
+  # does not depend on the resolution.
+  #   Params:
+  #     origin    : Shared start of all rays in model space, as an array of shape (3,).
+  #     direction : Directions of the rays in model space, as an array of shape (N, 3).
+  #   Returns: Tuple of (t, normal). See cube_ray_array().
+  def ray_array(self, origin, direction):
+    if self.shape == "cube":
+      return cube_ray_array(self.size, origin, direction)
+    return sphere_ray_array(self.size, origin, direction)
+# SceneMesh
+################
+
+
+################
+# SceneObject: One placement of a SceneMesh in a scene. Any number of
+# objects may share a mesh, each with its own transform. Placement,
+# bounds, and shadow tests are available without generating the model.
+#   Members:
+#     mesh     : SceneMesh drawn by this object.
+#     color    : 3-tuple of RGB format representing object's color
+#     scale    : Scaling of this object, stored as a Point.
+#     offset   : Offset of this object from the origin, stored as a Point.
+#     rotation : Rotation of this object, stored as a Point.
+#     specular : Specular coefficient, as for Model.
+#     diffuse  : Diffuse coefficient, as for Model.
+#     matrices : Tuple of (placement, matrices) of the transformation matrices
+#                last made for this object and the offset, rotation, and
+#                scale they were made for, or None. See object_matrices()
+#                in renderer.
+class SceneObject:
+
+  ########
+  # Places a mesh in the scene. No model is generated.
+  #   Params:
+  #     mesh          : SceneMesh to be drawn.
+  #     scale, offset : 3-tuples of scaling factors and offset from the origin.
+  #     rotation      : 2-tuple of phi and theta rotation, in radians.
+  def __init__(self, mesh, scale, offset, rotation):
+    self.mesh = mesh
+    self.color = mesh.color
+    self.scale = Point(x = scale[0], y = scale[1], z = scale[2])
+    self.offset = Point(x = offset[0], y = offset[1], z = offset[2])
+    self.rotation = Point(phi = rotation[0], theta = rotation[1], radius = 1)
+    self.specular = Model.DEFAULT_SPECULAR
+    self.diffuse = Model.DEFAULT_DIFFUSE
+    self.matrices = None
+
+  ########
+  # Returns the model of this object's mesh. See SceneMesh.model().
+  def model(self, stats = None):
+    return self.mesh.model(stats = stats)
+
+  ########
+  # Returns the number of triangles in the mesh. See SceneMesh.tri_count().
+  def tri_count(self):
+    return self.mesh.tri_count()
+
+  ########
+  # Returns the model-space bounding radius of the mesh.
+  # See SceneMesh.bounding_radius().
+  def bounding_radius(self):
+    return self.mesh.bounding_radius()
+
+  ########
+  # Tests a model-space segment against the mesh. See SceneMesh.intersects().
+  def intersects(self, p1, p2):
+    return self.mesh.intersects(p1, p2)
+
+  ########
+  # Tests many model-space segments against the mesh.
+  # See SceneMesh.intersects_array().
+  def intersects_array(self, p1, p2):
+    return self.mesh.intersects_array(p1, p2)
+
+  ########
+  # Casts model-space rays against the exact shape. See SceneMesh.ray_array().
+  def ray_array(self, origin, direction):
+    return self.mesh.ray_array(origin, direction)
+# SceneObject
+################
+
+
+################
+# SceneRecords: Read-only sequence over the records of a binary scene.
+# Each item is built from its record the first time it is accessed, so a
+# scene of any size is loaded without touching its records.
+#   Members:
+#     records : Structured array of records, usually memory-mapped.
+#     meshes  : SceneRecords of the meshes the records refer to, or None.
+#     _build  : Function making the item of one record.
+#     _items  : Dictionary of items built so far, by index.
+class SceneRecords:
+
+  ########
+  # Wraps an array of records.
+  #   Params:
+  #     records : Structured array of records.
+  #     build   : Function taking one record and returning its item.
+  #     meshes  : SceneRecords of the meshes the records refer to by index, if any.
+  def __init__(self, records, build, meshes = None):
+    self.records = records
+    self.meshes = meshes
+    self._build = build
+    self._items = {}
+
+  ########
+  # Returns the number of records.
+  def __len__(self):
+    return len(self.records)
+
+  ########
+  # Returns the item of a record, building it on the first call.
+  #   Params:
+  #     index : Index of the record. Negative indexes count from the end.
+  def __getitem__(self, index):
+    if index < 0:
+      index += len(self.records)
+    if index < 0 or index >= len(self.records):
+      raise IndexError("Scene record index out of range.")
+    if index not in self._items:
+      self._items[index] = self._build(self.records[index])
+    return self._items[index]
+
+  ########
+  # Iterates over the items of every record in order.
+  def __iter__(self):
+    for i in range(len(self.records)):
+      yield self[i]
+# SceneRecords
+################
+
+########
+# Measures every object of a scene: where it is, how far it reaches, and
+# how brightly its material reflects light. Objects of a binary scene are
+# measured from the columns of their records in a few array operations,
+# so none of them is built.
+#   Params:
+#     models : List of SceneObject objects, or SceneRecords of them as
+#              returned by load_binary_scene().
+#   Returns: Tuple of (centers, radii, colors, diffuse, specular), where
+#            centers is an array of shape (count, 3) of world-space centers,
+#            radii is an array of world-space bounding radii, colors is an
+#            array of the brightest channel of each color, and diffuse and
+#            specular are arrays of the material coefficients.
+def object_bounds(models):
+  if isinstance(models, SceneRecords) and models.meshes != None:
+    records = models.records
+    meshRecords = models.meshes.records[records["mesh"]]
+    sizes = meshRecords["size"]
+    cubes = meshRecords["shape"] == BINARY_SHAPES.index("cube")
+    radii = where(cubes, sizes * sqrt(3) / 2, sizes) # as SceneMesh.bounding_radius()
+    return (array(records["offset"], dtype = float),
+            radii * abs(records["scale"]).max(axis = 1),
+            meshRecords["color"].max(axis = 1),
+            full(len(records), Model.DEFAULT_DIFFUSE, dtype = float),
+            full(len(records), Model.DEFAULT_SPECULAR, dtype = float))
+
+  centers = array([(m.offset.x, m.offset.y, m.offset.z) for m in models], dtype = float).reshape((-1, 3))
+  radii = array([m.bounding_radius() * max((abs(m.scale.x), abs(m.scale.y), abs(m.scale.z))) for m in models],
+                dtype = float)
+  return (centers,
+          radii,
+          array([max(m.color) for m in models], dtype = float),
+          array([m.diffuse for m in models], dtype = float),
+          array([m.specular for m in models], dtype = float))
+
+########
+# Evaluates an arithmetic expression, such as a rotation field. Supports
+# numbers, pi, unary + and -, the operators + - * /, and parentheses.
+# Unlike eval(), nothing else can be run. Results are remembered, since
+# scenes repeat the same few expressions.
+#   Params:
+#     text : Expression to evaluate.
+#   Returns: Value of the expression as a float.
+#   Raises: ValueError if the expression is invalid.
+@lru_cache(maxsize = EXPRESSION_CACHE_SIZE)
+def evaluate_expression(text):
+  tokens = []
+  for number, name, other in EXPRESSION_TOKEN.findall(text.strip()):
+    if number != "":
+      tokens.append(float(number))
+    elif name != "":
+      if name not in EXPRESSION_NAMES:
+        raise ValueError("Unknown name '{}' in '{}'.".format(name, text))
+      tokens.append(EXPRESSION_NAMES[name])
+    elif other.strip() != "":
+      if other not in "+-*/()":
+        raise ValueError("Unexpected '{}' in '{}'.".format(other, text))
+      tokens.append(other)
+  tokens.append(None) # end of expression
+  value, pos = _parse_sum(tokens, 0, text)
+  if tokens[pos] != None:
+    raise ValueError("Unexpected '{}' in '{}'.".format(tokens[pos], text))
+  return value
+
+########
+# Parses terms separated by + or -, from the start of a token list.
+# Part of evaluate_expression().
+#   Params:
+#     tokens : List of floats and operator strings, ending with None.
+#     pos    : Index of the first token to parse.
+#     text   : Whole expression, for error messages.
+#     depth  : Number of parentheses the sum is inside.
+#   Returns: Tuple of (value, pos), where pos is the index after the sum.
+def _parse_sum(tokens, pos, text, depth = 0):
+  value, pos = _parse_product(tokens, pos, text, depth)
+  while tokens[pos] in ("+", "-"):
+    op = tokens[pos]
+    right, pos = _parse_product(tokens, pos + 1, text, depth)
+    value = value + right if op == "+" else value - right
+  return (value, pos)
+
+########
+# Parses factors separated by * or /. Part of evaluate_expression().
+#   Params: See _parse_sum().
+#   Returns: Tuple of (value, pos), where pos is the index after the product.
+def _parse_product(tokens, pos, text, depth):
+  value, pos = _parse_factor(tokens, pos, text, depth)
+  while tokens[pos] in ("*", "/"):
+    op = tokens[pos]
+    right, pos = _parse_factor(tokens, pos + 1, text, depth)
+    if op == "*":
+      value *= right
+    elif right == 0:
+      raise ValueError("Division by zero in '{}'.".format(text))
+    else:
+      value /= right
+  return (value, pos)
+
+########
+# Parses a number or an expression in parentheses, after any number of
+# signs. Part of evaluate_expression().
+#   Params: See _parse_sum().
+#   Returns: Tuple of (value, pos), where pos is the index after the factor.
+#   Raises: ValueError if parentheses nest deeper than EXPRESSION_MAX_DEPTH.
+def _parse_factor(tokens, pos, text, depth):
+  sign = 1
+  while tokens[pos] in ("+", "-"): # looped, so long runs of signs cannot exhaust the stack
+    if tokens[pos] == "-":
+      sign = -sign
+    pos += 1
+
+  token = tokens[pos]
+  if token == "(":
+    if depth >= EXPRESSION_MAX_DEPTH:
+      raise ValueError("Parentheses nested over {} deep in '{}'.".format(EXPRESSION_MAX_DEPTH, text))
+    value, pos = _parse_sum(tokens, pos + 1, text, depth + 1)
+    if tokens[pos] != ")":
+      raise ValueError("Missing ')' in '{}'.".format(text))
+    return (sign * value, pos + 1)
+  if isinstance(token, float):
+    return (sign * token, pos + 1)
+  raise ValueError("Incomplete expression '{}'.".format(text))
+
+########
+# Parses a comma-separated list of values from a scene file.
+#   Params:
+#     text     : Text of the list, such as "1.0,0.5,0".
+#     count    : Number of values expected.
+#     evaluate : Function converting each value, such as float or
+#                evaluate_expression.
+#   Returns: Tuple of converted values. Results are remembered, since
+#            generated scenes repeat the same colors and scales.
+#   Raises: ValueError if the list has the wrong length or a bad value.
+@lru_cache(maxsize = EXPRESSION_CACHE_SIZE)
+def parse_values(text, count, evaluate = float):
+  values = text.split(',')
+  if len(values) != count:
+    raise ValueError("Expected {} values in '{}', had {}.".format(count, text, len(values)))
+  return tuple([evaluate(v) for v in values])
+
+########
+# Parses a scene file into object descriptions for the desired resolution.
+# No models are generated; see SceneMesh.model(). Files ending in
+# BINARY_EXTENSION are loaded with load_binary_scene(). Text files are read
+# one line at a time, so large scenes are never held in memory as text.
+# Objects of the same shape, size, and color share one SceneMesh, whether
+# written as instances of a define line or as separate cube and sphere
+# lines. Invalid lines are reported with their line number and skipped.
 # If file does not exist, returns an empty scene.
 #   Params:
 #     filename   : File to be parsed.
 #     resolution : The desired resolution of the models.
 #     debug      : If True, prints summary on exit.
-#   Returns: List of Model objects and list of Light objects.
-def parse_scene(filename, resolution = RES_MEDIUM, debug = False):
+#     stats      : RenderStats to record parse time in, or None.
+#   Returns: List of SceneObject objects and list of Light objects.
+def parse_scene(filename, resolution = RES_MEDIUM, debug = False, stats = None):
+  if resolution not in (RES_LOW, RES_MEDIUM, RES_HIGH, RES_ULTRA, RES_INSANE, RES_REALISTIC):
+    raise ValueError("Unexpected resolution.")
+
+  if stats != None:
+    stats.begin("parse")
+
+  built = {} # models generated for this scene, shared by its identical meshes
+  if filename.endswith(BINARY_EXTENSION):
+    models, lights = load_binary_scene(filename, resolution = resolution, built = built)
+  else:
+    models, lights = _parse_text_scene(filename, resolution = resolution, built = built)
+
+  if debug:
+    numTris = 0
+    for m in models:
+      numTris += m.tri_count()
+    print('+-Parser Report--\n' +
+          '|Tris: {}\n'.format(numTris) +
+          '|Models: {}\n|Meshes: {}\n'.format(len(models), len(set([m.mesh for m in models]))) +
+          '|Lights: {}\n'.format(len(lights)) +
+          '+----------------')
+
+  if stats != None:
+    stats.end()
+  return models, lights
+
+########
+# Parses a scene file in the text format. See parse_scene().
+#   Params:
+#     filename   : File to be parsed.
+#     resolution : The desired resolution of the models.
+#     built      : Dictionary of generated models shared by the scene's meshes.
+#                  See SceneMesh.
+#   Returns: List of SceneObject objects and list of Light objects.
+def _parse_text_scene(filename, resolution, built = None):
   models = []
   lights = []
+  meshes = {}      # (shape, size, color) -> SceneMesh, shared by identical objects
+  definitions = {} # name -> SceneMesh, from define lines
 
   try:
     f = open(SCENE_DIRECTORY + filename)
-    lines = f.readlines()
-    f.close()
   except FileNotFoundError:
     print("ERROR: File '{}' not found.".format(filename))
-    lines = []
+    f = None
   except:
     print("ERROR: Unknown error occured while opening '{}'.".format(filename))
-    lines = []
+    f = None
 
-  if resolution not in (RES_LOW, RES_MEDIUM, RES_HIGH, RES_ULTRA, RES_INSANE, RES_REALISTIC):
-    raise ValueError("Unexpected resolution.")
+  if f != None:
+    with f:
+      for lineNum, line in enumerate(f, 1):
+        if len(line) == 0 or line[0] == '#': # commented out
+          continue
+        words = line.split()
+        if len(words) == 0: # blank line
+          continue
 
-  for line in lines:
-    if len(line) == 0 or line[0] == '#': # commented out
-      continue
-    words = line.split()
-    if len(words) == 0: # blank line
-      continue
-    if words[0] not in ("cube", "sphere", "light"):
-      print(line, end = '')
-      print("ERROR: '{}' not a supported shape.".format(words[0]))
-      continue
-
-    if words[0] in ("cube", "sphere"):
-      if len(words) != 6:
-        print(line, end = '')
-        print("ERROR: Expected 6 args, had {}.".format(len(words)))
-        continue
-      try:
-        size = float(words[1])
-        color = words[2].split(',')
-        for i in range(len(color)):
-          color[i] = float(color[i])
-        scale = words[3].split(',')
-        for i in range(len(scale)):
-          scale[i] = float(scale[i])
-        offset = words[4].split(',')
-        for i in range(len(offset)):
-          offset[i] = float(offset[i])
-        rotation = words[5].split(',')
-        for i in range(len(rotation)):
-          rotation[i] = eval(rotation[i])
-      except:
-        print(line, end = '')
-        print("ERROR: Could not parse arguments for '{}'.".format(line))
-        continue
-
-      if words[0] == "cube":
-        new = generate_cube(size = size,
-                            trisPerSide = SHAPE_RESOLUTIONS[words[0]][resolution],
-                            color = color)
-      elif words[0] == "sphere":
-        new = generate_sphere(radius = size,
-                              numLaterals = SHAPE_RESOLUTIONS[words[0]][resolution][0],
-                              numVerticals = SHAPE_RESOLUTIONS[words[0]][resolution][1],
-                              color = color)
-      new.scale = Point(x = scale[0], y = scale[1], z = scale[2])
-      new.offset = Point(x = offset[0], y = offset[1], z = offset[2])
-      new.rotation = Point(phi = rotation[0], theta = rotation[1], radius = 1)
-      models.append(new)
-    elif words[0] == "light":
-      if len(words) not in (2,3):
-        print(line, end = '')
-        print("ERROR: Expected 2 or 3 args, had {}.".format(len(words)))
-        continue
-      try:
-        loc = words[1].split(',')
-        for i in range(len(loc)):
-          loc[i] = float(loc[i])
-        if len(words) == 3:
-          color = words[2].split(',')
-          for i in range(len(color)):
-            color[i] = float(color[i])
+        try:
+          if words[0] in ("cube", "sphere"):
+            if len(words) != 6:
+              raise ValueError("Expected 6 args, had {}.".format(len(words)))
+            meshKey = (words[0], float(words[1]), parse_values(words[2], 3))
+            scale = parse_values(words[3], 3)
+            offset = parse_values(words[4], 3)
+            rotation = parse_values(words[5], 2, evaluate = evaluate_expression)
+          elif words[0] == "define":
+            if len(words) != 5:
+              raise ValueError("Expected 5 args, had {}.".format(len(words)))
+            if words[2] not in ("cube", "sphere"):
+              raise ValueError("'{}' not a supported shape.".format(words[2]))
+            meshKey = (words[2], float(words[3]), parse_values(words[4], 3))
+          elif words[0] == "instance":
+            if len(words) != 5:
+              raise ValueError("Expected 5 args, had {}.".format(len(words)))
+            if words[1] not in definitions:
+              raise ValueError("'{}' has not been defined.".format(words[1]))
+            scale = parse_values(words[2], 3)
+            offset = parse_values(words[3], 3)
+            rotation = parse_values(words[4], 2, evaluate = evaluate_expression)
+          elif words[0] == "light":
+            if len(words) not in (2,3):
+              raise ValueError("Expected 2 or 3 args, had {}.".format(len(words)))
+            loc = parse_values(words[1], 3)
+            if len(words) == 3:
+              color = parse_values(words[2], 3)
+            else:
+              color = None
+          else:
+            raise ValueError("'{}' not a supported shape.".format(words[0]))
+        except ValueError as e:
+          print("ERROR: {}, line {}: {}".format(filename, lineNum, e))
+          continue
+
+        if words[0] == "light":
+          lights.append(Light(x = loc[0], y = loc[1], z = loc[2], color = color))
+          continue
+
+        if words[0] == "instance":
+          mesh = definitions[words[1]]
         else:
-          color = None
-      except:
-        print(line, end = '')
-        print("ERROR: Could not parse arguments for '{}'.".format(line))
-        continue
-
-      new = Light(x = loc[0], y = loc[1], z = loc[2], color = color)
-      lights.append(new)
-
-  numPts = 0
-  numNorms = 0
-  numTris = 0
-  for m in models:
-    numPts += len(m.points)
-    numNorms += len(m.norms)
-    numTris += len(m.tris)
-  if debug:
-    print('+-Parser Report--\n' +
-          '|Points: {}\n|Norms: {}\n|Tris: {}\n'.format(numPts, numNorms, numTris) +
-          '|Models: {}\n|Lights: {}\n'.format(len(models), len(lights)) +
-          '+----------------')
+          if meshKey not in meshes:
+            meshes[meshKey] = SceneMesh(shape = meshKey[0],
+                                        size = meshKey[1],
+                                        color = meshKey[2],
+                                        resolution = resolution,
+                                        built = built)
+          mesh = meshes[meshKey]
+          if words[0] == "define":
+            definitions[words[1]] = mesh
+            continue
+
+        models.append(SceneObject(mesh = mesh,
+                                  scale = scale,
+                                  offset = offset,
+                                  rotation = rotation))
+  return models, lights
+
+########
+# Loads a binary scene file. The file is memory-mapped and each object or
+# light is only built from its record once it is accessed, so loading
+# makes no Python objects per record. See object_bounds() for measuring
+# the objects without building them.
+#   Params:
+#     filename   : File to be loaded, in SCENE_DIRECTORY.
+#     resolution : The desired resolution of the models.
+#     built      : Dictionary of generated models shared by the scene's meshes,
+#                  or None to make one. See SceneMesh.
+#   Returns: SceneRecords of SceneObject objects and SceneRecords of Light
+#            objects. If the file is missing, of another format or version,
+#            or truncated, an empty scene.
+#   Raises: ValueError if a record refers to a shape or mesh that does not exist.
+def load_binary_scene(filename, resolution = RES_MEDIUM, built = None):
+  try:
+    data = memmap(SCENE_DIRECTORY + filename, dtype = uint8, mode = "r")
+  except FileNotFoundError:
+    print("ERROR: File '{}' not found.".format(filename))
+    return [], []
+  except (OSError, ValueError): # includes empty files, which cannot be mapped
+    print("ERROR: Could not read '{}'.".format(filename))
+    return [], []
+
+  # find where each array starts, checking the file holds all of them
+  header = None
+  if len(data) >= HEADER_DTYPE.itemsize:
+    header = data[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+  if header == None or header["magic"] != BINARY_MAGIC or header["version"] != BINARY_VERSION:
+    print("ERROR: '{}' is not a binary scene of version {}.".format(filename, BINARY_VERSION))
+    return [], []
+  sizes = [(int(header["meshes"]), MESH_DTYPE),
+           (int(header["objects"]), OBJECT_DTYPE),
+           (int(header["lights"]), LIGHT_DTYPE)]
+  arrays = []
+  start = HEADER_DTYPE.itemsize
+  for count, recordType in sizes:
+    end = start + count * recordType.itemsize
+    if end > len(data):
+      print("ERROR: '{}' is truncated.".format(filename))
+      return [], []
+    arrays.append(data[start:end].view(recordType))
+    start = end
+  meshRecords, objectRecords, lightRecords = arrays
+
+  # records are only built during a render, so check what they refer to now
+  if len(meshRecords) > 0 and int(meshRecords["shape"].max()) >= len(BINARY_SHAPES):
+    raise ValueError("'{}' has a mesh of unknown shape {}.".format(filename, int(meshRecords["shape"].max())))
+  if len(objectRecords) > 0 and int(objectRecords["mesh"].max()) >= len(meshRecords):
+    raise ValueError("'{}' has an object of mesh {}, but only {} meshes.".format(
+                     filename, int(objectRecords["mesh"].max()), len(meshRecords)))
 
+  # meshes are shared by their objects, so each is made once
+  if built == None:
+    built = {}
+  meshes = SceneRecords(meshRecords,
+                        lambda r: SceneMesh(shape = BINARY_SHAPES[r["shape"]],
+                                            size = float(r["size"]),
+                                            color = tuple(r["color"].tolist()),
+                                            resolution = resolution,
+                                            built = built))
+  models = SceneRecords(objectRecords,
+                        lambda r: SceneObject(mesh = meshes[int(r["mesh"])],
+                                              scale = tuple(r["scale"].tolist()),
+                                              offset = tuple(r["offset"].tolist()),
+                                              rotation = tuple(r["rotation"].tolist())),
+                        meshes = meshes)
+  lights = SceneRecords(lightRecords,
+                        lambda r: Light(x = float(r["loc"][0]),
+                                        y = float(r["loc"][1]),
+                                        z = float(r["loc"][2]),
+                                        color = tuple(r["color"].tolist())))
   return models, lights
 
+########
+# Writes a scene to a binary scene file, which load_binary_scene() reads.
+# Objects sharing a SceneMesh keep sharing it when loaded.
+#   Params:
+#     filename : File to be written, in SCENE_DIRECTORY.
+#     models   : Sequence of SceneObject objects.
+#     lights   : Sequence of Light objects.
+def write_binary_scene(filename, models, lights):
+  meshIds = {} # SceneMesh -> index of its record
+  meshList = []
+  objectRecords = zeros(len(models), dtype = OBJECT_DTYPE)
+  for i, m in enumerate(models):
+    if m.mesh not in meshIds:
+      meshIds[m.mesh] = len(meshList)
+      meshList.append(m.mesh)
+    objectRecords[i] = (meshIds[m.mesh],
+                        (m.scale.x, m.scale.y, m.scale.z),
+                        (m.offset.x, m.offset.y, m.offset.z),
+                        (m.rotation.phi, m.rotation.theta))
+
+  meshRecords = zeros(len(meshList), dtype = MESH_DTYPE)
+  for i, mesh in enumerate(meshList):
+    meshRecords[i] = (BINARY_SHAPES.index(mesh.shape), mesh.size, mesh.color)
+
+  lightRecords = zeros(len(lights), dtype = LIGHT_DTYPE)
+  for i, l in enumerate(lights):
+    lightRecords[i] = ((l.loc.x, l.loc.y, l.loc.z), l.color)
+
+  header = zeros(1, dtype = HEADER_DTYPE)
+  header[0] = (BINARY_MAGIC, BINARY_VERSION, len(meshRecords), len(objectRecords), len(lightRecords))
+  with open(SCENE_DIRECTORY + filename, "wb") as f:
+    for records in (header, meshRecords, objectRecords, lightRecords):
+      f.write(records.tobytes())
+
+########
+# Writes a scene to a text scene file. Each shared mesh is written as a
+# define line, and each object as an instance of one, so the file parses
+# back into the same meshes. Values are written exactly.
+#   Params:
+#     filename : File to be written, in SCENE_DIRECTORY.
+#     models   : Sequence of SceneObject objects.
+#     lights   : Sequence of Light objects.
+def write_text_scene(filename, models, lights):
+  values = lambda v: ",".join([repr(float(x)) for x in v])
+  meshNames = {} # SceneMesh -> name of its define line
+  with open(SCENE_DIRECTORY + filename, "w") as f:
+    for m in models:
+      if m.mesh not in meshNames:
+        meshNames[m.mesh] = "mesh{}".format(len(meshNames))
+        f.write("define {} {} {} {}\n".format(meshNames[m.mesh], m.mesh.shape,
+                                               repr(float(m.mesh.size)), values(m.mesh.color)))
+      f.write("instance {} {} {} {}\n".format(meshNames[m.mesh],
+                                               values((m.scale.x, m.scale.y, m.scale.z)),
+                                               values((m.offset.x, m.offset.y, m.offset.z)),
+                                               values((m.rotation.phi, m.rotation.theta))))
+    for l in lights:
+      f.write("light {} {}\n".format(values((l.loc.x, l.loc.y, l.loc.z)), values(l.color)))
+
+########
+# Converts a scene between the text and binary formats, choosing each
+# format from the file's extension.
+#   Params:
+#     source      : Scene file to read, in SCENE_DIRECTORY.
+#     destination : Scene file to write, in SCENE_DIRECTORY.
+def convert_scene(source, destination):
+  models, lights = parse_scene(source)
+  if destination.endswith(BINARY_EXTENSION):
+    write_binary_scene(destination, models, lights)
+  else:
+    write_text_scene(destination, models, lights)
+
 
 ########
 # Main code architecture if run standalone.
-# Parses a scene and prints debug output.
+# Parses a scene and prints debug output, or converts it to another format.
 if __name__ == "__main__":
-  models, lights = parse_scene("scene1.txt", debug = True)
+  import argparse
+  parser = argparse.ArgumentParser(description = "Check a scene file or convert it to another format.")
+  parser.add_argument("scene", nargs = "?", default = "scene1.txt",
+                      help = "scene file to read (default: scene1.txt)")
+  parser.add_argument("--output",
+                      help = "scene file to write; ending it in {} writes the binary format".format(BINARY_EXTENSION))
+  args = parser.parse_args()
 
-  input("Press ENTER to close this window.")
\ No newline at end of file
+  if args.output != None:
+    convert_scene(args.scene, args.output)
+    print("Converted '{}' to '{}'.".format(args.scene, args.output))
+  else:
+    models, lights = parse_scene(args.scene, debug = True)
+    input("Press ENTER to close this window.")
\ No newline at end of file
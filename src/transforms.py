@@ -4,7 +4,8 @@
 # nba38
 # 2016-11-17
 # ------------------------------
-# Functions to generate transformation matrices.
+# Functions to generate transformation matrices. All matrices are
+# 4x4 float64 arrays, combined with the @ operator.
 ################################
 
 fail = False
@@ -18,6 +19,11 @@ try:
 except Exception:
   print("ERROR: Could not import 'math' module.")
   fail = True
+try:
+  from functools import lru_cache
+except Exception:
+  print("ERROR: Could not import 'functools' module.")
+  fail = True
 if fail:
   input("Press ENTER to close this window.")
   exit()
@@ -25,19 +31,28 @@ if fail:
 # focal constant used in perspective projection
 FOCAL_CONST = 1.0 / tan(pi / 8) # 45deg view angle (22.5 per side)
 
+# near and far planes used in perspective projection
+NEAR_PLANE = 5
+FAR_PLANE = 1000
+
+# number of distinct view and display matrices remembered
+MATRIX_CACHE_SIZE = 256
+
 
 ########
 # Generates the perspective projection matrix.
 # Projection assumes looking towards negative Z. Implementation from textbook.
+# The result is shared between calls, so it must not be modified.
 #   Returns: Perspective rotation matrix.
+@lru_cache(maxsize = None)
 def perspective_project():
-  far = 1000
-  near = 5
-  toRet = mat([[near,    0,          0,           0],
-               [0,    near,          0,           0],
-               [0,       0, near + far, -far * near],
-               [0,       0,          1,           0]])
-  return toRet * translate(z = -near) # move camera back before projecting
+  far = FAR_PLANE
+  near = NEAR_PLANE
+  toRet = array([[near,    0,          0,           0],
+                 [0,    near,          0,           0],
+                 [0,       0, near + far, -far * near],
+                 [0,       0,          1,           0]], dtype = float64)
+  return _freeze(toRet @ translate(z = -near)) # move camera back before projecting
 
 ########
 # Given rotation in radians about X axis (viewing towards negative X),
@@ -47,10 +62,10 @@ def perspective_project():
 #     rad : Extent of rotation in radians.
 #   Returns: Rotation matrix
 def rotateX(rad):
-  return mat([[1,        0,         0, 0],
-              [0, cos(rad), -sin(rad), 0],
-              [0, sin(rad),  cos(rad), 0],
-              [0,        0,         0, 1]])
+  return array([[1,        0,         0, 0],
+                [0, cos(rad), -sin(rad), 0],
+                [0, sin(rad),  cos(rad), 0],
+                [0,        0,         0, 1]], dtype = float64)
 
 ########
 # Given rotation in radians about Y axis (viewing towards negative Y),
@@ -61,10 +76,10 @@ def rotateX(rad):
 #   Returns: Rotation matrix
 def rotateY(rad):
   # return rotateZ(pi/4) * rotateX(rad) * rotateZ(-pi/4)
-  return mat([[ cos(rad), 0, sin(rad), 0],
-              [        0, 1,        0, 0],
-              [-sin(rad), 0, cos(rad), 0],
-              [        0, 0,        0, 1]])
+  return array([[ cos(rad), 0, sin(rad), 0],
+                [        0, 1,        0, 0],
+                [-sin(rad), 0, cos(rad), 0],
+                [        0, 0,        0, 1]], dtype = float64)
 
 ########
 # Given rotation in radians about Z axis (viewing towards negative Z),
@@ -74,10 +89,10 @@ def rotateY(rad):
 #     rad : Extent of rotation in radians.
 #   Returns: Rotation matrix
 def rotateZ(rad):
-  return mat([[cos(rad), -sin(rad), 0, 0],
-              [sin(rad), cos(rad), 0, 0],
-              [       0,        0, 1, 0],
-              [       0,        0, 0, 1]])
+  return array([[cos(rad), -sin(rad), 0, 0],
+                [sin(rad), cos(rad), 0, 0],
+                [       0,        0, 1, 0],
+                [       0,        0, 0, 1]], dtype = float64)
 
 ########
 # Given x, y, and z offsets, returns the translation matrix.
@@ -89,7 +104,7 @@ def translate(x = 0, y = 0, z = 0):
          [0, 1, 0, y],
          [0, 0, 1, z],
          [0, 0, 0, 1]]
-  return mat(arr)
+  return array(arr, dtype = float64)
 
 ########
 # Given x, y, and z scalars, returns scaling matrix.
@@ -97,10 +112,10 @@ def translate(x = 0, y = 0, z = 0):
 #     x, y, z : Scaling factors.
 #   Returns: Scaling matrix.
 def scale(x = 1, y = 1, z = 1):
-  return mat([[x, 0, 0, 0],
-              [0, y, 0, 0],
-              [0, 0, z, 0],
-              [0, 0, 0, 1]])
+  return array([[x, 0, 0, 0],
+                [0, y, 0, 0],
+                [0, 0, z, 0],
+                [0, 0, 0, 1]], dtype = float64)
 
 ########
 # Given x, y, and z scalars for regular points, returns scaling matrix for normals.
@@ -108,7 +123,141 @@ def scale(x = 1, y = 1, z = 1):
 #     x, y, z : Scalars used for scale() when transforming points of model.
 #   Returns: Scaling matrix to use for normals.
 def scale_norm(x = 1, y = 1, z = 1):
-  return mat([[1/x,   0,   0, 0],
-              [  0, 1/y,   0, 0],
-              [  0,   0, 1/z, 0],
-              [  0,   0,   0, 1]])
\ No newline at end of file
+  return array([[1/x,   0,   0, 0],
+                [  0, 1/y,   0, 0],
+                [  0,   0, 1/z, 0],
+                [  0,   0,   0, 1]], dtype = float64)
+
+########
+# Marks a matrix read-only, so a cached result cannot be changed by a caller.
+#   Params:
+#     m : Matrix to protect.
+#   Returns: The same matrix.
+def _freeze(m):
+  m.flags.writeable = False
+  return m
+
+########
+# Generates the matrices that place a model in the world: it is scaled,
+# rotated by theta about Z after being tilted by phi about Y, then offset.
+# Built directly from the rotation's sines and cosines, so the inverse and
+# normal matrices need no general matrix inversion. Results are read-only,
+# so they can be kept with the model and reused while it does not move.
+#   Params:
+#     offset   : Tuple of (x, y, z) offset of the model from the origin.
+#     rotation : Tuple of (theta, phi) rotation of the model.
+#     scale    : Tuple of (x, y, z) scaling factors.
+#   Returns: Tuple of (model, inverse, normal) matrices, where model converts
+#            from model to world space, inverse converts from world to model
+#            space, and normal converts model-space normals to world space.
+def model_matrix(offset, rotation, scale):
+  cz, sz = cos(rotation[0]), sin(rotation[0])
+  cy, sy = cos(rotation[1]), sin(rotation[1])
+  rot = array([[cz * cy, -sz, cz * sy], # rotateZ(theta) @ rotateY(phi)
+               [sz * cy,  cz, sz * sy],
+               [    -sy,   0,      cy]], dtype = float64)
+  size = array(scale, dtype = float64)
+
+  model = identity(4)
+  model[:3, :3] = rot * size # scale each column
+  model[:3, 3] = offset
+
+  inverse = identity(4)
+  inverse[:3, :3] = rot.T / size[:, newaxis] # scale each row by the inverse
+  inverse[:3, 3] = -inverse[:3, :3] @ array(offset, dtype = float64)
+
+  normal = identity(4)
+  normal[:3, :3] = rot / size
+
+  return (_freeze(model), _freeze(inverse), _freeze(normal))
+
+########
+# Generates the matrices for a camera at the given location, looking in the
+# given direction. As with model_matrix(), the inverse is built directly and
+# results are remembered, so they must not be modified.
+#   Params:
+#     location  : Tuple of (x, y, z) location of the camera.
+#     direction : Tuple of (theta, phi) direction the camera looks in.
+#   Returns: Tuple of (view, inverse, normal) matrices, where view converts
+#            from world to view space, inverse converts from view to world
+#            space, and normal converts world-space normals to view space.
+@lru_cache(maxsize = MATRIX_CACHE_SIZE)
+def view_matrix(location, direction):
+  normal = rotateX(pi - direction[1]) @ rotateZ(-pi/2 - direction[0])
+
+  view = normal @ translate(-location[0], -location[1], -location[2])
+
+  inverse = identity(4)
+  inverse[:3, :3] = normal[:3, :3].T # rotation is orthonormal
+  inverse[:3, 3] = location
+
+  return (_freeze(view), _freeze(inverse), _freeze(normal))
+
+########
+# Generates the matrix converting view space to canvas coordinates for a
+# viewport of the given size. Points must still be divided by their fourth
+# coordinate afterwards. Results are remembered, so they must not be modified.
+#   Params:
+#     viewx, viewy : Width and height of the viewport in pixels.
+#     origin       : Tuple of (x, y) canvas position that becomes (0, 0), so
+#                    a part of a larger image can be drawn on its own canvas.
+#   Returns: View -> Canvas matrix.
+@lru_cache(maxsize = MATRIX_CACHE_SIZE)
+def display_matrix(viewx, viewy, origin = (0, 0)):
+  viewMin = min((viewx, viewy))
+  return _freeze(translate(x = viewx / 2 - origin[0], y = viewy / 2 - origin[1]) @
+                 scale(y = -1) @
+                 scale(x = viewMin / 2, y = viewMin / 2) @
+                 perspective_project())
+
+########
+# Generates the inverse of display_matrix(), converting canvas coordinates
+# back to view space. Built directly from the inverses of its parts, so no
+# general matrix inversion is needed. Results are remembered, so they must
+# not be modified.
+#   Params: See display_matrix().
+#   Returns: Canvas -> View matrix.
+@lru_cache(maxsize = MATRIX_CACHE_SIZE)
+def display_inverse(viewx, viewy, origin = (0, 0)):
+  viewMin = min((viewx, viewy))
+  far = FAR_PLANE
+  near = NEAR_PLANE
+  unproject = array([[1 / near,        0,                 0,                           0],
+                     [       0, 1 / near,                 0,                           0],
+                     [       0,        0,                 0,                           1],
+                     [       0,        0, -1 / (far * near), (near + far) / (far * near)]], dtype = float64)
+  return _freeze(translate(z = near) @ unproject @ # undoes perspective_project()
+                 scale(x = 2 / viewMin, y = 2 / viewMin) @
+                 scale(y = -1) @
+                 translate(x = origin[0] - viewx / 2, y = origin[1] - viewy / 2))
+
+########
+# Generates the view-space rays through the center of every pixel of a
+# viewport, matching display_matrix(): every point along a pixel's ray is
+# drawn on that pixel.
+#   Params:
+#     viewx, viewy : Width and height of the viewport in pixels.
+#     window       : If provided, tuple of (x0, y0, x1, y1) limiting the rays
+#                    to the pixels from (x0, y0) up to but not including (x1, y1).
+#   Returns: Tuple of (eye, directions), where eye is the array of shape (3,)
+#            all rays start from, and directions is an array of shape
+#            (viewy, viewx, 3), or (y1 - y0, x1 - x0, 3) with a window, of ray
+#            directions. Directions are not unit length; one step along a ray
+#            lowers w by one.
+def pixel_rays(viewx, viewy, window = None):
+  if window == None:
+    window = (0, 0, int(viewx), int(viewy))
+  display = display_matrix(viewx, viewy)
+  inverse = display_inverse(viewx, viewy)
+  eye = inverse @ array((0, 0, 1, 0), dtype = float64) # projects to w = 0
+  eye = eye[:3] / eye[3]
+
+  # another point on the line through each pixel
+  ys, xs = mgrid[window[1]:window[3], window[0]:window[2]]
+  clip = stack((-xs, -ys, zeros(xs.shape), -ones(xs.shape)), axis = 2)
+  points = clip @ inverse.T
+  rays = points[:, :, :3] / points[:, :, 3:] - eye
+
+  # scale so w falls by one per step, toward the visible side of the eye
+  rays /= -(rays @ display[3, :3])[:, :, newaxis]
+  return (eye, rays)